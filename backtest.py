@@ -0,0 +1,202 @@
+"""
+Walk-Forward Backtest
+=====================
+
+Backtest temporel à origine glissante.
+
+La matrice de features est construite une fois (triée par Time), écrite en
+.npy et mappée en lecture seule par chaque worker. Chaque fold n'utilise que
+des tranches contiguës de cette matrice (des vues, pas de copies):
+
+- expanding: train = [début, t_k), test = [t_k, t_k+1)
+- sliding:   train = [t_k - train_window, t_k), test = [t_k, t_k+1)
+
+Les folds sont entraînés et évalués en parallèle; on agrège les métriques
+de type evaluate() et le seuil optimal de chaque fold.
+"""
+
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import roc_auc_score
+from sklearn.preprocessing import StandardScaler
+
+from fraud_detector import CostCurve, CreditCardFraudDetector, get_logger
+
+
+logger = get_logger(__name__)
+
+
+# Colonnes de CostCurve.table reprises par fold (au seuil fixé et au seuil optimal)
+_FOLD_METRICS = ('threshold', 'precision', 'recall', 'f1', 'specificity', 'false_positive_rate',
+                 'total_cost', 'savings', 'roi')
+
+
+def walk_forward_splits(times, n_folds=5, mode='expanding', min_train_fraction=0.5,
+                        train_window=None, gap=0.0):
+    """
+    Folds temporels sous forme de tranches sur des Time triés.
+
+    Args:
+        times: Time triés par ordre croissant
+        n_folds: nombre de fenêtres de test, de même durée
+        mode: 'expanding' ou 'sliding'
+        min_train_fraction: part de la période réservée au premier train
+        train_window: durée du train en secondes (mode 'sliding')
+        gap: délai en secondes entre fin du train et début du test
+
+    Returns:
+        liste de (slice train, slice test)
+    """
+    times = np.asarray(times)
+    if mode not in ('expanding', 'sliding'):
+        raise ValueError(f"Mode inconnu: {mode}")
+    if mode == 'sliding' and train_window is None:
+        raise ValueError("train_window requis en mode 'sliding'")
+
+    start, end = times[0], times[-1]
+    test_start = start + (end - start) * min_train_fraction
+    boundaries = np.linspace(test_start, end, n_folds + 1)
+    boundaries[-1] = np.nextafter(end, np.inf)  # inclure la dernière transaction
+
+    splits = []
+    for k in range(n_folds):
+        test_lo = np.searchsorted(times, boundaries[k], side='left')
+        test_hi = np.searchsorted(times, boundaries[k + 1], side='left')
+        train_hi = np.searchsorted(times, boundaries[k] - gap, side='left')
+        if mode == 'expanding':
+            train_lo = 0
+        else:
+            train_lo = np.searchsorted(times, boundaries[k] - gap - train_window, side='left')
+        splits.append((slice(int(train_lo), int(train_hi)), slice(int(test_lo), int(test_hi))))
+    return splits
+
+
+def _run_fold(fold, train_slice, test_slice, paths, algorithm, balance_data,
+              model_params, costs, threshold, resampler=None):
+    """Entraîne et évalue un fold (exécuté dans un worker)."""
+    X = np.load(paths['X'], mmap_mode='r')
+    y = np.load(paths['y'], mmap_mode='r')
+    times = np.load(paths['time'], mmap_mode='r')
+
+    # Vues sur la matrice partagée
+    X_train, y_train = X[train_slice], np.asarray(y[train_slice])
+    X_test, y_test = X[test_slice], np.asarray(y[test_slice])
+
+    result = {
+        'fold': fold,
+        'train_start': float(times[train_slice.start]) if len(y_train) else np.nan,
+        'test_start': float(times[test_slice.start]) if len(y_test) else np.nan,
+        'test_end': float(times[test_slice.stop - 1]) if len(y_test) else np.nan,
+        'n_train': len(y_train),
+        'n_test': len(y_test),
+        'fraud_rate_test': float(y_test.mean()) if len(y_test) else np.nan
+    }
+    # SMOTE (k=5 voisins) a besoin d'au moins 6 fraudes dans le train
+    min_frauds = 6 if balance_data and algorithm != 'isolation_forest' else 1
+    if len(y_test) == 0 or y_train.sum() < min_frauds or y_train.sum() == len(y_train):
+        result['skipped'] = True
+        return result
+
+    detector = CreditCardFraudDetector(algorithm=algorithm, balance_data=balance_data,
+                                       verbose=False, model_params=model_params,
+                                       resampler=resampler)
+    detector.scaler = StandardScaler()
+    X_train_scaled = detector.scaler.fit_transform(X_train)
+    X_resampled, y_resampled = detector._resample(X_train_scaled, y_train)
+    detector.model = detector._build_model(y_train)
+    if getattr(detector.model, 'n_jobs', None) is not None:
+        detector.model.set_params(n_jobs=1)
+    detector._fit_model(X_train_scaled, y_train, X_resampled, y_resampled)
+
+    probabilities = detector._proba_from_scaled(detector.scaler.transform(X_test))
+    curve = CostCurve(y_test, probabilities, **costs)
+    optimal_threshold = curve.optimal_threshold()
+
+    result['skipped'] = False
+    result['auc'] = roc_auc_score(y_test, probabilities) if y_test.min() != y_test.max() else np.nan
+    # Seuil fixé puis seuil optimal: métriques de la table de la courbe
+    table = curve.table([threshold, optimal_threshold])
+    for prefix, (_, point) in zip(('', 'optimal_'), table.iterrows()):
+        result.update({f'{prefix}{key}': float(point[key]) for key in _FOLD_METRICS})
+    return result
+
+
+def run_backtest(df_enhanced, algorithm='random_forest', n_folds=5, mode='expanding',
+                 min_train_fraction=0.5, train_window=None, gap=0.0, balance_data=True,
+                 model_params=None, threshold=0.5, investigation_cost=25, fraud_cost=500,
+                 n_workers=None, workdir=None, resampler=None, verbose=True):
+    """
+    Backtest walk-forward sur un DataFrame issu de create_features.
+
+    resampler: ResamplingStage des folds (ex: avec cache_dir, pour rejouer
+    le backtest sans refaire SMOTE)
+
+    Returns:
+        (folds, summary): métriques par fold, et moyenne/écart-type par métrique
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    feature_cols = [col for col in df_enhanced.columns if col not in ['Class', 'Time']]
+
+    # Matrice unique, triée par Time (aucune copie par fold ensuite)
+    times = df_enhanced['Time'].to_numpy()
+    order = None if np.all(times[:-1] <= times[1:]) else np.argsort(times, kind='mergesort')
+    arrays = {
+        'X': df_enhanced[feature_cols].to_numpy(dtype=np.float64),
+        'y': df_enhanced['Class'].to_numpy(),
+        'time': times
+    }
+    if order is not None:
+        arrays = {name: array[order] for name, array in arrays.items()}
+
+    splits = walk_forward_splits(arrays['time'], n_folds=n_folds, mode=mode,
+                                 min_train_fraction=min_train_fraction,
+                                 train_window=train_window, gap=gap)
+
+    if verbose:
+        logger.info(f"⏱️ Backtest {mode}: {n_folds} folds, {algorithm}, {n_workers} workers")
+
+    own_workdir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix='fraud_backtest_')
+    os.makedirs(workdir, exist_ok=True)
+
+    try:
+        paths = {}
+        for name, array in arrays.items():
+            paths[name] = os.path.join(workdir, f'{name}.npy')
+            np.save(paths[name], np.ascontiguousarray(array))
+        del arrays
+
+        costs = {'investigation_cost': investigation_cost, 'fraud_cost': fraud_cost}
+        tasks = [(k, train_slice, test_slice, paths, algorithm, balance_data,
+                  model_params, costs, threshold, resampler)
+                 for k, (train_slice, test_slice) in enumerate(splits)]
+
+        if n_workers == 1:
+            results = [_run_fold(*task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                results = list(pool.map(_run_fold, *zip(*tasks)))
+    finally:
+        if own_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    folds = pd.DataFrame(results)
+    evaluated = folds[~folds['skipped']]
+    metric_cols = [col for col in evaluated.columns
+                   if col not in ('fold', 'skipped', 'train_start', 'test_start', 'test_end')]
+    summary = evaluated[metric_cols].agg(['mean', 'std']).T if len(evaluated) else pd.DataFrame()
+
+    if verbose:
+        logger.info(f"✅ {len(evaluated)}/{len(folds)} folds évalués")
+        if len(evaluated):
+            logger.info(f"   AUC: {summary.loc['auc', 'mean']:.4f} ± {summary.loc['auc', 'std']:.4f}")
+            logger.info(f"   Seuil optimal: {summary.loc['optimal_threshold', 'mean']:.4f} "
+                        f"± {summary.loc['optimal_threshold', 'std']:.4f}")
+            logger.info(f"   Coût total (seuil optimal): {summary.loc['optimal_total_cost', 'mean']:,.0f}€")
+
+    return folds, summary
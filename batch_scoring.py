@@ -0,0 +1,214 @@
+"""
+Batch Scoring
+=============
+
+Scoring en streaming de gros fichiers de transactions.
+
+Le fichier d'entrée est lu par blocs (iter_transactions), chaque bloc passe
+par create_features -> scaler.transform -> modèle dans un pool de processus,
+et les scores sont écrits au fil de l'eau dans le fichier de sortie.
+
+- Le détecteur est chargé une seule fois par worker, en mono-thread
+  (estimateurs, BLAS, numba): le parallélisme vient des processus
+- Time_Delta est correct aux frontières de blocs (prev_time)
+- Nombre de blocs en vol borné: mémoire constante quelle que soit la taille
+"""
+
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from fraud_detector import get_logger, iter_transactions
+from scoring import load_scorer
+
+
+logger = get_logger(__name__)
+
+
+# Détecteur propre à chaque processus worker
+_worker_detector = None
+
+
+# Pools de threads natifs limités dans les workers (bibliothèques pas
+# encore chargées: variables d'environnement; déjà chargées: threadpoolctl)
+_THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                    'NUMBA_NUM_THREADS')
+
+
+def _limit_threads():
+    """Un seul thread de calcul par worker: N workers = N coeurs, pas N x coeurs."""
+    for name in _THREAD_ENV_VARS:
+        os.environ[name] = '1'
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(limits=1)
+
+
+def _init_worker(model_path, single_thread=True):
+    """Charge le modèle une seule fois par processus."""
+    global _worker_detector
+    if single_thread:
+        _limit_threads()
+    _worker_detector = load_scorer(model_path, single_thread=single_thread)
+
+
+def _score_chunk(chunk, prev_time):
+    """Scores de fraude pour un bloc brut (exécuté dans le worker)."""
+    detector = _worker_detector
+    features = detector.create_features(chunk, prev_time=prev_time)
+    return detector.predict_proba(features[detector.feature_names])
+
+
+def _format_output(chunk, scores, threshold, keep_columns):
+    """Bloc de sortie: colonnes conservées + score (+ décision)."""
+    out = chunk[keep_columns].reset_index(drop=True) if keep_columns else pd.DataFrame()
+    out['fraud_probability'] = np.asarray(scores, dtype=np.float32)
+    if threshold is not None:
+        out['fraud_prediction'] = (scores >= threshold).astype(np.int8)
+    return out
+
+
+class _OutputWriter:
+    """Écriture incrémentale CSV ou Parquet."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.is_parquet = self.path.lower().endswith(('.parquet', '.pq'))
+        self._parquet_writer = None
+        self._header_written = False
+
+    def write(self, df):
+        if self.is_parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode='a' if self._header_written else 'w',
+                      header=not self._header_written, index=False)
+            self._header_written = True
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def score_file(model_path, input_path, output_path, chunksize=100_000,
+               n_workers=None, threshold=None, keep_columns=None,
+               max_pending=None, compact=False, verbose=True):
+    """
+    Score un fichier de transactions bloc par bloc sur un pool de processus.
+
+    Args:
+        model_path: modèle sauvegardé par save_model
+        input_path: CSV/Parquet/Feather de transactions brutes
+        output_path: fichier de scores (CSV, ou Parquet si .parquet)
+        chunksize: lignes par bloc
+        n_workers: processus (défaut: nombre de coeurs, 1 = sans pool)
+        threshold: si fourni, ajoute la décision fraud_prediction
+        keep_columns: colonnes d'entrée recopiées en sortie (ex: identifiants)
+        max_pending: blocs en vol (défaut: 2 par worker)
+        compact: lecture float32 (scores légèrement différents du modèle
+            entraîné en float64)
+
+    Returns:
+        dict avec nombre de lignes, blocs, durée et débit
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * n_workers
+    keep_columns = list(keep_columns or [])
+
+    writer = _OutputWriter(output_path)
+    n_rows = 0
+    n_chunks = 0
+    start = time.perf_counter()
+
+    if verbose:
+        logger.info(f"🚀 Scoring par blocs: {input_path} ({n_workers} workers, "
+                    f"{chunksize:,} lignes/bloc)")
+
+    try:
+        if n_workers == 1:
+            # Scoring dans ce processus: le parallélisme interne reste disponible
+            _init_worker(model_path, single_thread=False)
+            prev_time = None
+            for chunk in iter_transactions(input_path, chunksize=chunksize,
+                                           compact=compact):
+                scores = _score_chunk(chunk, prev_time)
+                prev_time = chunk['Time'].iloc[-1]
+                writer.write(_format_output(chunk, scores, threshold, keep_columns))
+                n_rows += len(chunk)
+                n_chunks += 1
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                     initargs=(model_path,)) as pool:
+                pending = deque()
+                prev_time = None
+
+                def drain_one():
+                    kept, future = pending.popleft()
+                    writer.write(_format_output(kept, future.result(), threshold, keep_columns))
+                    return len(kept)
+
+                for chunk in iter_transactions(input_path, chunksize=chunksize,
+                                               compact=compact):
+                    # Le Time précédent voyage avec le bloc; seules les
+                    # colonnes conservées restent en mémoire côté parent
+                    future = pool.submit(_score_chunk, chunk, prev_time)
+                    pending.append((chunk[keep_columns], future))
+                    prev_time = chunk['Time'].iloc[-1]
+                    n_chunks += 1
+
+                    # Écriture dans l'ordre, nombre de blocs en vol borné
+                    while len(pending) >= max_pending:
+                        n_rows += drain_one()
+
+                while pending:
+                    n_rows += drain_one()
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        'rows': n_rows,
+        'chunks': n_chunks,
+        'seconds': elapsed,
+        'rows_per_second': n_rows / elapsed if elapsed > 0 else 0.0
+    }
+
+    if verbose:
+        logger.info(f"✅ {n_rows:,} transactions scorées en {elapsed:.1f}s "
+                    f"({stats['rows_per_second']:,.0f} lignes/s) -> {output_path}")
+
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scoring de fraude par blocs")
+    parser.add_argument('model', help="Modèle sauvegardé (save_model)")
+    parser.add_argument('input', help="Fichier de transactions")
+    parser.add_argument('output', help="Fichier de scores (CSV ou Parquet)")
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--threshold', type=float, default=None)
+    parser.add_argument('--keep', nargs='*', default=None,
+                        help="Colonnes d'entrée à recopier en sortie")
+    args = parser.parse_args(argv)
+
+    score_file(args.model, args.input, args.output, chunksize=args.chunksize,
+               n_workers=args.workers, threshold=args.threshold,
+               keep_columns=args.keep)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+Benchmark
+=========
+
+Mesure de performance du pipeline sur le dataset synthétique
+(make_synthetic_transactions), de 10k à 10M transactions.
+
+Pour chaque taille et chaque algorithme, chaque étape est chronométrée
+(temps réel et CPU), avec débit (lignes/s) et pic de mémoire résidente:
+create_features, prepare_data, train, predict_proba,
+find_optimal_threshold, evaluate (+ load_data avec --with-io).
+
+Chaque couple (taille, algorithme) tourne dans un processus neuf, pour que
+les pics de mémoire ne se contaminent pas. Les résultats sont écrits en
+JSON; --baseline compare à un run précédent et sort en erreur si une étape
+régresse au-delà de la tolérance (usage: valider une montée de version).
+
+    python benchmark.py --scales 10k 100k 1M --output bench.json
+    python benchmark.py --scales 10k 100k 1M --baseline bench.json
+
+--startup mesure le démarrage d'un processus de scoring (scoring.py):
+temps d'import, de chargement du modèle, premier score, mémoire résidente.
+
+    python benchmark.py --startup fraud_model.fdm
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from fraud_detector import CreditCardFraudDetector, get_logger, make_synthetic_transactions
+
+
+logger = get_logger(__name__)
+
+
+DEFAULT_SCALES = [10_000, 100_000]
+DEFAULT_ALGORITHMS = ['random_forest', 'logistic', 'isolation_forest']
+STAGES = ['load_data', 'create_features', 'prepare_data', 'train', 'predict_proba',
+          'find_optimal_threshold', 'evaluate']
+
+
+def parse_scale(text):
+    """'10k' -> 10000, '1M' -> 1000000."""
+    text = str(text).strip().lower().replace('_', '')
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * multiplier)
+
+
+def _reset_peak_rss():
+    """Remet à zéro le pic RSS du processus (Linux >= 4.0), sinon False."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb(resettable):
+    """Pic RSS depuis le dernier reset (VmHWM), sinon depuis le démarrage."""
+    if resettable:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss: Ko sous Linux, octets sous macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _measure(stage, rows, func, results):
+    resettable = _reset_peak_rss()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    value = func()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    results.append({
+        'stage': stage,
+        'rows': rows,
+        'wall_seconds': wall,
+        'cpu_seconds': cpu,
+        'rows_per_second': rows / wall if wall > 0 else None,
+        'peak_rss_mb': _peak_rss_mb(resettable),
+        'peak_rss_per_stage': resettable
+    })
+    return value
+
+
+def run_case(n_rows, algorithm, with_io=False, random_state=42):
+    """Toutes les étapes pour une taille et un algorithme (processus courant)."""
+    results = []
+    detector = CreditCardFraudDetector(algorithm=algorithm, verbose=False)
+    df = make_synthetic_transactions(n_rows, random_state=random_state)
+
+    if with_io:
+        with tempfile.TemporaryDirectory(prefix='fraud_bench_') as workdir:
+            path = os.path.join(workdir, 'transactions.csv')
+            df.to_csv(path, index=False)
+            del df
+            df = _measure('load_data', n_rows, lambda: detector.load_data(path), results)
+
+    df_enhanced = _measure('create_features', n_rows,
+                           lambda: detector.create_features(df), results)
+    del df
+    X_train, X_test, y_train, y_test = _measure('prepare_data', n_rows,
+                                                lambda: detector.prepare_data(df_enhanced),
+                                                results)
+    _measure('train', len(X_train), lambda: detector.train(X_train, y_train), results)
+    _measure('predict_proba', len(X_test), lambda: detector.predict_proba(X_test), results)
+    threshold = _measure('find_optimal_threshold', len(X_test),
+                         lambda: detector.find_optimal_threshold(X_test, y_test,
+                                                                 metric='business'),
+                         results)
+    metrics = _measure('evaluate', len(X_test),
+                       lambda: detector.evaluate(X_test, y_test, threshold=threshold),
+                       results)
+
+    for result in results:
+        result.update({'scale': n_rows, 'algorithm': algorithm})
+    return {'results': results, 'auc': float(metrics['auc']), 'threshold': float(threshold)}
+
+
+def _environment():
+    import pandas as pd
+    import sklearn
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+
+def run_benchmark(scales=None, algorithms=None, with_io=False, isolate=True, verbose=True):
+    """
+    Lance le benchmark complet.
+
+    isolate: un processus neuf par (taille, algorithme), pour des pics de
+    mémoire indépendants.
+
+    Returns:
+        dict JSON-compatible: 'environment', 'results' (une ligne par
+        étape), 'quality' (AUC et seuil de chaque cas)
+    """
+    scales = [parse_scale(s) for s in (scales or DEFAULT_SCALES)]
+    algorithms = list(algorithms or DEFAULT_ALGORITHMS)
+    report = {'environment': _environment(), 'results': [], 'quality': []}
+
+    for n_rows in scales:
+        for algorithm in algorithms:
+            if verbose:
+                logger.info(f"⏱️ {algorithm} sur {n_rows:,} transactions...")
+            if isolate:
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    case = pool.submit(run_case, n_rows, algorithm, with_io).result()
+            else:
+                case = run_case(n_rows, algorithm, with_io)
+
+            report['results'].extend(case['results'])
+            report['quality'].append({'scale': n_rows, 'algorithm': algorithm,
+                                      'auc': case['auc'], 'threshold': case['threshold']})
+            if verbose:
+                for row in case['results']:
+                    logger.info(f"   {row['stage']:24} {row['wall_seconds']:8.3f}s "
+                                f"{row['rows_per_second'] or 0:12,.0f} lignes/s "
+                                f"{row['peak_rss_mb']:8.0f} Mo")
+
+    return report
+
+
+def compare(report, baseline, tolerance=0.10, min_seconds=0.05):
+    """
+    Compare un rapport à une baseline, étape par étape.
+
+    Une régression: temps réel ou pic RSS au-delà de (1 + tolerance) fois
+    la baseline. Les étapes de moins de min_seconds ne sont pas jugées sur
+    le temps (bruit de mesure).
+
+    Returns:
+        liste de dicts (une entrée par étape commune), avec 'regressions'
+    """
+    def key(row):
+        return (row['scale'], row['algorithm'], row['stage'])
+
+    reference = {key(row): row for row in baseline['results']}
+    comparison = []
+    for row in report['results']:
+        base = reference.get(key(row))
+        if base is None:
+            continue
+        time_ratio = row['wall_seconds'] / base['wall_seconds'] if base['wall_seconds'] > 0 else None
+        rss_ratio = row['peak_rss_mb'] / base['peak_rss_mb'] if base['peak_rss_mb'] > 0 else None
+
+        regressions = []
+        if (time_ratio is not None and time_ratio > 1 + tolerance
+                and max(row['wall_seconds'], base['wall_seconds']) >= min_seconds):
+            regressions.append('time')
+        if rss_ratio is not None and rss_ratio > 1 + tolerance:
+            regressions.append('memory')
+
+        comparison.append({
+            'scale': row['scale'],
+            'algorithm': row['algorithm'],
+            'stage': row['stage'],
+            'wall_seconds': row['wall_seconds'],
+            'baseline_wall_seconds': base['wall_seconds'],
+            'time_ratio': time_ratio,
+            'peak_rss_mb': row['peak_rss_mb'],
+            'baseline_peak_rss_mb': base['peak_rss_mb'],
+            'rss_ratio': rss_ratio,
+            'regressions': regressions
+        })
+    return comparison
+
+
+# Exécuté dans un interpréteur neuf: aucun module déjà importé
+_STARTUP_SCRIPT = r"""
+import json, resource, sys, time
+
+start = time.perf_counter()
+from scoring import load_scorer
+imported = time.perf_counter()
+scorer = load_scorer(sys.argv[1])
+loaded = time.perf_counter()
+scorer.score_many([[0.0] * len(scorer.scoring_columns())])
+scored = time.perf_counter()
+
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+heavy = ['sklearn', 'scipy', 'matplotlib', 'seaborn', 'imblearn', 'joblib', 'numba']
+print(json.dumps({
+    'import_seconds': imported - start,
+    'load_seconds': loaded - imported,
+    'first_score_seconds': scored - loaded,
+    'peak_rss_mb': peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024,
+    'heavy_modules': [name for name in heavy if name in sys.modules]
+}))
+"""
+
+
+def measure_startup(model_path, repeats=3):
+    """
+    Démarrage à froid d'un processus de scoring (scoring.load_scorer).
+
+    Chaque mesure tourne dans un interpréteur neuf; on garde la médiane.
+
+    Returns:
+        dict: import_seconds, load_seconds, first_score_seconds, peak_rss_mb,
+        heavy_modules (dépendances lourdes effectivement importées)
+    """
+    runs = []
+    for _ in range(repeats):
+        completed = subprocess.run(
+            [sys.executable, '-c', _STARTUP_SCRIPT, os.path.abspath(model_path)],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True)
+        runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    result = {key: float(np.median([run[key] for run in runs]))
+              for key in ('import_seconds', 'load_seconds', 'first_score_seconds', 'peak_rss_mb')}
+    result['heavy_modules'] = runs[-1]['heavy_modules']
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark du pipeline de détection de fraude")
+    parser.add_argument('--scales', nargs='+', default=[str(s) for s in DEFAULT_SCALES],
+                        help="Tailles (ex: 10k 100k 1M 10M)")
+    parser.add_argument('--algorithms', nargs='+', default=DEFAULT_ALGORITHMS)
+    parser.add_argument('--with-io', action='store_true',
+                        help="Inclut load_data (écriture puis lecture d'un CSV)")
+    parser.add_argument('--no-isolate', action='store_true',
+                        help="Tout dans le processus courant (pics RSS cumulés)")
+    parser.add_argument('--output', default=None, help="Fichier JSON de résultats")
+    parser.add_argument('--baseline', default=None, help="JSON d'un run précédent")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="Régression tolérée (0.10 = +10%%)")
+    parser.add_argument('--startup', default=None, metavar='MODEL',
+                        help="Mesure seulement le démarrage d'un processus de scoring")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        startup = measure_startup(args.startup)
+        print(f"🚀 Démarrage du scoring ({args.startup}):")
+        print(f"   Import:        {startup['import_seconds']:.3f}s")
+        print(f"   Chargement:    {startup['load_seconds']:.3f}s")
+        print(f"   Premier score: {startup['first_score_seconds']:.3f}s")
+        print(f"   Pic RSS:       {startup['peak_rss_mb']:.0f} Mo")
+        print(f"   Modules lourds: {', '.join(startup['heavy_modules']) or 'aucun'}")
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump({'environment': _environment(), 'startup': startup}, f, indent=2)
+        return 0
+
+    report = run_benchmark(args.scales, args.algorithms, with_io=args.with_io,
+                           isolate=not args.no_isolate)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Résultats: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        comparison = compare(report, baseline, tolerance=args.tolerance)
+        regressions = [row for row in comparison if row['regressions']]
+
+        print(f"\n📊 Comparaison avec {args.baseline} (tolérance {args.tolerance:.0%}):")
+        for row in comparison:
+            flag = '❌' if row['regressions'] else '✅'
+            ratio = f"x{row['time_ratio']:.2f}" if row['time_ratio'] is not None else '-'
+            rss = f"x{row['rss_ratio']:.2f}" if row['rss_ratio'] is not None else '-'
+            print(f"   {flag} {row['algorithm']:16} {row['scale']:>10,} {row['stage']:24} "
+                  f"temps {ratio:>6}  mémoire {rss:>6}")
+
+        if regressions:
+            print(f"⚠️ {len(regressions)} régression(s) détectée(s)")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""
+Cascade Detector
+================
+
+Scoring en cascade: un modèle bon marché d'abord, la forêt seulement pour
+les transactions incertaines.
+
+- Étage 1 (logistic par défaut): score de toutes les transactions
+- Étage 2 (random_forest par défaut): uniquement si le score de l'étage 1
+  tombe dans la bande d'incertitude [low, high)
+- Sous low: légitime sans appel à la forêt; à partir de high: alerte
+
+Les bornes sont réglées sur une moitié des données de validation (lignes
+paires) et vérifiées sur l'autre: tant que les tolérances ne tiennent pas
+sur la moitié de contrôle, la bande est élargie (recall de contrôle dans
+tuning['recall_cascade_check']). Par rapport aux décisions de la forêt
+seule au même seuil:
+- low: le plus haut possible tant que les fraudes détectées par la forêt
+  mais écartées par l'étage 1 restent sous target_recall_loss (en points
+  de recall)
+- high: le plus bas possible tant que les alertes ajoutées à tort
+  (légitimes que la forêt n'aurait pas signalées) restent sous
+  max_alert_increase (en part des alertes de la forêt)
+
+    cascade = CascadeDetector(target_recall_loss=0.005)
+    cascade.fit(X_train, y_train, X_val, y_val, threshold=0.5)
+    probas = cascade.predict_proba(X_test)
+    print(cascade.report(X_test, y_test))
+"""
+
+import time
+
+import numpy as np
+
+from fraud_detector import CreditCardFraudDetector, get_logger
+
+
+logger = get_logger(__name__)
+
+
+# Divisions par 2 essayées sous la borne low la plus prudente de la moitié
+# de réglage, avant de renoncer à écarter des transactions (low = -inf)
+_MARGIN_STEPS = 10
+
+
+class CascadeDetector:
+    """
+    Deux CreditCardFraudDetector chaînés (mêmes features, même scaler).
+
+    Le score renvoyé est celui de l'étage qui a décidé, ramené du bon côté
+    du seuil pour les transactions hors bande: score >= threshold équivaut
+    toujours à la décision de la cascade (evaluate, CostCurve... restent
+    utilisables tels quels).
+    """
+
+    def __init__(self, first=None, second=None, target_recall_loss=0.005,
+                 max_alert_increase=0.01, verbose=True):
+        self.first = first if first is not None else CreditCardFraudDetector(
+            algorithm='logistic', verbose=False)
+        self.second = second if second is not None else CreditCardFraudDetector(
+            algorithm='random_forest', verbose=False)
+        self.target_recall_loss = target_recall_loss
+        self.max_alert_increase = max_alert_increase
+        self.verbose = verbose
+        self.threshold = None
+        self.low = None
+        self.high = None
+        self.tuning = {}
+        self._shared_scaler = True
+
+    def fit(self, X_train, y_train, X_val, y_val, threshold=None, train=True):
+        """
+        Entraîne les deux étages (sauf train=False: détecteurs déjà
+        entraînés) puis règle la bande sur (X_val, y_val).
+
+        threshold: seuil de décision de la forêt (défaut: son seuil
+        sauvegardé, sinon 0.5)
+        """
+        if train:
+            if self.verbose:
+                logger.info(f"🤖 Entraînement de la cascade: {self.first.algorithm} "
+                            f"-> {self.second.algorithm}")
+            self.first.train(X_train, y_train)
+            self.second.train(X_train, y_train)
+        return self.tune(X_val, y_val, threshold)
+
+    def _stage_scores(self, X):
+        """Features normalisées une seule fois, score de l'étage 1."""
+        X_scaled = self.first.scaler.transform(X)
+        return X_scaled, self.first._proba_from_scaled(X_scaled)
+
+    def _second_scores(self, X, X_scaled, rows=None):
+        """Scores de l'étage 2 (toutes les lignes, ou le masque rows)."""
+        if self._shared_scaler:
+            return self.second._proba_from_scaled(X_scaled if rows is None else X_scaled[rows])
+        # Étages entraînés séparément: normalisation propre à l'étage 2
+        X_rows = X if rows is None else X[rows]
+        return self.second._proba_from_scaled(self.second.scaler.transform(X_rows))
+
+    def tune(self, X_val, y_val, threshold=None):
+        """Règle low/high sur la validation (voir l'en-tête du module)."""
+        if threshold is None:
+            threshold = self.second.threshold if self.second.threshold is not None else 0.5
+        self.threshold = threshold
+        # Même normalisation (mêmes données d'entraînement): un seul transform
+        self._shared_scaler = (
+            np.array_equal(self.first.scaler.mean_, self.second.scaler.mean_)
+            and np.array_equal(self.first.scaler.scale_, self.second.scaler.scale_))
+
+        X_scaled, first_scores = self._stage_scores(X_val)
+        second_scores = self._second_scores(X_val, X_scaled)
+        y = np.asarray(y_val).astype(bool)
+        forest_alert = second_scores >= threshold
+        fit, check = slice(0, None, 2), slice(1, None, 2)
+
+        # low: les fraudes détectées par la forêt sous low sont perdues.
+        # Candidats du plus agressif au plus prudent: bornes de la moitié de
+        # réglage, puis divisions par 2 sous la plus basse, puis -inf
+        caught = np.sort(first_scores[fit][y[fit] & forest_alert[fit]])
+        allowed_lost = int(np.floor(self.target_recall_loss * y[fit].sum()))
+        lows = ([caught[allowed_lost]] if allowed_lost < len(caught) else [np.inf])
+        lows += list(caught[:min(allowed_lost, len(caught))][::-1])
+        if len(caught):
+            lows += list(caught[0] * 0.5 ** np.arange(1, _MARGIN_STEPS + 1))
+        lows.append(-np.inf)
+        caught_check = first_scores[check][y[check] & forest_alert[check]]
+        max_lost_check = self.target_recall_loss * y[check].sum()
+        low = next(low for low in lows if (caught_check < low).sum() <= max_lost_check)
+
+        # high: les légitimes non signalées par la forêt au-dessus de high
+        # deviennent des alertes (+inf: aucune alerte ajoutée)
+        spared = np.sort(first_scores[fit][~y[fit] & ~forest_alert[fit]])[::-1]
+        allowed_alerts = int(np.floor(self.max_alert_increase * forest_alert[fit].sum()))
+        highs = ([np.nextafter(spared[allowed_alerts], np.inf)] if allowed_alerts < len(spared)
+                 else [-np.inf])
+        highs += [np.nextafter(score, np.inf)
+                  for score in spared[:min(allowed_alerts, len(spared))][::-1]] + [np.inf]
+        spared_check = first_scores[check][~y[check] & ~forest_alert[check]]
+        max_added_check = self.max_alert_increase * forest_alert[check].sum()
+        high = next(high for high in highs if (spared_check >= high).sum() <= max_added_check)
+
+        # Bande vide ou inversée: l'étage 1 décide seul
+        self.low = float(low)
+        self.high = float(max(high, low))
+
+        decisions = self._combine(first_scores, second_scores) >= threshold
+
+        def recall(alerts, rows=slice(None)):
+            n_frauds = int(y[rows].sum())
+            return float((alerts[rows] & y[rows]).sum() / n_frauds) if n_frauds else 0.0
+
+        self.tuning = {
+            'threshold': threshold,
+            'low': self.low,
+            'high': self.high,
+            'second_stage_fraction': float(self._in_band(first_scores).mean()),
+            'recall_forest': recall(forest_alert),
+            'recall_cascade': recall(decisions),
+            # Moitié de contrôle, non utilisée pour placer les bornes
+            'recall_forest_check': recall(forest_alert, check),
+            'recall_cascade_check': recall(decisions, check),
+            'alerts_forest': int(forest_alert.sum()),
+            'alerts_cascade': int(decisions.sum())
+        }
+
+        if self.verbose:
+            logger.info(f"🎚️ Bande d'incertitude: [{self.low:.4f}, {self.high:.4f}) "
+                        f"-> {self.tuning['second_stage_fraction']:.1%} des transactions vers "
+                        f"{self.second.algorithm}")
+            logger.info(f"   Recall: {self.tuning['recall_cascade']:.3%} "
+                        f"(forêt seule: {self.tuning['recall_forest']:.3%})")
+
+        return self
+
+    def _in_band(self, first_scores):
+        return (first_scores >= self.low) & (first_scores < self.high)
+
+    def _combine(self, first_scores, second_scores, band=None):
+        """Score final; second_scores: tableau complet ou scores de la bande."""
+        if band is None:
+            band = self._in_band(first_scores)
+        below_threshold = np.nextafter(self.threshold, -np.inf)
+        scores = np.where(first_scores < self.low,
+                          np.minimum(first_scores, below_threshold),
+                          np.maximum(first_scores, self.threshold))
+        if len(second_scores) == len(first_scores):
+            scores[band] = second_scores[band]
+        else:
+            scores[band] = second_scores
+        return scores
+
+    def predict_proba(self, X):
+        """Score de fraude; la forêt ne tourne que sur la bande d'incertitude."""
+        if self.low is None:
+            raise ValueError("Cascade non réglée: appelez fit() ou tune()")
+        X_scaled, first_scores = self._stage_scores(X)
+        band = self._in_band(first_scores)
+        second_scores = (self._second_scores(X, X_scaled, band) if band.any()
+                         else np.empty(0, dtype=np.float64))
+        return self._combine(first_scores, second_scores, band)
+
+    def predict(self, X):
+        return (self.predict_proba(X) >= self.threshold).astype(int)
+
+    def report(self, X_test, y_test, repeats=3):
+        """
+        Cascade contre forêt seule: part des transactions envoyées à la
+        forêt, recall/précision, et coût moyen de scoring par transaction
+        (meilleur de `repeats` passages).
+        """
+        y = np.asarray(y_test).astype(bool)
+
+        def timed(func):
+            best, result = np.inf, None
+            for _ in range(repeats):
+                start = time.perf_counter()
+                result = func()
+                best = min(best, time.perf_counter() - start)
+            return best, result
+
+        forest_seconds, forest_scores = timed(lambda: self.second.predict_proba(X_test))
+        cascade_seconds, cascade_scores = timed(lambda: self.predict_proba(X_test))
+        _, first_scores = self._stage_scores(X_test)
+
+        rows = {}
+        for name, scores, seconds in (('forest', forest_scores, forest_seconds),
+                                      ('cascade', cascade_scores, cascade_seconds)):
+            alerts = scores >= self.threshold
+            tp = int((alerts & y).sum())
+            rows[name] = {
+                'recall': tp / int(y.sum()) if y.sum() else 0.0,
+                'precision': tp / int(alerts.sum()) if alerts.sum() else 0.0,
+                'alerts': int(alerts.sum()),
+                'microseconds_per_row': seconds / max(len(y), 1) * 1e6
+            }
+
+        result = {
+            'second_stage_fraction': float(self._in_band(first_scores).mean()),
+            'speedup': forest_seconds / cascade_seconds if cascade_seconds > 0 else None,
+            **{f'{stage}_{key}': value for stage, metrics in rows.items()
+               for key, value in metrics.items()}
+        }
+
+        if self.verbose:
+            logger.info("⚡ Cascade vs forêt seule:")
+            logger.info(f"   Transactions vers la forêt: {result['second_stage_fraction']:.1%}")
+            logger.info(f"   Coût/transaction: {rows['cascade']['microseconds_per_row']:.2f} µs "
+                        f"vs {rows['forest']['microseconds_per_row']:.2f} µs "
+                        f"(x{result['speedup']:.1f})")
+            logger.info(f"   Recall: {rows['cascade']['recall']:.3%} vs {rows['forest']['recall']:.3%}")
+            logger.info(f"   Précision: {rows['cascade']['precision']:.3%} "
+                        f"vs {rows['forest']['precision']:.3%}")
+
+        return result
+
+    def save(self, filepath):
+        """Sauvegarde joblib des deux étages et de la bande."""
+        import joblib
+
+        for detector in (self.first, self.second):
+            detector._score_cache = {}
+        joblib.dump({'first': self.first, 'second': self.second, 'low': self.low,
+                     'high': self.high, 'threshold': self.threshold, 'tuning': self.tuning,
+                     'shared_scaler': self._shared_scaler,
+                     'target_recall_loss': self.target_recall_loss,
+                     'max_alert_increase': self.max_alert_increase}, filepath)
+
+    @classmethod
+    def load(cls, filepath, verbose=False):
+        import joblib
+
+        data = joblib.load(filepath)
+        cascade = cls(data['first'], data['second'], data['target_recall_loss'],
+                      data['max_alert_increase'], verbose=verbose)
+        cascade.low, cascade.high = data['low'], data['high']
+        cascade.threshold = data['threshold']
+        cascade.tuning = data['tuning']
+        cascade._shared_scaler = data['shared_scaler']
+        return cascade
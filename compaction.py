@@ -0,0 +1,210 @@
+"""
+Forest Compaction
+=================
+
+Compactage d'un random_forest entraîné pour les machines de scoring
+contraintes (taille et latence), sous tolérance de précision mesurée sur
+des données de validation, par rapport à la forêt complète:
+- max_auc_loss: perte d'AUC admise (en points, 0.001 = 0.1 point)
+- max_recall_loss: perte de recall admise au seuil de décision
+- max_precision_loss: perte de précision admise au même seuil (None: non
+  contrainte)
+
+Étapes (forêt aplatie, voir compiled_forest):
+1. Sélection gloutonne d'arbres: on ajoute à chaque étape l'arbre qui
+   maximise l'AUC de la moyenne sur une moitié de la validation (lignes
+   paires), jusqu'à respecter les tolérances sur chacune des deux moitiés
+   (l'autre moitié limite le surapprentissage de l'ordre glouton)
+2. Fusion des sous-arbres à faible impact (CompiledForest.collapse): la
+   plus grande tolérance par arbre de COLLAPSE_TOLERANCES qui respecte
+   encore les tolérances
+3. Optionnel: seuils et valeurs en float32 ou float16 (repli sur une
+   précision plus haute si les tolérances ne sont plus respectées)
+
+Le détecteur compacté se sauvegarde par save_model (joblib ou .fdm).
+
+    compact, report = compact_forest(detector, X_val, y_val, max_auc_loss=0.001,
+                                     dtype='float16')
+    compact.save_model('fraud_model_compact.fdm')
+"""
+
+import copy
+import time
+
+import numpy as np
+
+from compiled_forest import CompiledForest
+from fraud_detector import get_logger
+from model_format import ForestScorer
+
+
+logger = get_logger(__name__)
+
+
+# Tolérances essayées pour la fusion des sous-arbres, de la plus agressive
+# à la plus prudente
+COLLAPSE_TOLERANCES = (0.2, 0.1, 0.05, 0.02, 0.01, 0.005, 0.002, 0.001)
+
+_FALLBACK_DTYPES = {'float16': ['float16', 'float32'], 'float32': ['float32']}
+
+
+def _auc_many(y, scores):
+    """AUC de chaque ligne de scores (n_candidats, n_rows), ex-aequo moyennés."""
+    from scipy.stats import rankdata
+
+    n_pos = y.sum()
+    n_neg = len(y) - n_pos
+    if n_pos == 0 or n_neg == 0:
+        return np.full(len(scores), np.nan)
+    ranks = rankdata(scores, axis=1)
+    return (ranks[:, y].sum(axis=1) - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+
+def _metrics(y, proba, threshold):
+    alerts = proba >= threshold
+    tp = int((alerts & y).sum())
+    return {
+        'auc': float(_auc_many(y, proba[None])[0]),
+        'recall': tp / int(y.sum()) if y.sum() else 0.0,
+        'precision': tp / int(alerts.sum()) if alerts.sum() else 0.0
+    }
+
+
+def _latency(detector, X_scaled, repeats=5):
+    """Scoring du lot (µs par ligne) et d'une ligne seule (µs), meilleur passage."""
+    def best(func):
+        seconds = np.inf
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            seconds = min(seconds, time.perf_counter() - start)
+        return seconds
+
+    batch = best(lambda: detector._proba_from_scaled(X_scaled))
+    one = best(lambda: detector._proba_from_scaled(X_scaled[:1]))
+    return {'microseconds_per_row': batch / len(X_scaled) * 1e6,
+            'single_row_microseconds': one * 1e6}
+
+
+def compact_forest(detector, X_val, y_val, max_auc_loss=0.001, max_recall_loss=0.005,
+                   max_precision_loss=None, threshold=None, select_trees=True,
+                   collapse=True, dtype=None, verbose=True):
+    """
+    Compacte la forêt d'un détecteur random_forest entraîné.
+
+    threshold: seuil du recall (défaut: seuil du détecteur, sinon 0.5)
+    dtype: None (float64), 'float32' ou 'float16' pour seuils et valeurs
+
+    Returns:
+        (détecteur compacté, rapport avant/après: taille, latence, précision)
+        Le détecteur d'origine n'est pas modifié (scaler et features partagés).
+    """
+    if detector.algorithm != 'random_forest':
+        raise ValueError("Compactage disponible uniquement pour random_forest")
+    if dtype not in (None, 'float32', 'float16'):
+        raise ValueError(f"dtype inconnu: {dtype}")
+    if threshold is None:
+        threshold = detector.threshold if detector.threshold is not None else 0.5
+
+    y = np.asarray(y_val).astype(bool)
+    # Moitiés de validation (lignes paires / impaires, voir l'étape 1)
+    for half in (y[0::2], y[1::2]):
+        if half.all() or not half.any():
+            raise ValueError("Validation insuffisante: chaque moitié (lignes paires et "
+                             "impaires) doit contenir au moins une fraude et une "
+                             "transaction légitime")
+    X_scaled = detector.scaler.transform(X_val)
+    scorer = detector.model if isinstance(detector.model, ForestScorer) else None
+    forest = (scorer.forest if scorer is not None
+              else CompiledForest.from_sklearn(detector.model, feature_names=detector.feature_names))
+
+    tree_proba = forest.predict_trees(X_scaled)
+    full = _metrics(y, tree_proba.mean(axis=0), threshold)
+
+    def acceptable(proba, rows=slice(None), reference=full):
+        metrics = _metrics(y[rows], proba, threshold)
+        return (metrics['auc'] >= reference['auc'] - max_auc_loss
+                and metrics['recall'] >= reference['recall'] - max_recall_loss
+                and (max_precision_loss is None
+                     or metrics['precision'] >= reference['precision'] - max_precision_loss))
+
+    # 1. Sélection gloutonne des arbres
+    trees = list(range(forest.n_trees))
+    if select_trees:
+        halves = [slice(0, None, 2), slice(1, None, 2)]
+        references = [_metrics(y[rows], tree_proba[:, rows].mean(axis=0), threshold)
+                      for rows in halves]
+        fit = halves[0]
+        trees = []
+        remaining = np.arange(forest.n_trees)
+        total = np.zeros(len(y), dtype=np.float64)
+        while len(remaining):
+            candidates = (total[fit] + tree_proba[remaining][:, fit]) / (len(trees) + 1)
+            best = int(np.argmax(_auc_many(y[fit], candidates)))
+            trees.append(int(remaining[best]))
+            total += tree_proba[remaining[best]]
+            remaining = np.delete(remaining, best)
+            if all(acceptable(total[rows] / len(trees), rows, reference)
+                   for rows, reference in zip(halves, references)):
+                break
+        trees.sort()
+        forest_compact = forest.subset(trees)
+    else:
+        forest_compact = forest
+
+    # 2. Fusion des sous-arbres à faible impact
+    collapse_tolerance = None
+    if collapse:
+        for tolerance in COLLAPSE_TOLERANCES:
+            candidate = forest_compact.collapse(tolerance)
+            if acceptable(candidate.predict_proba(X_scaled, engine='numpy')):
+                forest_compact, collapse_tolerance = candidate, tolerance
+                break
+
+    # 3. Précision réduite
+    stored_dtype = 'float64'
+    for name in _FALLBACK_DTYPES.get(dtype, []):
+        candidate = forest_compact.astype(name)
+        if acceptable(candidate.predict_proba(X_scaled, engine='numpy')):
+            forest_compact, stored_dtype = candidate, name
+            break
+
+    if scorer is not None:
+        importances = scorer.feature_importances_
+    else:
+        importances = np.mean([detector.model.estimators_[i].feature_importances_
+                               for i in trees], axis=0)
+        importances = importances / importances.sum() if importances.sum() > 0 else importances
+
+    compact = copy.copy(detector)
+    compact.model = ForestScorer(forest_compact, importances)
+    compact._score_cache = {}
+
+    after = _metrics(y, compact._proba_from_scaled(X_scaled), threshold)
+    report = {
+        'threshold': threshold,
+        'n_trees': (forest.n_trees, forest_compact.n_trees),
+        'n_nodes': (forest.n_nodes, forest_compact.n_nodes),
+        'bytes': (forest.nbytes, forest_compact.nbytes),
+        'collapse_tolerance': collapse_tolerance,
+        'dtype': stored_dtype,
+        'before': {**full, **_latency(detector, X_scaled)},
+        'after': {**after, **_latency(compact, X_scaled)}
+    }
+
+    if verbose:
+        before, after = report['before'], report['after']
+        logger.info("🗜️ Compactage de la forêt:")
+        logger.info(f"   Arbres: {forest.n_trees} -> {forest_compact.n_trees}, "
+                    f"noeuds: {forest.n_nodes:,} -> {forest_compact.n_nodes:,} "
+                    f"(fusion: {collapse_tolerance}, {stored_dtype})")
+        logger.info(f"   Taille: {forest.nbytes / 1024:.0f} Ko -> {forest_compact.nbytes / 1024:.0f} Ko")
+        logger.info(f"   Latence: {before['microseconds_per_row']:.2f} -> "
+                    f"{after['microseconds_per_row']:.2f} µs/transaction, "
+                    f"{before['single_row_microseconds']:.0f} -> "
+                    f"{after['single_row_microseconds']:.0f} µs/ligne seule")
+        logger.info(f"   AUC: {before['auc']:.4f} -> {after['auc']:.4f}, "
+                    f"Recall: {before['recall']:.3%} -> {after['recall']:.3%}, "
+                    f"Précision: {before['precision']:.3%} -> {after['precision']:.3%}")
+
+    return compact, report
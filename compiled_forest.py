@@ -0,0 +1,383 @@
+"""
+Compiled Forest
+===============
+
+Inférence du random forest sur tableaux numpy contigus.
+
+La forêt scikit-learn est aplatie en tableaux de noeuds (feature, seuil,
+fils gauche/droit, valeur de feuille). La normalisation StandardScaler est
+repliée dans les seuils: on score directement les features brutes
+(colonnes feature_names de create_features), sans scaler.transform ni
+estimateurs scikit-learn à désérialiser.
+
+Les probabilités sont identiques bit à bit à detector.predict_proba
+(accumulation des arbres dans l'ordre, comme n_jobs=1).
+"""
+
+import functools
+import importlib.util
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+_SIGN_BIT = np.uint64(0x8000000000000000)
+
+# Noyau numba (forest_kernel) importé au premier scoring: numba est lourd à
+# importer, l'import de ce module reste léger
+_kernel = None
+
+
+@functools.lru_cache(maxsize=None)
+def _numba_available():
+    return importlib.util.find_spec('numba') is not None
+
+
+def _load_kernel():
+    """Module forest_kernel (numba compilé), ou None si numba n'est pas installé."""
+    global _kernel
+    if _kernel is None:
+        try:
+            import forest_kernel
+        except ImportError:
+            return None
+        _kernel = forest_kernel
+    return _kernel
+
+
+def _float_to_ordered(x):
+    """float64 -> uint64 dont l'ordre suit celui des flottants."""
+    bits = np.ascontiguousarray(x, dtype=np.float64).view(np.uint64)
+    return np.where(bits & _SIGN_BIT, ~bits, bits | _SIGN_BIT)
+
+
+def _ordered_to_float(u):
+    """Inverse de _float_to_ordered."""
+    bits = np.where(u & _SIGN_BIT, u & ~_SIGN_BIT, ~u)
+    return bits.view(np.float64)
+
+
+def _fold_thresholds(thresholds, mean, scale):
+    """
+    Seuils bruts T tels que  x <= T  <=>  float32((x - mean) / scale) <= t.
+
+    Le modèle compare des features normalisées converties en float32 (comme
+    scikit-learn). L'application étant monotone, le plus grand float64
+    vérifiant la condition se trouve par dichotomie sur la représentation
+    binaire ordonnée: repli exact, décisions identiques.
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    mean = np.asarray(mean, dtype=np.float64)
+    scale = np.asarray(scale, dtype=np.float64)
+
+    def goes_left(x):
+        with np.errstate(over='ignore', invalid='ignore'):
+            scaled = ((x - mean) / scale).astype(np.float32).astype(np.float64)
+        return scaled <= thresholds
+
+    largest = np.finfo(np.float64).max
+    lo = _float_to_ordered(np.full(len(thresholds), -largest))
+    hi = _float_to_ordered(np.full(len(thresholds), largest))
+
+    all_left = goes_left(np.full(len(thresholds), largest))
+    none_left = ~goes_left(np.full(len(thresholds), -largest))
+
+    # Invariant: goes_left(lo) et not goes_left(hi)
+    active = ~(all_left | none_left)
+    while True:
+        todo = active & (hi - lo > 1)
+        if not todo.any():
+            break
+        mid = lo + (hi - lo) // np.uint64(2)
+        left = goes_left(_ordered_to_float(mid))
+        lo = np.where(todo & left, mid, lo)
+        hi = np.where(todo & ~left, mid, hi)
+
+    folded = _ordered_to_float(lo)
+    folded[all_left] = np.inf
+    folded[none_left] = -np.inf
+    return folded
+
+
+class CompiledForest:
+    """
+    Random forest aplatie en tableaux de noeuds contigus.
+
+    - feature / threshold: test de chaque noeud (x[feature] <= threshold)
+    - left / right: indices globaux des fils (une feuille boucle sur elle-même)
+    - value: probabilité de fraude de la feuille
+    - roots: indice du noeud racine de chaque arbre
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots,
+                 max_depth, feature_names=None, scaled_input=False):
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold)
+        self.left = np.ascontiguousarray(left, dtype=np.int32)
+        self.right = np.ascontiguousarray(right, dtype=np.int32)
+        self.value = np.ascontiguousarray(value)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.max_depth = int(max_depth)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        # True si les seuils portent sur des features déjà normalisées
+        self.scaled_input = bool(scaled_input)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left,
+                                      self.right, self.value, self.roots))
+
+    @classmethod
+    def from_detector(cls, detector, fold_scaler=True):
+        """
+        Compile le random forest d'un CreditCardFraudDetector entraîné.
+
+        fold_scaler: replie le StandardScaler dans les seuils (entrée brute);
+        sinon l'entrée doit être déjà normalisée.
+        """
+        if detector.algorithm != 'random_forest':
+            raise ValueError("Compilation disponible uniquement pour random_forest")
+
+        # Modèle chargé depuis un artefact mappé: forêt déjà aplatie
+        compiled = getattr(detector.model, 'forest', None)
+        if compiled is None:
+            compiled = cls.from_sklearn(detector.model, feature_names=detector.feature_names)
+        return compiled.fold_scaler(detector.scaler) if fold_scaler else compiled
+
+    @classmethod
+    def from_sklearn(cls, forest, scaler=None, feature_names=None):
+        """Aplatit un RandomForestClassifier binaire (et son scaler éventuel)."""
+        positive = int(np.flatnonzero(forest.classes_ == 1)[0]) if 1 in forest.classes_ else 1
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left < 0
+
+            tree_value = tree.value[:, 0, :].astype(np.float64)
+            totals = tree_value.sum(axis=1)
+            if np.allclose(totals, 1.0):
+                # scikit-learn >= 1.4: value contient déjà les fractions
+                proba = tree_value[:, positive]
+            else:
+                # Anciennes versions: predict_proba normalise les effectifs
+                normalizer = np.where(totals == 0.0, 1.0, totals)
+                proba = tree_value[:, positive] / normalizer
+
+            node_ids = np.arange(n, dtype=np.int64) + offset
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+            values.append(proba)
+            roots.append(offset)
+
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        compiled = cls(np.concatenate(features), np.concatenate(thresholds),
+                       np.concatenate(lefts), np.concatenate(rights),
+                       np.concatenate(values), roots, max_depth, feature_names,
+                       scaled_input=True)
+        return compiled.fold_scaler(scaler) if scaler is not None else compiled
+
+    def fold_scaler(self, scaler):
+        """Nouvelle forêt dont les seuils portent sur les features brutes."""
+        if not self.scaled_input:
+            raise ValueError("Le scaler est déjà replié dans les seuils")
+
+        n_features = len(scaler.scale_)
+        mean = scaler.mean_ if getattr(scaler, 'with_mean', True) else np.zeros(n_features)
+        scale = scaler.scale_ if getattr(scaler, 'with_std', True) else np.ones(n_features)
+
+        internal = np.isfinite(self.threshold)
+        threshold = np.array(self.threshold, dtype=np.float64)
+        threshold[internal] = _fold_thresholds(threshold[internal],
+                                               np.asarray(mean)[self.feature[internal]],
+                                               np.asarray(scale)[self.feature[internal]])
+
+        return CompiledForest(self.feature, threshold, self.left, self.right, self.value,
+                              self.roots, self.max_depth, self.feature_names,
+                              scaled_input=False)
+
+    def _prepare(self, X):
+        if hasattr(X, 'columns') and self.feature_names is not None:
+            X = X[self.feature_names]
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if self.scaled_input:
+            # Même arrondi float32 que scikit-learn sur les features normalisées
+            X = X.astype(np.float32).astype(np.float64)
+        return X
+
+    def _leaf_values(self, X):
+        """Valeur de la feuille atteinte, par arbre: tableau (n_trees, n_rows)."""
+        n_rows, n_features = X.shape
+        n_trees = self.n_trees
+
+        flat_X = X.ravel()
+        row_offset = np.tile(np.arange(n_rows, dtype=np.int64) * n_features, n_trees)
+        node = np.repeat(self.roots.astype(np.int64), n_rows)
+
+        # Parcours niveau par niveau (les feuilles bouclent sur elles-mêmes)
+        for _ in range(self.max_depth):
+            go_left = flat_X[row_offset + self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        return self.value[node].astype(np.float64).reshape(n_trees, n_rows)
+
+    def _predict_block(self, X):
+        """Moteur numpy: parcours vectorisé de tous les arbres à la fois."""
+        n_rows = len(X)
+        n_trees = self.n_trees
+        leaf_values = self._leaf_values(X)
+
+        # Accumulation dans l'ordre des arbres (identique à scikit-learn)
+        proba = np.zeros(n_rows, dtype=np.float64)
+        for tree_values in leaf_values:
+            proba += tree_values
+        proba /= n_trees
+        return proba
+
+    def predict_proba(self, X, n_threads=1, block_size=4096, engine='auto'):
+        """
+        Probabilités de fraude.
+
+        X: features brutes dans l'ordre feature_names (DataFrame ou ndarray).
+        n_threads: threads de parcours, None = nombre de coeurs.
+        engine: 'numba' (noyau compilé, si installé), 'numpy' ou 'auto'.
+        """
+        X = self._prepare(X)
+        n_rows = len(X)
+        if n_rows == 0:
+            return np.empty(0, dtype=np.float64)
+
+        n_threads = n_threads or os.cpu_count() or 1
+
+        if engine == 'auto':
+            engine = 'numba' if _numba_available() else 'numpy'
+        if engine == 'numba':
+            kernel = _load_kernel()
+            if kernel is None:
+                raise ImportError("numba n'est pas installé: pip install numba")
+            kernel.numba.set_num_threads(min(n_threads, kernel.numba.config.NUMBA_NUM_THREADS))
+            proba = np.empty(n_rows, dtype=np.float64)
+            # Pas de float16 dans numba: seuils comparés en float32 (mêmes valeurs)
+            threshold = (self.threshold.astype(np.float32) if self.threshold.dtype == np.float16
+                         else self.threshold)
+            kernel.traverse(X, self.feature, threshold, self.left, self.right,
+                            self.value.astype(np.float64, copy=False), self.roots,
+                            min(block_size, 256), proba)
+            return proba
+
+        if n_rows <= block_size:
+            return self._predict_block(X)
+
+        starts = range(0, n_rows, block_size)
+        if n_threads == 1:
+            return np.concatenate([self._predict_block(X[i:i + block_size]) for i in starts])
+
+        # numpy libère le GIL pendant les indexations: blocs en parallèle
+        with ThreadPoolExecutor(max_workers=n_threads) as pool:
+            blocks = pool.map(lambda i: self._predict_block(X[i:i + block_size]), starts)
+            return np.concatenate(list(blocks))
+
+    def predict_trees(self, X, block_size=4096):
+        """Probabilité de chaque arbre: tableau (n_trees, n_rows) (moteur numpy)."""
+        X = self._prepare(X)
+        if len(X) == 0:
+            return np.empty((self.n_trees, 0), dtype=np.float64)
+        return np.hstack([self._leaf_values(X[i:i + block_size])
+                          for i in range(0, len(X), block_size)])
+
+    def _is_leaf(self):
+        return self.left == np.arange(self.n_nodes, dtype=np.int32)
+
+    def _levels(self, roots, is_leaf):
+        """Noeuds accessibles depuis roots, niveau par niveau."""
+        level = np.asarray(roots, dtype=np.int64)
+        while len(level):
+            yield level
+            internal = level[~is_leaf[level]]
+            level = np.concatenate([self.left[internal], self.right[internal]])
+
+    def subset(self, trees):
+        """Nouvelle forêt réduite aux arbres `trees` (indices ou masque)."""
+        return self._repack(np.asarray(trees), self._is_leaf())
+
+    def collapse(self, tolerance):
+        """
+        Nouvelle forêt où chaque sous-arbre dont toutes les feuilles sont à
+        moins de `tolerance` de la valeur de sa racine devient une feuille:
+        la probabilité de chaque arbre, donc de la forêt, change d'au plus
+        tolerance.
+        """
+        is_leaf = self._is_leaf()
+        levels = list(self._levels(self.roots, is_leaf))
+        value = self.value.astype(np.float64)
+        low = value.copy()
+        high = value.copy()
+        # Extrêmes des feuilles de chaque sous-arbre, des feuilles vers la racine
+        for level in reversed(levels):
+            internal = level[~is_leaf[level]]
+            left, right = self.left[internal], self.right[internal]
+            low[internal] = np.minimum(low[left], low[right])
+            high[internal] = np.maximum(high[left], high[right])
+        spread = np.maximum(high - value, value - low)
+        return self._repack(np.arange(self.n_trees), is_leaf | (spread <= tolerance))
+
+    def _repack(self, trees, is_leaf):
+        """Noeuds accessibles des arbres `trees`, is_leaf: nouvelles feuilles."""
+        keep = np.zeros(self.n_nodes, dtype=bool)
+        depth = -1
+        for depth, level in enumerate(self._levels(self.roots[trees], is_leaf)):
+            keep[level] = True
+
+        # Ordre d'origine conservé: chaque arbre reste contigu
+        kept = np.flatnonzero(keep)
+        new_index = np.cumsum(keep) - 1
+        leaf = is_leaf[kept]
+        node_ids = np.arange(len(kept))
+        threshold = self.threshold[kept].copy()
+        threshold[leaf] = np.inf
+        return CompiledForest(np.where(leaf, 0, self.feature[kept]), threshold,
+                              np.where(leaf, node_ids, new_index[self.left[kept]]),
+                              np.where(leaf, node_ids, new_index[self.right[kept]]),
+                              self.value[kept], new_index[self.roots[trees]],
+                              max(depth, 0), self.feature_names,
+                              scaled_input=self.scaled_input)
+
+    def astype(self, dtype):
+        """Nouvelle forêt aux seuils et valeurs en `dtype` (float32, float16)."""
+        return CompiledForest(self.feature, self.threshold.astype(dtype), self.left,
+                              self.right, self.value.astype(dtype), self.roots,
+                              self.max_depth, self.feature_names,
+                              scaled_input=self.scaled_input)
+
+    def save(self, filepath):
+        """Sauvegarde numpy pure (.npz), rechargeable sans scikit-learn."""
+        np.savez(filepath, feature=self.feature, threshold=self.threshold,
+                 left=self.left, right=self.right, value=self.value, roots=self.roots,
+                 max_depth=np.int64(self.max_depth),
+                 scaled_input=np.bool_(self.scaled_input),
+                 feature_names=np.array(self.feature_names or [], dtype=str))
+
+    @classmethod
+    def load(cls, filepath):
+        with np.load(filepath, allow_pickle=False) as data:
+            return cls(data['feature'], data['threshold'], data['left'], data['right'],
+                       data['value'], data['roots'], int(data['max_depth']),
+                       [str(name) for name in data['feature_names']] or None,
+                       scaled_input=bool(data['scaled_input']))
@@ -0,0 +1,216 @@
+"""
+Drift Monitor
+=============
+
+Surveillance de la dérive des features en production, par rapport à la
+distribution d'entraînement.
+
+- À l'entraînement, FeatureHistogram.from_data découpe chaque feature en
+  n_bins quantiles; bornes et effectifs (quelques Ko) sont sauvegardés avec
+  le modèle (save_model, joblib ou format mmap)
+- En production, DriftMonitor compte les batches scorés dans les mêmes
+  bins: O(batch) par mise à jour, mémoire fixe (n_features x n_bins)
+- statistics(): PSI et KS (sur la grille des bins) par feature
+- Day et Is_Weekend (position dans le calendrier) ne sont pas surveillées
+  par défaut (detector.drift_monitor(features=...) pour les inclure);
+  Hour et ses indicateurs le sont
+
+    monitor = detector.drift_monitor()
+    for batch in batches:
+        ...
+        monitor.update(features[detector.feature_names])
+    print(monitor.statistics())
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_BINS = 20
+
+# Seuils usuels du PSI: < 0.1 stable, < 0.25 dérive modérée, au-delà dérive
+PSI_MODERATE = 0.1
+PSI_DRIFT = 0.25
+
+# Lignes comparées à la fois (borne la mémoire de travail de bin_counts)
+_BLOCK_ROWS = 8192
+
+# Lignes utilisées pour placer les bornes des bins (les effectifs, eux,
+# portent sur toutes les lignes)
+_QUANTILE_ROWS = 100_000
+
+# Plancher des proportions (bins vides) dans le calcul du PSI
+_EPSILON = 1e-4
+
+
+def _as_matrix(X, feature_names):
+    if hasattr(X, 'columns'):
+        if list(X.columns) != feature_names:
+            X = X[feature_names]
+        X = X.to_numpy(dtype=np.float64)
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 2 and X.shape[1] != len(feature_names):
+        raise ValueError(f"{X.shape[1]} colonnes pour {len(feature_names)} features "
+                         "surveillées: passez un DataFrame")
+    return X.reshape(-1, len(feature_names))
+
+
+class FeatureHistogram:
+    """
+    Histogrammes par feature sur des bornes fixes.
+
+    edges: (n_features, n_bins - 1) bornes intérieures croissantes;
+    bin k = [edges[k-1], edges[k]). Les NaN ne sont pas comptés.
+    """
+
+    def __init__(self, feature_names, edges, counts=None):
+        self.feature_names = list(feature_names)
+        self.edges = np.asarray(edges, dtype=np.float64)
+        n_bins = self.edges.shape[1] + 1
+        if n_bins > 255:
+            raise ValueError("255 bins au maximum")
+        self.counts = (np.zeros((len(self.feature_names), n_bins), dtype=np.float64)
+                       if counts is None else np.array(counts, dtype=np.float64))
+
+    @classmethod
+    def from_data(cls, X, feature_names=None, n_bins=DEFAULT_BINS):
+        """Bornes aux quantiles de X (données d'entraînement), puis comptage."""
+        if feature_names is None:
+            feature_names = list(X.columns)
+        values = _as_matrix(X, feature_names)
+        quantiles = np.linspace(0, 1, n_bins + 1)[1:-1]
+        if len(values):
+            # Bornes sur un échantillon régulier (au plus _QUANTILE_ROWS lignes)
+            step = -(-len(values) // _QUANTILE_ROWS)
+            edges = np.nanquantile(values[::step], quantiles, axis=0).T
+        else:
+            edges = np.zeros((len(feature_names), n_bins - 1))
+        histogram = cls(feature_names, np.nan_to_num(edges))
+        return histogram.update(values)
+
+    @property
+    def n_bins(self):
+        return self.counts.shape[1]
+
+    def bin_counts(self, values):
+        """Effectifs par bin d'une matrice (n, n_features), sans mise à jour."""
+        n_features, n_bins = self.counts.shape
+        # Bornes en (n_bins - 1, 1, n_features): la réduction porte sur l'axe
+        # de tête, toutes les features à la fois
+        edges = np.ascontiguousarray(self.edges.T)[:, None, :]
+        offsets = np.arange(n_features) * (n_bins + 1)
+        counts = np.zeros(n_features * (n_bins + 1), dtype=np.int64)
+        for start in range(0, len(values), _BLOCK_ROWS):
+            block = values[start:start + _BLOCK_ROWS]
+            # Bin = nombre de bornes <= valeur
+            bins = (block[None] >= edges).sum(axis=0, dtype=np.uint8).astype(np.intp)
+            # Un compartiment de plus par feature pour les NaN, écarté à la fin
+            bins[np.isnan(block)] = n_bins
+            counts += np.bincount((bins + offsets).ravel(), minlength=counts.size)
+        return counts.reshape(n_features, n_bins + 1)[:, :n_bins].astype(np.float64)
+
+    def update(self, X):
+        self.counts += self.bin_counts(_as_matrix(X, self.feature_names))
+        return self
+
+    def proportions(self):
+        totals = self.counts.sum(axis=1, keepdims=True)
+        return np.divide(self.counts, totals, out=np.zeros_like(self.counts),
+                         where=totals > 0)
+
+    def select(self, feature_names):
+        """Histogramme restreint à feature_names (bornes et effectifs copiés)."""
+        unknown = [name for name in feature_names if name not in self.feature_names]
+        if unknown:
+            raise ValueError(f"Features absentes de la référence: {unknown}")
+        rows = [self.feature_names.index(name) for name in feature_names]
+        return FeatureHistogram(feature_names, self.edges[rows], self.counts[rows])
+
+    def to_dict(self):
+        """Forme sérialisable (model_data['reference'])."""
+        return {'feature_names': list(self.feature_names), 'edges': self.edges,
+                'counts': self.counts}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['feature_names'], data['edges'], data['counts'])
+
+
+def population_stability_index(expected, actual, epsilon=_EPSILON):
+    """PSI par ligne entre deux matrices de proportions (n_features, n_bins)."""
+    expected = np.maximum(expected, epsilon)
+    actual = np.maximum(actual, epsilon)
+    return ((actual - expected) * np.log(actual / expected)).sum(axis=1)
+
+
+def ks_statistic(expected, actual):
+    """KS par ligne: écart maximal des fonctions de répartition, aux bornes des bins."""
+    return np.abs(np.cumsum(actual, axis=1) - np.cumsum(expected, axis=1)).max(axis=1)
+
+
+class DriftMonitor:
+    """
+    Compare les données scorées à l'histogramme de référence.
+
+    decay: facteur d'oubli appliqué aux effectifs à chaque update (ex: 0.99),
+    pour suivre une fenêtre récente; None = cumul depuis le dernier reset.
+    Thread-safe: update peut être appelé depuis les threads de scoring.
+    """
+
+    def __init__(self, reference, decay=None):
+        if isinstance(reference, dict):
+            reference = FeatureHistogram.from_dict(reference)
+        self.reference = reference
+        self.decay = decay
+        self.current = FeatureHistogram(reference.feature_names, reference.edges)
+        self._expected = reference.proportions()
+        self._lock = threading.Lock()
+
+    @property
+    def feature_names(self):
+        return self.reference.feature_names
+
+    def update(self, X):
+        """Ajoute un batch (features brutes, avant normalisation)."""
+        counts = self.current.bin_counts(_as_matrix(X, self.feature_names))
+        with self._lock:
+            if self.decay is not None:
+                self.current.counts *= self.decay
+            self.current.counts += counts
+        return self
+
+    def reset(self):
+        with self._lock:
+            self.current.counts[:] = 0
+
+    def statistics(self):
+        """
+        PSI et KS par feature, triés par PSI décroissant.
+
+        status: 'stable' (PSI < 0.1), 'moderate' (< 0.25) ou 'drift'
+        """
+        with self._lock:
+            actual = self.current.proportions()
+            n_observed = self.current.counts.sum(axis=1)
+
+        psi = population_stability_index(self._expected, actual)
+        ks = ks_statistic(self._expected, actual)
+        status = np.where(psi >= PSI_DRIFT, 'drift',
+                          np.where(psi >= PSI_MODERATE, 'moderate', 'stable'))
+        status = np.where(n_observed > 0, status, 'no_data')
+
+        return (pd.DataFrame({
+            'feature': self.feature_names,
+            'psi': psi,
+            'ks': ks,
+            'n_observed': n_observed,
+            'status': status
+        }).sort_values('psi', ascending=False).reset_index(drop=True))
+
+    def drifted(self, threshold=PSI_DRIFT):
+        """Features dont le PSI dépasse le seuil."""
+        stats = self.statistics()
+        return list(stats.loc[(stats['psi'] >= threshold) & (stats['n_observed'] > 0),
+                              'feature'])
@@ -0,0 +1,314 @@
+"""
+Feature Store
+=============
+
+Cache sur disque de la matrice de features produite par create_features.
+
+Chaque fichier source a son entrée de cache, identifiée par son chemin et
+FEATURE_VERSION:
+- une colonne = un fichier binaire brut, relu via np.memmap: le DataFrame
+  chargé pointe directement sur les pages du cache (aucune copie, lecture
+  paresseuse par l'OS)
+- meta.json: schéma, nombre de lignes, octets source déjà traités et leur
+  empreinte (blake2b), dernier Time (pour Time_Delta)
+
+À chaque chargement, l'empreinte valide le cache:
+- fichier inchangé: lecture directe
+- CSV complété en fin de fichier: seules les nouvelles lignes sont
+  featurisées, puis ajoutées au bout des colonnes
+- toute autre modification: reconstruction (Parquet/Feather: toujours)
+"""
+
+import hashlib
+import io
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from fraud_detector import (FEATHER_EXTENSIONS, FEATURE_VERSION, PARQUET_EXTENSIONS,
+                            V_FEATURES, CreditCardFraudDetector, get_logger,
+                            iter_transactions)
+
+
+logger = get_logger(__name__)
+
+
+# Dtypes de lecture fixés: l'inférence ne doit pas varier d'un bloc à l'autre
+RAW_DTYPES = {**{col: np.float64 for col in ['Time', 'Amount'] + V_FEATURES},
+              'Class': np.int64}
+
+_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+def _new_digest():
+    return hashlib.blake2b(digest_size=20)
+
+
+def _hash_range(f, start, end, digest):
+    """Ajoute les octets [start, end) du fichier à l'empreinte."""
+    f.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        data = f.read(min(_BLOCK_SIZE, remaining))
+        if not data:
+            break
+        digest.update(data)
+        remaining -= len(data)
+    return digest
+
+
+def _complete_lines_end(f, start, size):
+    """Position suivant le dernier saut de ligne de [start, size)."""
+    position = size
+    while position > start:
+        block_start = max(start, position - 64 * 1024)
+        f.seek(block_start)
+        block = f.read(position - block_start)
+        newline = block.rfind(b'\n')
+        if newline >= 0:
+            return block_start + newline + 1
+        position = block_start
+    return start
+
+
+def _ends_with_newline(f, size):
+    f.seek(size - 1)
+    return f.read(1) == b'\n'
+
+
+def _is_complete_row(tail, columns):
+    """Dernière ligne sans saut de ligne final: ligne entière et lisible?"""
+    if not tail.strip() or tail.count(b',') != len(columns) - 1 or tail.endswith(b','):
+        return False
+    try:
+        row = pd.read_csv(io.BytesIO(tail), header=None, names=columns, dtype=RAW_DTYPES)
+    except (ValueError, pd.errors.ParserError):
+        return False
+    return len(row) == 1
+
+
+def _apply_raw_dtypes(df):
+    dtypes = {col: dtype for col, dtype in RAW_DTYPES.items()
+              if col in df.columns and df[col].dtype != dtype}
+    return df.astype(dtypes) if dtypes else df
+
+
+class _ByteRange(io.RawIOBase):
+    """Fenêtre [start, end) d'un fichier, ajoutée à l'empreinte à la lecture."""
+
+    def __init__(self, f, start, end, digest):
+        self._file = f
+        self._file.seek(start)
+        self._remaining = end - start
+        self._digest = digest
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = min(len(buffer), self._remaining)
+        if n <= 0:
+            return 0
+        data = self._file.read(n)
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        self._digest.update(data)
+        return len(data)
+
+
+class FeatureStore:
+    """
+    Matrices de features persistées, rechargées par memmap.
+
+    Usage:
+        store = FeatureStore('.feature_cache')
+        df_enhanced = store.load('creditcard.csv')   # = create_features(load_data(...))
+    """
+
+    def __init__(self, cache_dir, chunksize=100_000, verbose=True):
+        self.cache_dir = cache_dir
+        self.chunksize = chunksize
+        self.verbose = verbose
+        self._detector = CreditCardFraudDetector(verbose=False)
+
+    def entry_dir(self, source):
+        """Dossier de cache du fichier source pour la version de features courante."""
+        path = os.path.abspath(source)
+        key = hashlib.blake2b(f'{path}|{FEATURE_VERSION}'.encode(), digest_size=8).hexdigest()
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.cache_dir, f'{stem}_v{FEATURE_VERSION}_{key}')
+
+    def _read_meta(self, entry):
+        try:
+            with open(os.path.join(entry, 'meta.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, entry, meta):
+        path = os.path.join(entry, 'meta.json')
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(f'{path}.tmp', path)
+
+    def _append(self, entry, meta, features):
+        """Ajoute un bloc de features au bout des fichiers colonnes."""
+        if not meta['columns']:
+            meta['columns'] = [{'name': col, 'dtype': features[col].dtype.str,
+                                'file': f'c{i:03d}.bin'}
+                               for i, col in enumerate(features.columns)]
+        elif [c['name'] for c in meta['columns']] != list(features.columns):
+            raise ValueError("Colonnes de features différentes du cache existant")
+
+        for column in meta['columns']:
+            dtype = np.dtype(column['dtype'])
+            values = features[column['name']].to_numpy(dtype=dtype)
+            with open(os.path.join(entry, column['file']), 'ab') as f:
+                # Ignore les octets d'une écriture interrompue
+                f.truncate(meta['n_rows'] * dtype.itemsize)
+                values.tofile(f)
+
+        meta['n_rows'] += len(features)
+        meta['last_time'] = float(features['Time'].iloc[-1])
+
+    def _featurize(self, entry, meta, chunks):
+        n_added = 0
+        for chunk in chunks:
+            if len(chunk) == 0:
+                continue
+            features = self._detector.create_features(chunk, prev_time=meta['last_time'])
+            self._append(entry, meta, features)
+            n_added += len(chunk)
+        return n_added
+
+    def update(self, source):
+        """
+        Met le cache à jour avec le fichier source.
+
+        Returns:
+            dict: 'status' ('hit', 'append' ou 'build'), 'rows', 'rows_added'
+        """
+        path = os.path.abspath(source)
+        entry = self.entry_dir(path)
+        meta = self._read_meta(entry)
+        is_csv = not path.lower().endswith(PARQUET_EXTENSIONS + FEATHER_EXTENSIONS)
+        size = os.path.getsize(path)
+
+        with open(path, 'rb') as f:
+            digest = _new_digest()
+            if meta is not None:
+                # Le préfixe déjà traité doit être identique octet pour octet
+                valid = (size >= meta['source_bytes'] if is_csv else size == meta['source_bytes'])
+                if valid:
+                    _hash_range(f, 0, meta['source_bytes'], digest)
+                    valid = digest.hexdigest() == meta['source_digest']
+                if valid and meta.get('unterminated_tail') and size > meta['source_bytes']:
+                    # Dernière ligne traitée sans saut de ligne: la suite du
+                    # fichier doit commencer une nouvelle ligne, sinon elle
+                    # était incomplète
+                    f.seek(meta['source_bytes'])
+                    valid = f.read(1) in (b'\n', b'\r')
+                if not valid:
+                    meta = None
+                    digest = _new_digest()
+
+            if meta is None:
+                status = 'build'
+                shutil.rmtree(entry, ignore_errors=True)
+                os.makedirs(entry)
+                meta = {'feature_version': FEATURE_VERSION, 'source': path,
+                        'source_bytes': 0, 'source_digest': digest.hexdigest(),
+                        'source_columns': None, 'n_rows': 0, 'last_time': None,
+                        'columns': []}
+            else:
+                status = 'hit'
+
+            start = meta['source_bytes']
+            if is_csv:
+                end = _complete_lines_end(f, start, size)
+                if start == 0 and end > 0:
+                    f.seek(0)
+                    header = pd.read_csv(io.BytesIO(f.readline()), nrows=0)
+                    meta['source_columns'] = list(header.columns)
+                if 0 < end < size:
+                    # Fin de fichier sans saut de ligne: prise en compte si
+                    # la ligne est complète, sinon en attente de la suite
+                    f.seek(end)
+                    if _is_complete_row(f.read(size - end), meta['source_columns']):
+                        end = size
+                    else:
+                        logger.warning(f"⚠️ {path}: dernière ligne incomplète ignorée "
+                                       f"({size - end} octets), reprise à la prochaine "
+                                       "mise à jour")
+                if end > start:
+                    meta['unterminated_tail'] = end == size and not _ends_with_newline(f, size)
+                    if status == 'hit':
+                        status = 'append'
+                    reader = io.BufferedReader(_ByteRange(f, start, end, digest))
+                    # Lignes ajoutées: pas d'en-tête, colonnes du cache
+                    chunks = pd.read_csv(reader, header=0 if start == 0 else None,
+                                         names=meta['source_columns'], dtype=RAW_DTYPES,
+                                         chunksize=self.chunksize)
+                    n_added = self._featurize(entry, meta, chunks)
+                    meta['source_bytes'] = end
+                else:
+                    n_added = 0
+            elif status == 'build':
+                chunks = (_apply_raw_dtypes(chunk) for chunk in
+                          iter_transactions(path, chunksize=self.chunksize, compact=False))
+                n_added = self._featurize(entry, meta, chunks)
+                _hash_range(f, 0, size, digest)
+                meta['source_bytes'] = size
+            else:
+                n_added = 0
+
+            meta['source_digest'] = digest.hexdigest()
+
+        if status != 'hit':
+            self._write_meta(entry, meta)
+
+        if self.verbose:
+            if status == 'hit':
+                logger.info(f"♻️ Features en cache: {meta['n_rows']:,} transactions")
+            elif status == 'append':
+                logger.info(f"➕ Cache de features complété: {n_added:,} nouvelles transactions "
+                            f"({meta['n_rows']:,} au total)")
+            else:
+                logger.info(f"💾 Cache de features construit: {meta['n_rows']:,} transactions")
+
+        return {'status': status, 'rows': meta['n_rows'], 'rows_added': n_added}
+
+    def load(self, source, columns=None):
+        """
+        DataFrame de features (comme create_features) adossé au cache.
+
+        Les colonnes sont des np.memmap en lecture seule: seules les pages
+        effectivement lues sont chargées en mémoire.
+        """
+        self.update(source)
+        entry = self.entry_dir(source)
+        meta = self._read_meta(entry)
+
+        selected = meta['columns']
+        if columns is not None:
+            by_name = {c['name']: c for c in meta['columns']}
+            selected = [by_name[name] for name in columns]
+
+        data = {}
+        for column in selected:
+            dtype = np.dtype(column['dtype'])
+            if meta['n_rows'] == 0:
+                data[column['name']] = np.empty(0, dtype=dtype)
+            else:
+                data[column['name']] = np.memmap(os.path.join(entry, column['file']),
+                                                 dtype=dtype, mode='r',
+                                                 shape=(meta['n_rows'],))
+        return pd.DataFrame(data, copy=False)
+
+    def clear(self, source=None):
+        """Supprime l'entrée d'un fichier source, ou tout le cache."""
+        target = self.entry_dir(source) if source is not None else self.cache_dir
+        shutil.rmtree(target, ignore_errors=True)
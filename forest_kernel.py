@@ -0,0 +1,37 @@
+"""
+Forest Kernel
+=============
+
+Noyau numba de parcours des arbres de CompiledForest.
+
+Module séparé, importé par compiled_forest au premier scoring avec
+engine='numba': l'import de numba n'est payé que par les processus qui
+s'en servent. Lève ImportError si numba n'est pas installé.
+"""
+
+import numba
+
+
+@numba.njit(parallel=True, nogil=True, cache=True)
+def traverse(X, feature, threshold, left, right, value, roots, block_size, out):
+    """Noyau compilé: blocs de lignes en parallèle, arbres dans l'ordre."""
+    n_rows = X.shape[0]
+    n_trees = roots.shape[0]
+    n_blocks = (n_rows + block_size - 1) // block_size
+    for block in numba.prange(n_blocks):
+        start = block * block_size
+        stop = min(n_rows, start + block_size)
+        for i in range(start, stop):
+            out[i] = 0.0
+        for t in range(n_trees):
+            root = roots[t]
+            for i in range(start, stop):
+                node = root
+                while left[node] != node:
+                    if X[i, feature[node]] <= threshold[node]:
+                        node = left[node]
+                    else:
+                        node = right[node]
+                out[i] += value[node]
+        for i in range(start, stop):
+            out[i] /= n_trees
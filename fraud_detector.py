@@ -14,23 +14,786 @@ Expertise métier appliquée:
 Auteur: Spécialiste en détection de fraude
 """
 
+import hashlib
+import logging
+import math
+import os
+import sys
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.model_selection import train_test_split, StratifiedKFold
-from sklearn.ensemble import RandomForestClassifier, IsolationForest
-from sklearn.linear_model import LogisticRegression
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import (classification_report, confusion_matrix, 
-                           roc_auc_score, precision_recall_curve, roc_curve)
-from imblearn.over_sampling import SMOTE
-from imblearn.under_sampling import RandomUnderSampler
-from imblearn.pipeline import Pipeline as ImbPipeline
-import joblib
+# matplotlib, scikit-learn, imbalanced-learn et joblib sont importés dans
+# les fonctions qui s'en servent: charger un modèle .fdm et scorer n'en
+# paie pas le coût (voir scoring.py)
+from model_format import MODEL_EXTENSION, is_artifact, load_artifact, save_artifact
+from instrumentation import NULL_STAGE, instrumented
+from drift_monitor import DriftMonitor, FeatureHistogram
 import warnings
 warnings.filterwarnings('ignore')
 
+
+class _ConsoleFallbackHandler(logging.StreamHandler):
+    """Sortie standard, uniquement si l'application n'a configuré aucun logging."""
+    
+    def emit(self, record):
+        if not logging.getLogger().handlers:
+            # sys.stdout courant (éventuellement redirigé)
+            self.stream = sys.stdout
+            super().emit(record)
+
+
+# Messages du mode verbose. Sans configuration du logging par l'application,
+# ils s'affichent tels quels sur la sortie standard; sinon ils sont propagés.
+logger = logging.getLogger('fraud_detector')
+logger.setLevel(logging.INFO)
+_console_handler = _ConsoleFallbackHandler(sys.stdout)
+_console_handler.setFormatter(logging.Formatter('%(message)s'))
+logger.addHandler(_console_handler)
+
+
+def get_logger(name):
+    """Logger d'un module compagnon, même repli sur la sortie standard."""
+    module_logger = logging.getLogger(name)
+    module_logger.setLevel(logging.INFO)
+    if _console_handler not in module_logger.handlers:
+        module_logger.addHandler(_console_handler)
+    return module_logger
+
+
+# Colonnes du dataset Kaggle et dtypes compacts
+V_FEATURES = [f'V{i}' for i in range(1, 29)]
+COMPACT_DTYPES = {**{col: np.float32 for col in V_FEATURES},
+                  'Amount': np.float32,
+                  'Class': np.int8}
+# Time reste en float64: la précision à la seconde près compte pour Time_Delta
+
+# Colonnes brutes du dataset Kaggle, dans l'ordre du fichier
+RAW_COLUMNS = ['Time'] + V_FEATURES + ['Amount', 'Class']
+
+
+class FeatureSpec:
+    """
+    Définition déclarative d'une feature dérivée.
+    
+    - kind: 'value' (float) ou 'flag' (0/1)
+    - requires: colonnes brutes nécessaires (feature omise si absentes)
+    - compute(inputs, out): écrit la feature dans la colonne `out`
+    - scalar(inputs): même calcul pour une seule transaction (score_one),
+      en floats Python; doit donner exactement le résultat de compute
+    """
+    
+    def __init__(self, name, kind, requires, compute, scalar):
+        self.name = name
+        self.kind = kind
+        self.requires = tuple(requires)
+        self.compute = compute
+        self.scalar = scalar
+    
+    def __repr__(self):
+        return f"FeatureSpec({self.name!r}, {self.kind!r})"
+
+
+class _FeatureInputs:
+    """Colonnes brutes (numpy) et intermédiaires partagés, calculés une seule fois."""
+    
+    def __init__(self, columns, prev_time=None, time_delta=None):
+        self._columns = columns
+        self._arrays = {}
+        self.prev_time = prev_time
+        self._time_delta = time_delta
+        self._hour = None
+        self._day = None
+    
+    def __getitem__(self, name):
+        if name not in self._arrays:
+            self._arrays[name] = np.asarray(self._columns[name])
+        return self._arrays[name]
+    
+    @property
+    def hour(self):
+        if self._hour is None:
+            self._hour = (self['Time'] / 3600) % 24
+        return self._hour
+    
+    @property
+    def day(self):
+        if self._day is None:
+            self._day = self['Time'] / (3600 * 24)
+        return self._day
+    
+    @property
+    def time_delta(self):
+        if self._time_delta is None:
+            time = self['Time']
+            time_delta = np.empty(len(time), dtype=np.float64)
+            if len(time) > 0:
+                time_delta[0] = 0 if self.prev_time is None else time[0] - self.prev_time
+                time_delta[1:] = np.diff(time)
+                time_delta[1:][np.isnan(time_delta[1:])] = 0
+            self._time_delta = time_delta
+        return self._time_delta
+
+
+class _ScalarInputs:
+    """Équivalent de _FeatureInputs pour une transaction (floats Python)."""
+    
+    def __init__(self, values, prev_time=None):
+        self._values = values
+        time = values['Time']
+        self.hour = (time / 3600) % 24
+        self.day = time / (3600 * 24)
+        self.time_delta = 0.0 if prev_time is None else time - prev_time
+    
+    def __getitem__(self, name):
+        return self._values[name]
+
+
+def _ratio(numerator, denominator, out):
+    """numerator / denominator, 0 si le dénominateur est nul."""
+    out[...] = 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(numerator, denominator, out=out, where=denominator != 0)
+
+
+def _sqrt(values, out):
+    with np.errstate(invalid='ignore'):
+        np.sqrt(values, out=out)
+
+
+def _sqrt_scalar(value):
+    return math.sqrt(value) if value >= 0 else np.nan
+
+
+def _remainder_scalar(value, divisor):
+    # Même résultat que np.remainder (inf et NaN -> NaN, sans exception)
+    return value % divisor if math.isfinite(value) else np.nan
+
+
+# Features calculées par create_features, dans l'ordre des colonnes de sortie.
+# Chaque calcul écrit directement dans sa colonne du bloc préalloué.
+FEATURE_REGISTRY = [
+    # 1. Features temporelles
+    FeatureSpec('Hour', 'value', ['Time'], lambda f, out: np.copyto(out, f.hour),
+                lambda f: f.hour),
+    FeatureSpec('Day', 'value', ['Time'], lambda f, out: np.copyto(out, f.day),
+                lambda f: f.day),
+    # Patterns temporels business
+    FeatureSpec('Is_Night', 'flag', ['Time'],
+                lambda f, out: np.logical_or(f.hour >= 23, f.hour <= 6, out=out),
+                lambda f: f.hour >= 23 or f.hour <= 6),
+    FeatureSpec('Is_Weekend', 'flag', ['Time'],
+                lambda f, out: np.greater_equal(f.day % 7, 5, out=out),
+                lambda f: _remainder_scalar(f.day, 7) >= 5),
+    FeatureSpec('Is_Business_Hours', 'flag', ['Time'],
+                lambda f, out: np.logical_and(f.hour >= 9, f.hour <= 17, out=out),
+                lambda f: 9 <= f.hour <= 17),
+    # 2. Features de montant
+    FeatureSpec('Amount_Log', 'value', ['Amount'],
+                lambda f, out: np.log1p(f['Amount'], out=out),
+                # log1p numpy: bit à bit identique au calcul vectorisé
+                lambda f: np.log1p(f['Amount'])),
+    FeatureSpec('Amount_Sqrt', 'value', ['Amount'], lambda f, out: _sqrt(f['Amount'], out),
+                lambda f: _sqrt_scalar(f['Amount'])),
+    # Catégories métier
+    FeatureSpec('Small_Amount', 'flag', ['Amount'],
+                lambda f, out: np.less_equal(f['Amount'], 10, out=out),
+                lambda f: f['Amount'] <= 10),
+    FeatureSpec('Medium_Amount', 'flag', ['Amount'],
+                lambda f, out: np.logical_and(f['Amount'] > 10, f['Amount'] <= 100, out=out),
+                lambda f: 10 < f['Amount'] <= 100),
+    FeatureSpec('Large_Amount', 'flag', ['Amount'],
+                lambda f, out: np.greater(f['Amount'], 100, out=out),
+                lambda f: f['Amount'] > 100),
+    FeatureSpec('Round_Amount', 'flag', ['Amount'],
+                lambda f, out: np.equal(f['Amount'] % 10, 0, out=out),
+                lambda f: _remainder_scalar(f['Amount'], 10) == 0),
+    # 3. Interactions entre top features (V14, V4, V11 souvent importants)
+    FeatureSpec('V14_V4_Interaction', 'value', ['V14', 'V4'],
+                lambda f, out: np.multiply(f['V14'], f['V4'], out=out),
+                lambda f: f['V14'] * f['V4']),
+    FeatureSpec('V14_V11_Ratio', 'value', ['V14', 'V11'],
+                lambda f, out: _ratio(f['V14'], f['V11'], out),
+                lambda f: f['V14'] / f['V11'] if f['V11'] != 0 else 0.0),
+    # 4. Features d'agrégation temporelle
+    FeatureSpec('Time_Delta', 'value', ['Time'], lambda f, out: np.copyto(out, f.time_delta),
+                lambda f: f.time_delta),
+    FeatureSpec('Frequent_User', 'flag', ['Time'],
+                lambda f, out: np.less(f.time_delta, 300, out=out),  # < 5 min
+                lambda f: f.time_delta < 300)
+]
+FEATURE_SPECS = {spec.name: spec for spec in FEATURE_REGISTRY}
+DERIVED_FEATURES = [spec.name for spec in FEATURE_REGISTRY]
+# Version des définitions de features: à incrémenter à chaque modification de
+# FEATURE_REGISTRY (invalide les caches de FeatureStore)
+FEATURE_VERSION = 1
+# Features de position dans le calendrier: Day croît sans borne (et
+# Is_Weekend, qui en dérive, ne couvre que les jours vus à l'entraînement),
+# toute donnée de production tombe hors de la référence. Exclues par défaut
+# de la surveillance de dérive; Hour et ses indicateurs restent surveillés
+TIME_POSITION_FEATURES = ['Day', 'Is_Weekend']
+
+
+def feature_dtypes(compact=False):
+    """Dtypes des features dérivées: float64/int64, ou float32/int8 en mode compact."""
+    return {'value': np.dtype(np.float32 if compact else np.float64),
+            'flag': np.dtype(np.int8 if compact else np.int64)}
+
+
+def active_features(raw_columns):
+    """Features du registre calculables à partir de ces colonnes brutes."""
+    available = set(raw_columns)
+    return [spec for spec in FEATURE_REGISTRY if available.issuperset(spec.requires)]
+
+
+def feature_schema(raw_columns=None, compact=False):
+    """
+    Schéma de sortie de create_features, connu avant toute donnée.
+    
+    Returns:
+        liste de (colonne, dtype): colonnes brutes (dtype None = inchangé)
+        puis features dérivées
+    """
+    raw_columns = list(RAW_COLUMNS if raw_columns is None else raw_columns)
+    dtypes = feature_dtypes(compact)
+    schema = [(name, None) for name in raw_columns]
+    schema += [(spec.name, dtypes[spec.kind]) for spec in active_features(raw_columns)
+               if spec.name not in raw_columns]
+    return schema
+
+
+def feature_columns(raw_columns=None):
+    """feature_names qu'aura le modèle (colonnes de prepare_data)."""
+    return [name for name, _ in feature_schema(raw_columns) if name not in ('Class', 'Time')]
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+FEATHER_EXTENSIONS = ('.feather', '.arrow', '.ipc')
+
+
+def _downcast(df):
+    """Convertit les colonnes connues vers leurs dtypes compacts."""
+    dtypes = {col: dtype for col, dtype in COMPACT_DTYPES.items()
+              if col in df.columns and df[col].dtype != dtype}
+    return df.astype(dtypes, copy=False) if dtypes else df
+
+
+def iter_transactions(filepath, chunksize=100_000, compact=True):
+    """
+    Lit un fichier de transactions par blocs de taille bornée.
+    
+    Formats:
+    - CSV (lecture en streaming, dtypes compacts appliqués au parsing)
+    - Parquet (.parquet/.pq) et Feather (.feather/.arrow), via pyarrow
+    
+    La mémoire de pointe dépend de chunksize, pas de la taille du fichier.
+    """
+    path = str(filepath)
+    lower = path.lower()
+    
+    if lower.endswith(PARQUET_EXTENSIONS + FEATHER_EXTENSIONS):
+        try:
+            import pyarrow.parquet as pq
+            import pyarrow.feather as feather
+        except ImportError as exc:
+            raise ImportError("pyarrow est requis pour lire Parquet/Feather: "
+                              "pip install pyarrow") from exc
+        
+        if lower.endswith(PARQUET_EXTENSIONS):
+            batches = pq.ParquetFile(path).iter_batches(batch_size=chunksize)
+        else:
+            # Feather/IPC: mappé en mémoire, découpé sans copie
+            batches = feather.read_table(path, memory_map=True).to_batches(max_chunksize=chunksize)
+        
+        for batch in batches:
+            chunk = batch.to_pandas()
+            yield _downcast(chunk) if compact else chunk
+        return
+    
+    dtype = COMPACT_DTYPES if compact else None
+    for chunk in pd.read_csv(path, chunksize=chunksize, dtype=dtype):
+        yield chunk
+
+
+class CostCurve:
+    """
+    Courbe de coût business calculée en un seul balayage trié.
+    
+    Les scores sont triés une fois par ordre décroissant, puis des sommes
+    cumulées donnent TP/FP/FN/TN à chaque seuil distinct: O(n log n) au
+    lieu d'une matrice de confusion par seuil.
+    
+    Coûts:
+    - investigation_cost: coût d'une alerte (scalaire)
+    - fraud_cost: coût d'une fraude ratée, scalaire ou vecteur par
+      transaction (ex: le montant, pour un coût pondéré par montant)
+    """
+    
+    def __init__(self, y_true, scores, investigation_cost=25, fraud_cost=500):
+        y_true = np.asarray(y_true).astype(bool).ravel()
+        scores = np.asarray(scores, dtype=np.float64).ravel()
+        
+        if len(y_true) != len(scores):
+            raise ValueError("y_true et scores doivent avoir la même longueur")
+        
+        self.investigation_cost = investigation_cost
+        self.fraud_cost = fraud_cost
+        
+        # Coût de chaque fraude (constant ou pondéré par transaction)
+        if np.ndim(fraud_cost) == 0:
+            row_fraud_cost = np.full(len(y_true), float(fraud_cost))
+        else:
+            row_fraud_cost = np.asarray(fraud_cost, dtype=np.float64).ravel()
+            if len(row_fraud_cost) != len(y_true):
+                raise ValueError("fraud_cost doit être scalaire ou de même longueur que y_true")
+        
+        # Tri décroissant stable des scores
+        order = np.argsort(-scores, kind='mergesort')
+        sorted_scores = scores[order]
+        sorted_y = y_true[order]
+        
+        # Dernier indice de chaque groupe de scores égaux
+        distinct_idx = np.flatnonzero(np.diff(sorted_scores))
+        last_idx = np.r_[distinct_idx, len(sorted_scores) - 1] if len(sorted_scores) else distinct_idx
+        
+        tp_cum = np.cumsum(sorted_y, dtype=np.int64)
+        caught_cost_cum = np.cumsum(np.where(sorted_y, row_fraud_cost[order], 0.0))
+        
+        self.n_positives = int(sorted_y.sum())
+        self.n_negatives = int(len(sorted_y) - self.n_positives)
+        self.total_fraud_cost = float(caught_cost_cum[-1]) if len(caught_cost_cum) else 0.0
+        
+        # Prédiction positive si score >= seuil
+        self.thresholds = sorted_scores[last_idx]
+        self.tp = tp_cum[last_idx]
+        self.fp = (last_idx + 1) - self.tp
+        self.fn = self.n_positives - self.tp
+        self.tn = self.n_negatives - self.fp
+        
+        # Coûts business à chaque seuil
+        self.caught_fraud_cost = caught_cost_cum[last_idx]
+        self.cost_false_positives = self.fp * float(investigation_cost)
+        self.cost_false_negatives = self.total_fraud_cost - self.caught_fraud_cost
+        self.total_cost = self.cost_false_positives + self.cost_false_negatives
+        self.savings = self.caught_fraud_cost - self.cost_false_positives
+    
+    def __len__(self):
+        return len(self.thresholds)
+    
+    @property
+    def precision(self):
+        denom = self.tp + self.fp
+        return np.divide(self.tp, denom, out=np.zeros(len(self), dtype=np.float64), where=denom > 0)
+    
+    @property
+    def recall(self):
+        if self.n_positives == 0:
+            return np.zeros(len(self), dtype=np.float64)
+        return self.tp / self.n_positives
+    
+    @property
+    def roi(self):
+        cost_fp = self.cost_false_positives
+        return np.divide(self.savings * 100, cost_fp,
+                         out=np.zeros(len(self), dtype=np.float64), where=cost_fp > 0)
+    
+    def index_at(self, threshold):
+        """Indice du point de courbe correspondant à `score >= threshold`."""
+        # thresholds décroissants: nombre de seuils distincts >= threshold
+        return int(np.searchsorted(-self.thresholds, -threshold, side='right')) - 1
+    
+    def at(self, threshold):
+        """Matrice de confusion et coûts pour un seuil arbitraire."""
+        idx = self.index_at(threshold)
+        if idx < 0:
+            # Aucune alerte au-dessus du seuil
+            tp, fp, caught = 0, 0, 0.0
+        else:
+            tp, fp, caught = int(self.tp[idx]), int(self.fp[idx]), float(self.caught_fraud_cost[idx])
+        
+        cost_fp = fp * float(self.investigation_cost)
+        cost_fn = self.total_fraud_cost - caught
+        return {
+            'tp': tp,
+            'fp': fp,
+            'fn': self.n_positives - tp,
+            'tn': self.n_negatives - fp,
+            'cost_false_positives': cost_fp,
+            'cost_false_negatives': cost_fn,
+            'total_cost': cost_fp + cost_fn,
+            'savings': caught - cost_fp,
+            'roi': ((caught - cost_fp) / cost_fp * 100) if cost_fp > 0 else 0
+        }
+    
+    def optimal_threshold(self):
+        """Seuil minimisant le coût total (le plus bas en cas d'égalité)."""
+        if len(self) == 0:
+            raise ValueError("Courbe vide")
+        # Parcours par seuils croissants pour conserver le seuil le plus bas
+        ascending_cost = self.total_cost[::-1]
+        return float(self.thresholds[::-1][np.argmin(ascending_cost)])
+    
+    def table(self, thresholds):
+        """
+        Métriques complètes pour un vecteur de seuils, en un appel vectorisé.
+        
+        Une ligne par seuil (prédiction positive si score >= seuil):
+        matrice de confusion, précision, rappel, F1, coûts, économies, ROI.
+        """
+        thresholds = np.atleast_1d(np.asarray(thresholds, dtype=np.float64))
+        idx = np.searchsorted(-self.thresholds, -thresholds, side='right') - 1
+        
+        # Aucune alerte au-dessus du seuil: idx = -1
+        has_alert = idx >= 0
+        if len(self) > 0:
+            safe = np.maximum(idx, 0)
+            tp = np.where(has_alert, self.tp[safe], 0)
+            fp = np.where(has_alert, self.fp[safe], 0)
+            caught = np.where(has_alert, self.caught_fraud_cost[safe], 0.0)
+        else:
+            tp = fp = np.zeros(len(thresholds), dtype=np.int64)
+            caught = np.zeros(len(thresholds), dtype=np.float64)
+        fn = self.n_positives - tp
+        tn = self.n_negatives - fp
+        
+        def ratio(num, den):
+            return np.divide(num, den, out=np.zeros(len(thresholds), dtype=np.float64),
+                             where=den > 0)
+        
+        precision = ratio(tp, tp + fp)
+        recall = ratio(tp, tp + fn)
+        cost_fp = fp * float(self.investigation_cost)
+        cost_fn = self.total_fraud_cost - caught
+        savings = caught - cost_fp
+        
+        return pd.DataFrame({
+            'threshold': thresholds,
+            'tp': tp,
+            'fp': fp,
+            'fn': fn,
+            'tn': tn,
+            'precision': precision,
+            'recall': recall,
+            'f1': ratio(2 * precision * recall, precision + recall),
+            'specificity': ratio(tn, tn + fp),
+            'false_positive_rate': ratio(fp, fp + tn),
+            'cost_false_positives': cost_fp,
+            'cost_false_negatives': cost_fn,
+            'total_cost': cost_fp + cost_fn,
+            'savings': savings,
+            'roi': ratio(savings, cost_fp) * 100
+        })
+    
+    def to_frame(self):
+        """Courbe complète sous forme de DataFrame (un seuil par ligne)."""
+        return pd.DataFrame({
+            'threshold': self.thresholds,
+            'tp': self.tp,
+            'fp': self.fp,
+            'fn': self.fn,
+            'tn': self.tn,
+            'precision': self.precision,
+            'recall': self.recall,
+            'cost_false_positives': self.cost_false_positives,
+            'cost_false_negatives': self.cost_false_negatives,
+            'total_cost': self.total_cost,
+            'savings': self.savings,
+            'roi': self.roi
+        })
+
+
+class QuantileSketch:
+    """
+    Sketch de quantiles fusionnable (histogramme à buckets logarithmiques).
+    
+    Chaque valeur x > 0 tombe dans le bucket ceil(log_gamma(x)), avec
+    gamma = (1 + a) / (1 - a): tout quantile est estimé à une erreur
+    relative a près, quelle que soit la taille du flux. Deux sketches de
+    même précision se fusionnent en additionnant leurs compteurs.
+    """
+    
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+    
+    def _add_to(self, store, values):
+        keys, counts = np.unique(np.ceil(np.log(values) / self._log_gamma).astype(np.int64),
+                                 return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            store[key] = store.get(key, 0) + count
+    
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        
+        positive = values > 0
+        negative = values < 0
+        if positive.any():
+            self._add_to(self.positive, values[positive])
+        if negative.any():
+            self._add_to(self.negative, -values[negative])
+        self.zero_count += int(len(values) - positive.sum() - negative.sum())
+        self.count += len(values)
+        return self
+    
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Sketches de précisions différentes")
+        for store, other_store in ((self.positive, other.positive),
+                                   (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+    
+    def quantile(self, q):
+        """Quantile q (0-1), même convention de rang que np.median."""
+        if self.count == 0:
+            return np.nan
+        rank = q * (self.count - 1)
+        
+        # Ordre croissant: négatifs (buckets décroissants), zéros, positifs
+        buckets = [(-key, count, -1) for key, count in self.negative.items()]
+        buckets.sort()
+        buckets += [(None, self.zero_count, 0)]
+        buckets += [(key, count, 1) for key, count in sorted(self.positive.items())]
+        
+        seen = 0
+        for key, count, sign in buckets:
+            seen += count
+            if seen > rank:
+                if sign == 0:
+                    return 0.0
+                # Représentant du bucket: erreur relative <= relative_accuracy
+                return sign * 2 * self.gamma ** (sign * key) / (self.gamma + 1)
+        return np.nan
+
+
+class FraudPatternStats:
+    """
+    Statistiques de patterns de fraude, accumulées bloc par bloc.
+    
+    Accumulateurs fusionnables (merge) entre blocs ou processus:
+    - effectifs, sommes et sommes des carrés par classe (colonnes V* et Amount)
+    - histogramme horaire par classe (buckets de 24 / hour_bins heures)
+    - sketch de quantiles du montant par classe (médianes approchées)
+    
+    Un seul passage vectorisé par bloc, mémoire indépendante du volume.
+    """
+    
+    def __init__(self, hour_bins=24, relative_accuracy=0.01):
+        self.hour_bins = hour_bins
+        self.columns = None
+        self.counts = np.zeros(2, dtype=np.int64)
+        self.valid_counts = None
+        self.sums = None
+        self.sumsq = None
+        self.hourly = np.zeros((hour_bins, 2), dtype=np.int64)
+        self.amount_sketches = [QuantileSketch(relative_accuracy),
+                                QuantileSketch(relative_accuracy)]
+    
+    def _init_columns(self, columns):
+        self.columns = list(columns)
+        shape = (2, len(self.columns))
+        self.valid_counts = np.zeros(shape, dtype=np.int64)
+        self.sums = np.zeros(shape, dtype=np.float64)
+        self.sumsq = np.zeros(shape, dtype=np.float64)
+    
+    def update(self, chunk):
+        """Ajoute un bloc de transactions (Time, Amount, V*, Class)."""
+        if self.columns is None:
+            # Colonnes brutes seulement (V14_V4_Interaction, Velocity_*... exclues)
+            self._init_columns([c for c in V_FEATURES if c in chunk.columns] + ['Amount'])
+        if len(chunk) == 0:
+            return self
+        
+        y = chunk['Class'].to_numpy().astype(bool)
+        fraud = y.astype(np.float64)
+        n_fraud = int(y.sum())
+        self.counts += (len(y) - n_fraud, n_fraud)
+        
+        # Sommes par classe: produit matrice-vecteur sur le bloc, sans copie filtrée
+        X = chunk[self.columns].to_numpy(dtype=np.float64)
+        missing = np.isnan(X)
+        if missing.any():
+            X = np.where(missing, 0.0, X)
+            # Comptes entiers (fraud @ missing serait en float64)
+            valid_total = len(y) - missing.sum(axis=0)
+            valid_fraud = n_fraud - missing[y].sum(axis=0)
+        else:
+            valid_total = np.full(len(self.columns), len(y))
+            valid_fraud = np.full(len(self.columns), n_fraud)
+        
+        for acc, values in ((self.sums, X), (self.sumsq, X * X)):
+            total = values.sum(axis=0)
+            in_fraud = fraud @ values
+            acc[0] += total - in_fraud
+            acc[1] += in_fraud
+        self.valid_counts[0] += valid_total - valid_fraud
+        self.valid_counts[1] += valid_fraud
+        
+        # Histogramme horaire: heure entière (ou bucket), pas l'heure flottante
+        hour = (chunk['Time'].to_numpy(dtype=np.float64) / 3600) % 24
+        hour_bin = np.minimum((hour * self.hour_bins / 24).astype(np.int64), self.hour_bins - 1)
+        self.hourly += np.bincount(hour_bin * 2 + y, minlength=2 * self.hour_bins
+                                   ).reshape(self.hour_bins, 2)
+        
+        amount = chunk['Amount'].to_numpy()
+        self.amount_sketches[0].update(amount[~y])
+        self.amount_sketches[1].update(amount[y])
+        return self
+    
+    def merge(self, other):
+        """Fusionne les accumulateurs d'un autre bloc/processus."""
+        if other.columns is None:
+            return self
+        if self.columns is None:
+            self._init_columns(other.columns)
+        elif other.columns != self.columns:
+            raise ValueError("Colonnes différentes: fusion impossible")
+        if other.hour_bins != self.hour_bins:
+            raise ValueError("hour_bins différents: fusion impossible")
+        
+        self.counts += other.counts
+        self.valid_counts += other.valid_counts
+        self.sums += other.sums
+        self.sumsq += other.sumsq
+        self.hourly += other.hourly
+        for sketch, other_sketch in zip(self.amount_sketches, other.amount_sketches):
+            sketch.merge(other_sketch)
+        return self
+    
+    def class_stats(self):
+        """Moyenne et écart-type par classe et par colonne."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = self.sums / self.valid_counts
+            var = self.sumsq / self.valid_counts - mean ** 2
+        std = np.sqrt(np.maximum(var, 0))
+        return pd.DataFrame({'normal_mean': mean[0], 'fraud_mean': mean[1],
+                             'normal_std': std[0], 'fraud_std': std[1]},
+                            index=self.columns)
+    
+    def patterns(self, top_n=10):
+        """Résultat au format de analyze_fraud_patterns."""
+        stats = self.class_stats()
+        
+        hour_start = np.arange(self.hour_bins) * 24 / self.hour_bins
+        count = self.hourly.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            temporal = pd.DataFrame({'count': count, 'sum': self.hourly[:, 1],
+                                     'mean': self.hourly[:, 1] / count},
+                                    index=pd.Index(hour_start, name='Hour'))
+        
+        amount = stats.loc['Amount']
+        # Différence de moyennes entre fraude et normal
+        separation = (stats['fraud_mean'] - stats['normal_mean']).abs().drop('Amount')
+        
+        return {
+            'temporal': temporal[temporal['count'] > 0],
+            'amount': {
+                'fraud_mean': amount['fraud_mean'],
+                'normal_mean': amount['normal_mean'],
+                'fraud_median': self.amount_sketches[1].quantile(0.5),
+                'normal_median': self.amount_sketches[0].quantile(0.5)
+            },
+            'top_features': sorted(separation.items(), key=lambda x: x[1], reverse=True)[:top_n],
+            'class_counts': {'normal': int(self.counts[0]), 'fraud': int(self.counts[1])},
+            'class_stats': stats
+        }
+
+
+class ResamplingStage:
+    """
+    Rééquilibrage SMOTE + undersampling, avec cache sur disque.
+    
+    - cache_dir: les données rééchantillonnées sont persistées (.npz) sous
+      une clé = hash du contenu (X, y) + paramètres d'échantillonnage;
+      un entraînement répété sur les mêmes données saute le rééchantillonnage
+    - pre_undersample: sous-échantillonne les normaux AVANT SMOTE, jusqu'à
+      l'effectif final du pipeline; SMOTE travaille sur un jeu réduit et les
+      effectifs finaux par classe sont inchangés
+    """
+    
+    CACHE_VERSION = 1
+    
+    def __init__(self, over_strategy=0.3, under_strategy=0.7, random_state=42,
+                 pre_undersample=False, cache_dir=None):
+        self.over_strategy = over_strategy
+        self.under_strategy = under_strategy
+        self.random_state = random_state
+        self.pre_undersample = pre_undersample
+        self.cache_dir = cache_dir
+        self.last_cache_hit = False
+    
+    def cache_key(self, X, y):
+        """Hash du contenu de (X, y) et des paramètres."""
+        X = np.ascontiguousarray(X)
+        y = np.ascontiguousarray(y)
+        digest = hashlib.blake2b(digest_size=20)
+        params = (self.CACHE_VERSION, self.over_strategy, self.under_strategy,
+                  self.random_state, self.pre_undersample)
+        digest.update(repr(params).encode())
+        for array in (X, y):
+            digest.update(f'{array.dtype.str}{array.shape}'.encode())
+            digest.update(memoryview(array).cast('B'))
+        return digest.hexdigest()
+    
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, f'resample_{key}.npz')
+    
+    def fit_resample(self, X, y):
+        self.last_cache_hit = False
+        
+        if self.cache_dir is not None:
+            path = self._cache_path(self.cache_key(X, y))
+            if os.path.exists(path):
+                with np.load(path) as cached:
+                    self.last_cache_hit = True
+                    return cached['X'], cached['y']
+        
+        X_resampled, y_resampled = self._resample(X, y)
+        
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Écriture atomique: un autre processus ne lit jamais un fichier partiel
+            tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+            np.savez(tmp_path, X=np.asarray(X_resampled), y=np.asarray(y_resampled))
+            os.replace(tmp_path, path)
+        
+        return X_resampled, y_resampled
+    
+    def _resample(self, X, y):
+        from imblearn.over_sampling import SMOTE
+        from imblearn.pipeline import Pipeline as ImbPipeline
+        from imblearn.under_sampling import RandomUnderSampler
+        
+        if not self.pre_undersample:
+            # Pipeline SMOTE + Undersampling
+            over = SMOTE(sampling_strategy=self.over_strategy, random_state=self.random_state)
+            under = RandomUnderSampler(sampling_strategy=self.under_strategy,
+                                       random_state=self.random_state)
+            pipeline = ImbPipeline([('over', over), ('under', under)])
+            return pipeline.fit_resample(X, y)
+        
+        # Mêmes effectifs finaux que le pipeline, undersampling en premier
+        y_values = np.asarray(y)
+        n_majority = int((y_values == 0).sum())
+        n_minority = int((y_values == 1).sum())
+        n_minority_target = n_minority + int(self.over_strategy * n_majority - n_minority)
+        n_majority_target = int(n_minority_target / self.under_strategy)
+        
+        under = RandomUnderSampler(sampling_strategy={0: n_majority_target},
+                                   random_state=self.random_state)
+        over = SMOTE(sampling_strategy={1: n_minority_target}, random_state=self.random_state)
+        pipeline = ImbPipeline([('under', under), ('over', over)])
+        return pipeline.fit_resample(X, y)
+
+
 class CreditCardFraudDetector:
     """
     Détecteur de fraude optimisé pour les cartes de crédit.
@@ -42,19 +805,32 @@ class CreditCardFraudDetector:
     - Optimisation des seuils de décision
     """
     
-    def __init__(self, algorithm='random_forest', balance_data=True, verbose=True):
+    def __init__(self, algorithm='random_forest', balance_data=True, verbose=True,
+                 model_params=None, resampler=None, instrumentation=None):
         self.algorithm = algorithm
         self.balance_data = balance_data
         self.verbose = verbose
+        self.model_params = dict(model_params or {})
+        self.resampler = resampler if resampler is not None else ResamplingStage()
+        # Mesures par étape (voir instrumentation.Instrumentation), None = désactivé
+        self.instrumentation = instrumentation
         self.model = None
         self.scaler = None
         self.feature_names = None
+        self.threshold = None
         self.metrics = {}
+        # Effectifs par classe vus par partial_fit (poids de rééquilibrage)
+        self.class_counts = None
+        # Histogrammes des features d'entraînement (voir drift_monitor)
+        self.reference = None
+        # isolation_forest: bornes des scores d'anomalie à l'entraînement
+        self.anomaly_bounds = None
         
         if verbose:
-            print(f"🔧 Fraud Detector initialisé: {algorithm}")
+            logger.info(f"🔧 Fraud Detector initialisé: {algorithm}")
     
-    def load_data(self, filepath):
+    @instrumented('load_data', rows='result')
+    def load_data(self, filepath, chunksize=None, compact=False):
         """
         Charge le dataset Credit Card Fraud depuis Kaggle.
         
@@ -63,24 +839,67 @@ class CreditCardFraudDetector:
         - V1-V28: features anonymisées (PCA)
         - Amount: montant de la transaction
         - Class: 0=Normal, 1=Fraude
+        
+        Lecture par blocs (chunksize, ou fichier Parquet/Feather) via
+        iter_transactions, statistiques accumulées bloc par bloc.
+        compact=True: V1-V28/Amount en float32, Class en int8.
+        
+        Le DataFrame renvoyé est toujours entièrement en mémoire, et
+        l'assemblage des blocs double brièvement le pic mémoire: chunksize
+        borne la lecture, pas le résultat. Pour un traitement en mémoire
+        bornée, itérer iter_transactions (ou analyze_fraud_patterns avec
+        chunksize, train_incremental).
         """
         try:
-            df = pd.read_csv(filepath)
+            if chunksize is None and not compact and not str(filepath).lower().endswith(
+                    PARQUET_EXTENSIONS + FEATHER_EXTENSIONS):
+                df = pd.read_csv(filepath)
+                
+                if self.verbose:
+                    logger.info(f"📊 Dataset chargé: {len(df):,} transactions")
+                    logger.info(f"   Période: {df['Time'].max()/3600:.1f} heures")
+                    logger.info(f"   Fraudes: {df['Class'].sum():,} ({df['Class'].mean():.3%})")
+                    logger.info(f"   Montant moyen: ${df['Amount'].mean():.2f}")
+                
+                return df
+            
+            # Statistiques incrémentales
+            n_rows = 0
+            n_fraud = 0
+            amount_sum = 0.0
+            max_time = -np.inf
+            
+            chunks = []
+            for chunk in iter_transactions(filepath, chunksize=chunksize or 100_000,
+                                           compact=compact):
+                n_rows += len(chunk)
+                n_fraud += int(chunk['Class'].sum())
+                amount_sum += float(chunk['Amount'].to_numpy().sum(dtype=np.float64))
+                max_time = max(max_time, float(chunk['Time'].max()))
+                chunks.append(chunk)
+            
+            df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+            del chunks
             
             if self.verbose:
-                print(f"📊 Dataset chargé: {len(df):,} transactions")
-                print(f"   Période: {df['Time'].max()/3600:.1f} heures")
-                print(f"   Fraudes: {df['Class'].sum():,} ({df['Class'].mean():.3%})")
-                print(f"   Montant moyen: ${df['Amount'].mean():.2f}")
+                fraud_rate = n_fraud / n_rows if n_rows else 0
+                mean_amount = amount_sum / n_rows if n_rows else 0
+                mode = " (compact)" if compact else ""
+                logger.info(f"📊 Dataset chargé{mode}: {n_rows:,} transactions")
+                logger.info(f"   Période: {max_time/3600:.1f} heures")
+                logger.info(f"   Fraudes: {n_fraud:,} ({fraud_rate:.3%})")
+                logger.info(f"   Montant moyen: ${mean_amount:.2f}")
+                logger.info(f"   Mémoire: {df.memory_usage(deep=True).sum() / 1e6:.1f} Mo")
             
             return df
             
         except FileNotFoundError:
-            print("❌ Fichier non trouvé. Téléchargez depuis:")
-            print("https://www.kaggle.com/mlg-ulb/creditcardfraud")
+            logger.error("❌ Fichier non trouvé. Téléchargez depuis:")
+            logger.error("https://www.kaggle.com/mlg-ulb/creditcardfraud")
             return None
     
-    def analyze_fraud_patterns(self, df):
+    @instrumented('analyze_fraud_patterns')
+    def analyze_fraud_patterns(self, df, chunksize=None):
         """
         Analyse les patterns de fraude pour guider le feature engineering.
         
@@ -88,104 +907,119 @@ class CreditCardFraudDetector:
         - Patterns temporels (fraude plus fréquente certaines heures?)
         - Patterns de montants (petits vs gros montants)
         - Corrélations entre features V1-V28
-        """
-        print("🔍 Analyse des patterns de fraude...")
-        
-        fraud_data = df[df['Class'] == 1]
-        normal_data = df[df['Class'] == 0]
         
-        patterns = {}
-        
-        # 1. Analyse temporelle
-        df['Hour'] = (df['Time'] / 3600) % 24
-        fraud_by_hour = df.groupby('Hour')['Class'].agg(['count', 'sum', 'mean'])
-        patterns['temporal'] = fraud_by_hour
-        
-        # 2. Analyse des montants
-        patterns['amount'] = {
-            'fraud_mean': fraud_data['Amount'].mean(),
-            'normal_mean': normal_data['Amount'].mean(),
-            'fraud_median': fraud_data['Amount'].median(),
-            'normal_median': normal_data['Amount'].median()
-        }
+        df: DataFrame, itérable de blocs (ex: iter_transactions) ou
+        FraudPatternStats déjà accumulé (fusion de plusieurs processus).
+        Un seul passage par bloc (voir FraudPatternStats); df n'est pas
+        modifié. Les médianes de montant sont approchées (erreur relative 1%).
+        """
+        logger.info("🔍 Analyse des patterns de fraude...")
         
-        # 3. Features les plus discriminantes
-        feature_importance = {}
-        for col in [c for c in df.columns if c.startswith('V')]:
-            # Différence de moyennes entre fraude et normal
-            fraud_mean = fraud_data[col].mean()
-            normal_mean = normal_data[col].mean()
-            feature_importance[col] = abs(fraud_mean - normal_mean)
+        if isinstance(df, FraudPatternStats):
+            stats = df
+        else:
+            stats = FraudPatternStats()
+            if isinstance(df, pd.DataFrame):
+                step = chunksize or max(len(df), 1)
+                chunks = (df.iloc[i:i + step] for i in range(0, max(len(df), 1), step))
+            else:
+                chunks = df
+            for chunk in chunks:
+                stats.update(chunk)
         
-        patterns['top_features'] = sorted(feature_importance.items(), 
-                                        key=lambda x: x[1], reverse=True)[:10]
+        patterns = stats.patterns()
         
         if self.verbose:
-            print("✅ Patterns analysés:")
-            print(f"   Montant moyen fraude: ${patterns['amount']['fraud_mean']:.2f}")
-            print(f"   Montant moyen normal: ${patterns['amount']['normal_mean']:.2f}")
-            print(f"   Top 3 features: {[f[0] for f in patterns['top_features'][:3]]}")
+            logger.info("✅ Patterns analysés:")
+            logger.info(f"   Montant moyen fraude: ${patterns['amount']['fraud_mean']:.2f}")
+            logger.info(f"   Montant moyen normal: ${patterns['amount']['normal_mean']:.2f}")
+            logger.info(f"   Top 3 features: {[f[0] for f in patterns['top_features'][:3]]}")
         
         return patterns
     
-    def create_features(self, df):
+    @instrumented('create_features')
+    def create_features(self, df, prev_time=None, entity_column=None, compact=False,
+                        inplace=False, velocity=None):
         """
         Feature engineering spécialisé pour la fraude carte de crédit.
         
-        Features ajoutées:
+        Features ajoutées (voir FEATURE_REGISTRY):
         - Heure de la transaction (patterns temporels)
         - Montant normalisé et catégorisé
         - Interactions entre top features
         - Ratios et transformations métier
-        """
-        df_enhanced = df.copy()
         
+        Les features sont écrites directement dans deux blocs préalloués
+        (valeurs et indicateurs 0/1), sans copie des colonnes brutes.
+        
+        prev_time: Time de la transaction précédant df (traitement par blocs),
+        pour que Time_Delta ne dépende pas du découpage.
+        entity_column: si fourni (ex: id carte), Time_Delta est calculé par
+        entité; prev_time est alors un dict/Series {entité: dernier Time}.
+        compact: valeurs en float32 et indicateurs en int8 (au lieu de
+        float64/int64).
+        inplace: ajoute les colonnes à df lui-même au lieu d'un nouveau DataFrame.
+        velocity: VelocityFeatures (module velocity): nombre et somme des
+        montants par entité sur fenêtres glissantes, ajoutés en fin de
+        colonnes; son état suit les blocs successifs.
+        """
         if self.verbose:
-            print("🔧 Feature engineering...")
-        
-        # 1. Features temporelles
-        df_enhanced['Hour'] = (df_enhanced['Time'] / 3600) % 24
-        df_enhanced['Day'] = (df_enhanced['Time'] / (3600 * 24))
-        
-        # Patterns temporels business
-        df_enhanced['Is_Night'] = ((df_enhanced['Hour'] >= 23) | (df_enhanced['Hour'] <= 6)).astype(int)
-        df_enhanced['Is_Weekend'] = (df_enhanced['Day'] % 7 >= 5).astype(int)
-        df_enhanced['Is_Business_Hours'] = (
-            (df_enhanced['Hour'] >= 9) & (df_enhanced['Hour'] <= 17)
-        ).astype(int)
-        
-        # 2. Features de montant
-        df_enhanced['Amount_Log'] = np.log1p(df_enhanced['Amount'])
-        df_enhanced['Amount_Sqrt'] = np.sqrt(df_enhanced['Amount'])
-        
-        # Catégories métier
-        df_enhanced['Small_Amount'] = (df_enhanced['Amount'] <= 10).astype(int)
-        df_enhanced['Medium_Amount'] = ((df_enhanced['Amount'] > 10) & 
-                                      (df_enhanced['Amount'] <= 100)).astype(int)
-        df_enhanced['Large_Amount'] = (df_enhanced['Amount'] > 100).astype(int)
-        df_enhanced['Round_Amount'] = (df_enhanced['Amount'] % 10 == 0).astype(int)
-        
-        # 3. Interactions entre top features (V14, V4, V11 souvent importants)
-        if all(col in df_enhanced.columns for col in ['V14', 'V4']):
-            df_enhanced['V14_V4_Interaction'] = df_enhanced['V14'] * df_enhanced['V4']
-        
-        if all(col in df_enhanced.columns for col in ['V14', 'V11']):
-            df_enhanced['V14_V11_Ratio'] = np.where(
-                df_enhanced['V11'] != 0, 
-                df_enhanced['V14'] / df_enhanced['V11'], 
-                0
-            )
+            logger.info("🔧 Feature engineering...")
+        
+        specs = active_features(df.columns)
+        dtypes = feature_dtypes(compact)
+        
+        time_delta = None
+        if entity_column is not None:
+            time_delta = df.groupby(entity_column, sort=False, dropna=False)['Time'].diff()
+            if prev_time is not None and len(df) > 0:
+                # Première transaction de chaque entité dans ce bloc
+                first = time_delta.isna()
+                last_seen = df.loc[first, entity_column].map(prev_time)
+                time_delta[first] = df.loc[first, 'Time'] - last_seen
+            time_delta = time_delta.fillna(0).to_numpy(dtype=np.float64)
+        
+        inputs = _FeatureInputs(df, prev_time=prev_time, time_delta=time_delta)
         
-        # 4. Features d'agrégation temporelle
-        df_enhanced['Time_Delta'] = df_enhanced['Time'].diff().fillna(0)
-        df_enhanced['Frequent_User'] = (df_enhanced['Time_Delta'] < 300).astype(int)  # < 5 min
+        # Un bloc par type, ordre Fortran: chaque feature est une colonne contiguë
+        blocks = []
+        for kind in ('value', 'flag'):
+            kind_specs = [spec for spec in specs if spec.kind == kind]
+            block = np.empty((len(df), len(kind_specs)), dtype=dtypes[kind], order='F')
+            for j, spec in enumerate(kind_specs):
+                spec.compute(inputs, block[:, j])
+            blocks.append(pd.DataFrame(block, index=df.index, copy=False,
+                                       columns=[spec.name for spec in kind_specs]))
+        
+        names = [spec.name for spec in specs]
+        n_new = len([name for name in names if name not in df.columns])
+        
+        derived = pd.concat(blocks, axis=1)[names]
+        if inplace:
+            for name in names:
+                df[name] = derived[name]
+            df_enhanced = df
+        else:
+            existing = [name for name in names if name in df.columns]
+            base = df.drop(columns=existing) if existing else df
+            df_enhanced = pd.concat([base, derived], axis=1)
+            if existing:
+                # Colonnes déjà présentes: remplacées à leur position
+                df_enhanced = df_enhanced[list(df.columns) +
+                                          [name for name in names if name not in df.columns]]
+        
+        if velocity is not None:
+            windowed = velocity.transform(df)
+            n_new += len([name for name in windowed.columns if name not in df.columns])
+            for name in windowed.columns:
+                df_enhanced[name] = windowed[name].astype(dtypes['value'], copy=False)
         
         if self.verbose:
-            new_features = len(df_enhanced.columns) - len(df.columns)
-            print(f"   ✅ {new_features} nouvelles features créées")
+            logger.info(f"   ✅ {n_new} nouvelles features créées")
         
         return df_enhanced
     
+    @instrumented('prepare_data')
     def prepare_data(self, df, test_size=0.2):
         """
         Prépare les données pour l'entraînement.
@@ -211,12 +1045,13 @@ class CreditCardFraudDetector:
         y_test = y.iloc[split_idx:]
         
         if self.verbose:
-            print(f"📊 Division temporelle des données:")
-            print(f"   Train: {len(X_train):,} ({y_train.mean():.3%} fraude)")
-            print(f"   Test:  {len(X_test):,} ({y_test.mean():.3%} fraude)")
+            logger.info(f"📊 Division temporelle des données:")
+            logger.info(f"   Train: {len(X_train):,} ({y_train.mean():.3%} fraude)")
+            logger.info(f"   Test:  {len(X_test):,} ({y_test.mean():.3%} fraude)")
         
         return X_train, X_test, y_train, y_test
     
+    @instrumented('train')
     def train(self, X_train, y_train):
         """
         Entraîne le modèle avec gestion du déséquilibre.
@@ -227,33 +1062,198 @@ class CreditCardFraudDetector:
         - Class weights pour pénaliser les erreurs
         """
         if self.verbose:
-            print(f"🤖 Entraînement {self.algorithm}...")
+            logger.info(f"🤖 Entraînement {self.algorithm}...")
+        
+        from sklearn.preprocessing import StandardScaler
+        
+        # Colonnes du modèle (train appelé sans prepare_data, ex: cascade)
+        if hasattr(X_train, 'columns'):
+            self.feature_names = list(X_train.columns)
         
         # Normalisation des features
         self.scaler = StandardScaler()
         X_train_scaled = self.scaler.fit_transform(X_train)
         
+        # Référence pour la surveillance de dérive (features brutes)
+        self.reference = FeatureHistogram.from_data(X_train, self._input_names(X_train))
+        
         # Gestion du déséquilibre
-        if self.balance_data and self.algorithm != 'isolation_forest':
-            if self.verbose:
-                print("   ⚖️ Rééquilibrage des données...")
-            
-            # Pipeline SMOTE + Undersampling
-            over = SMOTE(sampling_strategy=0.3, random_state=42)  # 30% de fraudes
-            under = RandomUnderSampler(sampling_strategy=0.7, random_state=42)  # 70% normaux
-            
-            pipeline = ImbPipeline([('over', over), ('under', under)])
-            X_resampled, y_resampled = pipeline.fit_resample(X_train_scaled, y_train)
-            
-            if self.verbose:
-                print(f"      Avant: {len(y_train):,} ({y_train.mean():.3%} fraude)")
-                print(f"      Après: {len(y_resampled):,} ({y_resampled.mean():.3%} fraude)")
+        X_resampled, y_resampled = self._resample(X_train_scaled, y_train)
+        
+        # Initialisation et entraînement du modèle
+        self._score_cache = {}
+        self.class_counts = None
+        self.model = self._build_model(y_train)
+        self._fit_model(X_train_scaled, y_train, X_resampled, y_resampled)
+        
+        if self.verbose:
+            logger.info("✅ Modèle entraîné!")
+    
+    @instrumented('partial_fit')
+    def partial_fit(self, X_chunk, y_chunk):
+        """
+        Met à jour le modèle avec un bloc de données (algorithm='sgd_logistic').
+        
+        Mémoire bornée par la taille du bloc:
+        - scaler mis à jour incrémentalement (moyenne/variance courantes)
+        - déséquilibre traité par des poids 'balanced' calculés sur les
+          effectifs cumulés de tous les blocs vus (SMOTE n'a pas de sens
+          bloc par bloc), sauf class_weight explicite dans model_params
+        
+        Sur un modèle déjà entraîné (ou rechargé par load_model), continue
+        l'apprentissage: rafraîchissement avec de nouvelles journées.
+        """
+        if self.algorithm != 'sgd_logistic':
+            raise ValueError(f"partial_fit non supporté pour {self.algorithm} "
+                             "(utilisez algorithm='sgd_logistic')")
+        
+        from sklearn.preprocessing import StandardScaler
+        
+        y = np.asarray(y_chunk).astype(np.int64)
+        if self.model is None:
+            self.scaler = StandardScaler()
+            self.model = self._build_model(y)
+            if self.model.class_weight == 'balanced':
+                # Non supporté par partial_fit: remplacé par les poids cumulés
+                self.model.set_params(class_weight=None)
+            self.class_counts = np.zeros(2, dtype=np.int64)
+            if self.feature_names is None and hasattr(X_chunk, 'columns'):
+                self.feature_names = list(X_chunk.columns)
+            self.reference = None
+        elif not hasattr(self.scaler, 'partial_fit'):
+            raise ValueError("Scaler sans état incrémental (modèle au format mmap): "
+                             "rafraîchissement impossible, sauvegardez en joblib")
+        if self.class_counts is None:
+            self.class_counts = np.zeros(2, dtype=np.int64)
+        
+        self.scaler.partial_fit(X_chunk)
+        X_scaled = self.scaler.transform(X_chunk)
+        # Référence de dérive: bornes fixées par le premier bloc, effectifs cumulés
+        if self.reference is None:
+            self.reference = FeatureHistogram.from_data(X_chunk, self._input_names(X_chunk))
+        else:
+            self.reference.update(X_chunk)
+        self.class_counts += np.bincount(y, minlength=2)[:2]
+        
+        sample_weight = None
+        if 'class_weight' not in self.model_params:
+            # Poids 'balanced' sur les effectifs cumulés: stables d'un bloc à l'autre
+            weights = self.class_counts.sum() / (2 * np.maximum(self.class_counts, 1))
+            sample_weight = weights[y]
+        
+        self._score_cache = {}
+        # Le scaler est mis à jour en place: statistiques du plan à recalculer
+        self._scoring_plan = None
+        self.model.partial_fit(X_scaled, y, classes=np.array([0, 1]),
+                               sample_weight=sample_weight)
+        return self
+    
+    def train_incremental(self, source, chunksize=100_000, compact=False, velocity=None):
+        """
+        Entraînement hors mémoire (algorithm='sgd_logistic').
+        
+        source: fichier de transactions brutes (CSV/Parquet/Feather, lu par
+        iter_transactions) ou itérable de blocs bruts (DataFrames), dans
+        l'ordre de Time. Chaque bloc passe par create_features (Time_Delta
+        correct aux frontières) puis partial_fit.
+        
+        Rappeler train_incremental sur de nouvelles données rafraîchit le
+        modèle sans repartir de zéro.
+        
+        velocity: VelocityFeatures passé à create_features (fenêtres
+        continues d'un bloc à l'autre); sa colonne d'entité n'est pas une
+        feature du modèle.
+        
+        Returns:
+            dict: 'rows', 'chunks', 'frauds'
+        """
+        if isinstance(source, (str, os.PathLike)):
+            chunks = iter_transactions(source, chunksize=chunksize, compact=compact)
         else:
-            X_resampled, y_resampled = X_train_scaled, y_train
+            chunks = source
+        
+        if self.verbose:
+            logger.info(f"🤖 Entraînement incrémental {self.algorithm}...")
+        
+        verbose, self.verbose = self.verbose, False
+        n_rows = n_chunks = n_frauds = 0
+        prev_time = None
+        excluded = ['Class', 'Time'] + ([velocity.entity_column] if velocity is not None else [])
+        try:
+            for chunk in chunks:
+                if len(chunk) == 0:
+                    continue
+                features = self.create_features(chunk, prev_time=prev_time, velocity=velocity)
+                prev_time = chunk['Time'].iloc[-1]
+                feature_cols = self.feature_names or [col for col in features.columns
+                                                      if col not in excluded]
+                self.partial_fit(features[feature_cols], features['Class'])
+                n_rows += len(chunk)
+                n_chunks += 1
+                n_frauds += int(features['Class'].sum())
+        finally:
+            self.verbose = verbose
+        
+        if self.verbose:
+            logger.info(f"✅ Modèle mis à jour: {n_rows:,} transactions en {n_chunks} blocs "
+                        f"({n_frauds:,} fraudes)")
+        
+        return {'rows': n_rows, 'chunks': n_chunks, 'frauds': n_frauds}
+    
+    def _input_names(self, X):
+        if hasattr(X, 'columns'):
+            return list(X.columns)
+        if self.feature_names is not None:
+            return list(self.feature_names)
+        # Tableau numpy sans noms de colonnes: noms positionnels
+        return [f'feature_{i}' for i in range(np.shape(X)[1])]
+    
+    def drift_monitor(self, decay=None, features=None):
+        """
+        DriftMonitor sur la référence d'entraînement du modèle.
+        
+        Alimenté par les batches de features brutes (colonnes feature_names),
+        il calcule PSI et KS par feature en mémoire fixe.
+        
+        features: features surveillées (défaut: toutes sauf
+        TIME_POSITION_FEATURES, en dérive permanente d'un jour à l'autre;
+        les passer explicitement pour les inclure)
+        """
+        if self.reference is None:
+            raise ValueError("Pas de référence de dérive: modèle entraîné avant "
+                             "son introduction, réentraînez-le")
+        if features is None:
+            features = [name for name in self.reference.feature_names
+                        if name not in TIME_POSITION_FEATURES]
+        return DriftMonitor(self.reference.select(features), decay=decay)
+    
+    @instrumented('resample')
+    def _resample(self, X_train_scaled, y_train):
+        """Rééquilibrage SMOTE + undersampling (sauf isolation_forest)."""
+        if not (self.balance_data and self.algorithm != 'isolation_forest'):
+            return X_train_scaled, y_train
+        
+        if self.verbose:
+            logger.info("   ⚖️ Rééquilibrage des données...")
+        
+        # SMOTE (30% de fraudes) + Undersampling (70% normaux), voir ResamplingStage
+        X_resampled, y_resampled = self.resampler.fit_resample(X_train_scaled, y_train)
+        
+        if self.verbose:
+            if self.resampler.last_cache_hit:
+                logger.info("      ♻️ Données rééchantillonnées lues depuis le cache")
+            logger.info(f"      Avant: {len(y_train):,} ({y_train.mean():.3%} fraude)")
+            logger.info(f"      Après: {len(y_resampled):,} ({y_resampled.mean():.3%} fraude)")
+        
+        return X_resampled, y_resampled
+    
+    def _build_model(self, y_train):
+        """Estimateur non entraîné, hyperparamètres par défaut + model_params."""
+        from sklearn.ensemble import IsolationForest, RandomForestClassifier
+        from sklearn.linear_model import LogisticRegression, SGDClassifier
         
-        # Initialisation du modèle
         if self.algorithm == 'random_forest':
-            self.model = RandomForestClassifier(
+            params = dict(
                 n_estimators=100,
                 max_depth=10,
                 min_samples_split=5,
@@ -261,31 +1261,53 @@ class CreditCardFraudDetector:
                 random_state=42,
                 n_jobs=-1
             )
+            params.update(self.model_params)
+            return RandomForestClassifier(**params)
         elif self.algorithm == 'logistic':
-            self.model = LogisticRegression(
+            params = dict(
                 class_weight='balanced' if not self.balance_data else None,
                 random_state=42,
                 max_iter=1000
             )
+            params.update(self.model_params)
+            return LogisticRegression(**params)
+        elif self.algorithm == 'sgd_logistic':
+            # Régression logistique par SGD: entraînable bloc par bloc (partial_fit)
+            params = dict(
+                loss='log_loss',
+                alpha=1e-4,
+                # Moyenne des itérés (ASGD): stable en une seule passe sur les blocs
+                average=True,
+                class_weight='balanced' if not self.balance_data else None,
+                random_state=42
+            )
+            params.update(self.model_params)
+            return SGDClassifier(**params)
         elif self.algorithm == 'isolation_forest':
-            contamination_rate = y_train.mean()  # Pourcentage de fraudes
-            self.model = IsolationForest(
+            contamination_rate = np.mean(y_train)  # Pourcentage de fraudes
+            params = dict(
                 contamination=contamination_rate,
                 random_state=42,
                 n_jobs=-1
             )
+            params.update(self.model_params)
+            return IsolationForest(**params)
         
-        # Entraînement
+        raise ValueError(f"Algorithme inconnu: {self.algorithm}")
+    
+    def _fit_model(self, X_train_scaled, y_train, X_resampled, y_resampled):
+        """Entraîne self.model sur les données adaptées à l'algorithme."""
         if self.algorithm == 'isolation_forest':
             # Isolation Forest: entraîner seulement sur données normales
-            normal_data = X_train_scaled[y_train == 0]
+            normal_data = X_train_scaled[np.asarray(y_train) == 0]
             self.model.fit(normal_data)
+            # Calibration figée: mêmes probabilités quel que soit le lot scoré
+            scores = self.model.decision_function(X_train_scaled)
+            self.anomaly_bounds = (float(scores.min()), float(scores.max()))
         else:
             self.model.fit(X_resampled, y_resampled)
-        
-        if self.verbose:
-            print("✅ Modèle entraîné!")
     
+    @instrumented('predict')
     def predict(self, X_test, threshold=0.5):
         """Prédictions avec seuil personnalisable."""
         X_test_scaled = self.scaler.transform(X_test)
@@ -298,20 +1320,245 @@ class CreditCardFraudDetector:
             probas = self.model.predict_proba(X_test_scaled)[:, 1]
             return (probas >= threshold).astype(int)
     
+    @instrumented('predict_proba')
     def predict_proba(self, X_test):
         """Probabilités de fraude."""
         X_test_scaled = self.scaler.transform(X_test)
-        
+        return self._proba_from_scaled(X_test_scaled)
+    
+    def _proba_from_scaled(self, X_scaled):
+        """Probabilités de fraude à partir de features déjà normalisées."""
         if self.algorithm == 'isolation_forest':
-            # Convertir scores d'anomalie en probabilités
-            scores = self.model.decision_function(X_test_scaled)
-            # Normaliser entre 0 et 1
-            probas = (scores.max() - scores) / (scores.max() - scores.min())
-            return probas
+            return self._anomaly_to_proba(self.model.decision_function(X_scaled))
         else:
-            return self.model.predict_proba(X_test_scaled)[:, 1]
+            return self.model.predict_proba(X_scaled)[:, 1]
+    
+    def _anomaly_to_proba(self, scores):
+        """
+        Convertit les scores d'anomalie en probabilités.
+        
+        Normalisation min-max sur les bornes des scores d'entraînement
+        (anomaly_bounds), bornée à [0, 1]: une transaction a la même
+        probabilité scorée seule ou dans un lot.
+        """
+        if self.anomaly_bounds is None:
+            # Modèle sauvegardé sans calibration: normalisation sur le lot
+            return (scores.max() - scores) / (scores.max() - scores.min())
+        low, high = self.anomaly_bounds
+        return np.clip((high - scores) / (high - low), 0.0, 1.0)
+    
+    def score_vector(self, X_test):
+        """
+        Probabilités de fraude de X_test, calculées une seule fois par jeu
+        de données (cache par empreinte du contenu, vidé à chaque
+        entraînement/chargement). Base de evaluate, cost_curve,
+        threshold_table et find_optimal_threshold.
+        """
+        return self._score_entry(X_test)['proba']
+    
+    def _score_entry(self, X_test):
+        values = np.ascontiguousarray(X_test.to_numpy() if hasattr(X_test, 'to_numpy') else X_test)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f'{values.dtype.str}{values.shape}'.encode())
+        if hasattr(X_test, 'columns'):
+            digest.update('|'.join(map(str, X_test.columns)).encode())
+        digest.update(memoryview(values).cast('B'))
+        key = digest.hexdigest()
+        
+        cache = self.__dict__.setdefault('_score_cache', {})
+        if key in cache:
+            return cache[key]
+        
+        stage = (self.instrumentation.stage('inference', rows=len(values))
+                 if self.instrumentation is not None else NULL_STAGE)
+        with stage:
+            X_scaled = self.scaler.transform(X_test)
+            entry = {'curves': {}, 'aucs': {}}
+            if self.algorithm == 'isolation_forest':
+                decision = self.model.decision_function(X_scaled)
+                entry['proba'] = self._anomaly_to_proba(decision)
+                # Décision propre du modèle (-1 = anomalie), comme predict
+                entry['anomaly'] = decision < 0
+            else:
+                entry['proba'] = self._proba_from_scaled(X_scaled)
+        
+        # Quelques jeux récents seulement (test, validation...)
+        while len(cache) >= 4:
+            cache.pop(next(iter(cache)))
+        cache[key] = entry
+        return entry
+    
+    @staticmethod
+    def _labels_key(y_true):
+        """Empreinte des labels: les résultats en cache dépendent aussi de y."""
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f'{y_true.dtype.str}{y_true.shape}'.encode())
+        digest.update(memoryview(y_true).cast('B'))
+        return digest.hexdigest()
+    
+    def _curve_for(self, entry, y_test, investigation_cost, fraud_cost):
+        """CostCurve du jeu en cache (mémorisée pour des coûts scalaires)."""
+        y_true = np.ascontiguousarray(y_test)
+        if np.ndim(fraud_cost) != 0:
+            return CostCurve(y_true, entry['proba'], investigation_cost, fraud_cost)
+        
+        key = (self._labels_key(y_true), investigation_cost, fraud_cost)
+        if key not in entry['curves']:
+            entry['curves'][key] = CostCurve(y_true, entry['proba'],
+                                             investigation_cost, fraud_cost)
+        return entry['curves'][key]
+    
+    def _get_scoring_plan(self):
+        """
+        Plan de scoring sans pandas, construit une fois par modèle.
+        
+        Entrée brute: Time puis les colonnes brutes dans l'ordre de
+        feature_names (voir scoring_columns). Les features dérivées sont
+        écrites directement à leur position dans feature_names.
+        """
+        plan = getattr(self, '_scoring_plan', None)
+        if (plan is not None and plan['scaler'] is self.scaler
+                and plan['feature_names'] is self.feature_names):
+            return plan
+        
+        if self.scaler is None:
+            raise ValueError("Modèle non entraîné: appelez train() ou load_model()")
+        if self.feature_names is None:
+            raise ValueError("feature_names inconnues (modèle entraîné sur un tableau "
+                             "numpy): entraînez sur un DataFrame")
+        
+        raw_columns = ['Time'] + [c for c in self.feature_names if c not in DERIVED_FEATURES]
+        raw_index = {name: i for i, name in enumerate(raw_columns)}
+        feature_index = {name: i for i, name in enumerate(self.feature_names)}
+        
+        plan = {
+            'scaler': self.scaler,
+            'feature_names': self.feature_names,
+            'raw_columns': raw_columns,
+            'raw_index': raw_index,
+            'feature_index': feature_index,
+            'raw_src': np.array([raw_index[c] for c in raw_columns[1:]], dtype=np.intp),
+            'raw_dst': np.array([feature_index[c] for c in raw_columns[1:]], dtype=np.intp),
+            # Statistiques du scaler précalculées (même calcul que transform)
+            'mean': (np.asarray(self.scaler.mean_, dtype=np.float64)
+                     if getattr(self.scaler, 'with_mean', True) else None),
+            'scale': (np.asarray(self.scaler.scale_, dtype=np.float64)
+                      if getattr(self.scaler, 'with_std', True) else None),
+            'derived': [(name, feature_index[name]) for name in DERIVED_FEATURES
+                        if name in feature_index],
+            'derived_scalar': [(FEATURE_SPECS[name].scalar, feature_index[name])
+                               for name in DERIVED_FEATURES if name in feature_index],
+            'row_raw': np.empty((1, len(raw_columns)), dtype=np.float64),
+            'row_features': np.empty((1, len(self.feature_names)), dtype=np.float64)
+        }
+        self._scoring_plan = plan
+        return plan
+    
+    def scoring_columns(self):
+        """Ordre des colonnes brutes attendu par score_one/score_many."""
+        return list(self._get_scoring_plan()['raw_columns'])
+    
+    def _fill_features(self, raw, out, prev_time=None, time_delta=None):
+        """
+        Calcule les features de create_features directement dans `out`.
+        
+        raw: tableau (n, len(raw_columns)); out: tableau (n, n_features).
+        time_delta: Time_Delta par ligne, sinon calculé dans l'ordre du lot.
+        Mêmes calculs (FEATURE_REGISTRY) que create_features: résultats identiques.
+        """
+        plan = self._get_scoring_plan()
+        col = plan['raw_index']
+        
+        out[:, plan['raw_dst']] = raw[:, plan['raw_src']]
+        
+        # Même registre de features que create_features
+        inputs = _FeatureInputs({name: raw[:, i] for name, i in col.items()}, prev_time,
+                                time_delta=time_delta)
+        for name, idx in plan['derived']:
+            FEATURE_SPECS[name].compute(inputs, out[:, idx])
+        
+        # Normalisation en place avec les statistiques précalculées
+        if plan['mean'] is not None:
+            out -= plan['mean']
+        if plan['scale'] is not None:
+            out /= plan['scale']
+        
+        return out
+    
+    @instrumented('score_one', rows=1)
+    def score_one(self, transaction, prev_time=None):
+        """
+        Score une transaction sans passer par pandas.
+        
+        transaction: dict {colonne: valeur} ou ligne numpy dans l'ordre
+        de scoring_columns() (Time, V1-V28, Amount pour le dataset Kaggle).
+        prev_time: Time de la transaction précédente (Time_Delta), sinon 0.
+        """
+        plan = self._get_scoring_plan()
+        raw = plan['row_raw']
+        
+        if isinstance(transaction, dict):
+            for i, name in enumerate(plan['raw_columns']):
+                raw[0, i] = transaction[name]
+        else:
+            raw[0, :] = transaction
+        
+        features = self._fill_row(raw, plan['row_features'], prev_time)
+        return float(self._proba_from_scaled(features)[0])
+    
+    def _fill_row(self, raw, out, prev_time=None):
+        """
+        Variante scalaire de _fill_features pour une seule ligne.
+        
+        Même registre (FeatureSpec.scalar, en floats Python): résultats
+        identiques au batch sans le coût numpy par feature.
+        """
+        plan = self._get_scoring_plan()
+        row = out[0]
+        
+        row[plan['raw_dst']] = raw[0, plan['raw_src']]
+        inputs = _ScalarInputs(dict(zip(plan['raw_columns'], raw[0].tolist())), prev_time)
+        for scalar, idx in plan['derived_scalar']:
+            row[idx] = scalar(inputs)
+        
+        if plan['mean'] is not None:
+            out -= plan['mean']
+        if plan['scale'] is not None:
+            out /= plan['scale']
+        
+        return out
+    
+    @instrumented('score_many')
+    def score_many(self, transactions, prev_time=None, time_delta=None):
+        """
+        Score un lot de transactions sans passer par pandas.
+        
+        transactions: tableau (n, scoring_columns()) ou liste de dicts.
+        Les Time_Delta sont calculés dans l'ordre du lot, comme create_features,
+        sauf si time_delta (un par ligne) est fourni: transactions
+        indépendantes, chacune scorée comme par score_one.
+        """
+        plan = self._get_scoring_plan()
+        
+        if len(transactions) > 0 and isinstance(transactions[0], dict):
+            raw = np.array([[t[name] for name in plan['raw_columns']] for t in transactions],
+                           dtype=np.float64)
+        else:
+            raw = np.asarray(transactions, dtype=np.float64).reshape(-1, len(plan['raw_columns']))
+        
+        if len(raw) == 0:
+            return np.empty(0, dtype=np.float64)
+        
+        # Ordre Fortran, comme la sortie de scaler.transform sur un DataFrame:
+        # les modèles linéaires (BLAS) donnent alors exactement les mêmes scores
+        features = np.empty((len(raw), len(self.feature_names)), dtype=np.float64, order='F')
+        if time_delta is not None:
+            time_delta = np.asarray(time_delta, dtype=np.float64).reshape(len(raw))
+        self._fill_features(raw, features, prev_time, time_delta)
+        return self._proba_from_scaled(features)
     
-    def evaluate(self, X_test, y_test, threshold=0.5):
+    @instrumented('evaluate')
+    def evaluate(self, X_test, y_test, threshold=0.5, investigation_cost=25, fraud_cost=500):
         """
         Évaluation complète avec métriques business.
         
@@ -320,15 +1567,44 @@ class CreditCardFraudDetector:
         - Precision: % de vraies fraudes parmi les alertes
         - Recall: % de fraudes détectées
         - Coût business: faux positifs vs faux négatifs
+          (exemple: investigation = 25€, fraude = 500€)
+        
+        Les scores sont mis en cache: réévaluer X_test à un autre seuil ne
+        relance pas le modèle (voir threshold_table pour N seuils à la fois).
         """
-        predictions = self.predict(X_test, threshold)
-        probabilities = self.predict_proba(X_test)
+        # Une seule inférence par jeu de données (voir score_vector)
+        entry = self._score_entry(X_test)
+        curve = self._curve_for(entry, y_test, investigation_cost, fraud_cost)
         
         # Métriques de base
-        auc = roc_auc_score(y_test, probabilities)
-        cm = confusion_matrix(y_test, predictions)
+        labels_key = self._labels_key(np.ascontiguousarray(y_test))
+        if labels_key not in entry['aucs']:
+            from sklearn.metrics import roc_auc_score
+            
+            entry['aucs'][labels_key] = roc_auc_score(y_test, entry['proba'])
+        auc = entry['aucs'][labels_key]
         
-        tn, fp, fn, tp = cm.ravel()
+        if self.algorithm == 'isolation_forest':
+            # Décision du modèle (-1 = anomalie), comme predict
+            y_true = np.asarray(y_test).astype(bool)
+            anomaly = entry['anomaly']
+            tp = int((anomaly & y_true).sum())
+            fp = int((anomaly & ~y_true).sum())
+            fn = curve.n_positives - tp
+            tn = curve.n_negatives - fp
+            cost_fp = fp * investigation_cost  # Coût fausses alertes
+            cost_fn = fn * fraud_cost          # Coût fraudes ratées
+            savings = tp * fraud_cost - cost_fp  # Économies nettes
+            roi = (savings / cost_fp * 100) if cost_fp > 0 else 0
+        else:
+            row = curve.table([threshold]).iloc[0]
+            tp, fp, fn, tn = int(row['tp']), int(row['fp']), int(row['fn']), int(row['tn'])
+            cost_fp = row['cost_false_positives']
+            cost_fn = row['cost_false_negatives']
+            savings = row['savings']
+            roi = row['roi']
+        
+        cm = np.array([[tn, fp], [fn, tp]])
         precision = tp / (tp + fp) if (tp + fp) > 0 else 0
         recall = tp / (tp + fn) if (tp + fn) > 0 else 0
         f1 = 2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0
@@ -337,18 +1613,8 @@ class CreditCardFraudDetector:
         # Métriques business
         false_positive_rate = fp / (fp + tn) if (fp + tn) > 0 else 0
         fraud_detection_rate = tp / (tp + fn) if (tp + fn) > 0 else 0
-        
-        # Coût estimé (exemple: investigation = 25€, fraude = 500€)
-        investigation_cost = 25
-        fraud_cost = 500
-        
-        cost_fp = fp * investigation_cost  # Coût fausses alertes
-        cost_fn = fn * fraud_cost         # Coût fraudes ratées
         total_cost = cost_fp + cost_fn
         
-        savings = tp * fraud_cost - cost_fp  # Économies nettes
-        roi = (savings / cost_fp * 100) if cost_fp > 0 else 0
-        
         self.metrics = {
             'auc': auc,
             'precision': precision,
@@ -368,29 +1634,68 @@ class CreditCardFraudDetector:
         }
         
         if self.verbose:
-            print("📊 Résultats d'évaluation:")
-            print(f"   AUC: {auc:.4f}")
-            print(f"   Précision: {precision:.4f}")
-            print(f"   Rappel: {recall:.4f}")
-            print(f"   F1-Score: {f1:.4f}")
-            print(f"   Taux détection fraude: {fraud_detection_rate:.2%}")
-            print(f"   Taux faux positifs: {false_positive_rate:.2%}")
-            print(f"\n💰 Impact business:")
-            print(f"   ROI: {roi:.1f}%")
-            print(f"   Économies: {savings:,.0f}€")
+            logger.info("📊 Résultats d'évaluation:")
+            logger.info(f"   AUC: {auc:.4f}")
+            logger.info(f"   Précision: {precision:.4f}")
+            logger.info(f"   Rappel: {recall:.4f}")
+            logger.info(f"   F1-Score: {f1:.4f}")
+            logger.info(f"   Taux détection fraude: {fraud_detection_rate:.2%}")
+            logger.info(f"   Taux faux positifs: {false_positive_rate:.2%}")
+            logger.info(f"\n💰 Impact business:")
+            logger.info(f"   ROI: {roi:.1f}%")
+            logger.info(f"   Économies: {savings:,.0f}€")
         
         return self.metrics
     
-    def find_optimal_threshold(self, X_test, y_test, metric='f1'):
+    def cost_curve(self, X_test, y_test, investigation_cost=25, fraud_cost=500):
+        """
+        Courbe de coût business sur tous les seuils distincts.
+        
+        fraud_cost peut être un scalaire, un vecteur par transaction,
+        ou 'amount' pour pondérer chaque fraude par son montant.
+        """
+        if isinstance(fraud_cost, str) and fraud_cost == 'amount':
+            fraud_cost = np.asarray(X_test['Amount'], dtype=np.float64)
+        
+        return self._curve_for(self._score_entry(X_test), y_test,
+                               investigation_cost, fraud_cost)
+    
+    @instrumented('threshold_table')
+    def threshold_table(self, X_test, y_test, thresholds=None, investigation_cost=25,
+                        fraud_cost=500):
+        """
+        Précision, rappel, F1, coût business et ROI pour un vecteur de seuils.
+        
+        thresholds: seuils à évaluer (défaut: tous les seuils distincts).
+        Une seule inférence (en cache) et un seul appel vectorisé.
+        """
+        curve = self.cost_curve(X_test, y_test, investigation_cost, fraud_cost)
+        return curve.table(curve.thresholds if thresholds is None else thresholds)
+    
+    @instrumented('find_optimal_threshold')
+    def find_optimal_threshold(self, X_test, y_test, metric='f1',
+                               investigation_cost=25, fraud_cost=500):
         """
         Trouve le seuil optimal selon la métrique business choisie.
         
         Options:
         - 'f1': maximise F1-score
         - 'precision': maximise précision
-        - 'business': minimise coût total
+        - 'business': minimise coût total (voir CostCurve)
         """
-        probabilities = self.predict_proba(X_test)
+        if metric == 'business':
+            # Balayage trié unique au lieu d'une matrice de confusion par seuil
+            curve = self.cost_curve(X_test, y_test, investigation_cost, fraud_cost)
+            optimal_threshold = curve.optimal_threshold()
+            
+            if self.verbose:
+                logger.info(f"🎯 Seuil optimal ({metric}): {optimal_threshold:.4f}")
+            
+            return optimal_threshold
+        
+        from sklearn.metrics import precision_recall_curve
+        
+        probabilities = self.score_vector(X_test)
         
         precision_scores, recall_scores, thresholds = precision_recall_curve(y_test, probabilities)
         
@@ -408,22 +1713,9 @@ class CreditCardFraudDetector:
                 optimal_threshold = thresholds[optimal_idx]
             else:
                 optimal_threshold = 0.9  # Seuil conservateur
-                
-        elif metric == 'business':
-            # Minimiser coût total
-            costs = []
-            for threshold in thresholds:
-                preds = (probabilities >= threshold).astype(int)
-                cm = confusion_matrix(y_test, preds)
-                tn, fp, fn, tp = cm.ravel()
-                cost = fp * 25 + fn * 500  # Coûts exemple
-                costs.append(cost)
-            
-            optimal_idx = np.argmin(costs)
-            optimal_threshold = thresholds[optimal_idx]
         
         if self.verbose:
-            print(f"🎯 Seuil optimal ({metric}): {optimal_threshold:.4f}")
+            logger.info(f"🎯 Seuil optimal ({metric}): {optimal_threshold:.4f}")
         
         return optimal_threshold
     
@@ -438,42 +1730,181 @@ class CreditCardFraudDetector:
             return importance_df.head(top_n)
         else:
             if self.verbose:
-                print("⚠️ Feature importance non disponible pour ce modèle")
+                logger.info("⚠️ Feature importance non disponible pour ce modèle")
             return None
     
-    def save_model(self, filepath):
-        """Sauvegarde le modèle complet."""
+    @instrumented('save_model', rows=None)
+    def save_model(self, filepath, threshold=None, format=None):
+        """
+        Sauvegarde le modèle complet.
+        
+        format: 'joblib' (défaut) ou 'mmap' (format versionné mappable,
+        choisi automatiquement pour l'extension .fdm, voir model_format).
+        threshold: seuil de décision enregistré avec le modèle.
+        """
+        if threshold is not None:
+            self.threshold = threshold
+        
         model_data = {
             'model': self.model,
             'scaler': self.scaler,
             'feature_names': self.feature_names,
             'algorithm': self.algorithm,
-            'metrics': self.metrics
+            'threshold': self.threshold,
+            'metrics': self.metrics,
+            'class_counts': self.class_counts,
+            'reference': self.reference.to_dict() if self.reference is not None else None,
+            'anomaly_bounds': self.anomaly_bounds
         }
-        joblib.dump(model_data, filepath)
+        
+        if format is None:
+            format = 'mmap' if str(filepath).endswith(MODEL_EXTENSION) else 'joblib'
+        
+        if format == 'mmap':
+            save_artifact(filepath, model_data)
+        elif format == 'joblib':
+            import joblib
+            
+            joblib.dump(model_data, filepath)
+        else:
+            raise ValueError(f"Format inconnu: {format}")
         
         if self.verbose:
-            print(f"💾 Modèle sauvegardé: {filepath}")
+            logger.info(f"💾 Modèle sauvegardé: {filepath}")
     
+    @instrumented('load_model', rows=None)
     def load_model(self, filepath):
-        """Charge un modèle pré-entraîné."""
-        model_data = joblib.load(filepath)
+        """Charge un modèle pré-entraîné (joblib ou format mappable)."""
+        if is_artifact(filepath):
+            model_data = load_artifact(filepath)
+        else:
+            import joblib
+            
+            model_data = joblib.load(filepath)
         
+        self._score_cache = {}
         self.model = model_data['model']
         self.scaler = model_data['scaler']
         self.feature_names = model_data['feature_names']
         self.algorithm = model_data['algorithm']
+        self.threshold = model_data.get('threshold')
         self.metrics = model_data.get('metrics', {})
+        self.class_counts = model_data.get('class_counts')
+        reference = model_data.get('reference')
+        self.reference = FeatureHistogram.from_dict(reference) if reference else None
+        bounds = model_data.get('anomaly_bounds')
+        self.anomaly_bounds = tuple(bounds) if bounds is not None else None
         
         if self.verbose:
-            print(f"📂 Modèle chargé: {filepath}")
+            logger.info(f"📂 Modèle chargé: {filepath}")
+
+
+class IncrementalFeatureEngine:
+    """
+    Feature engineering incrémental pour flux de transactions.
+    
+    Conserve l'état minimal entre deux appels (dernier Time, ou dernier
+    Time par entité si entity_column est fourni) pour que chaque
+    micro-batch produise exactement les features que create_features
+    aurait produites sur l'historique complet. Travail en O(batch).
+    
+    velocity: VelocityFeatures optionnel (fenêtres glissantes par entité),
+    dont les tampons font partie de l'état.
+    """
+    
+    def __init__(self, detector=None, entity_column=None, velocity=None):
+        self.detector = detector if detector is not None else CreditCardFraudDetector(verbose=False)
+        self.entity_column = entity_column
+        self.velocity = velocity
+        self.reset()
+    
+    def reset(self):
+        """Oublie l'historique (début de flux)."""
+        self.last_time = None
+        self.last_time_by_entity = {}
+        self.n_seen = 0
+        if self.velocity is not None:
+            self.velocity.reset()
+    
+    def get_state(self):
+        """État sérialisable (checkpoint du consommateur)."""
+        return {
+            'last_time': self.last_time,
+            'last_time_by_entity': dict(self.last_time_by_entity),
+            'n_seen': self.n_seen,
+            'velocity': self.velocity.get_state() if self.velocity is not None else None
+        }
+    
+    def set_state(self, state):
+        """Restaure un état produit par get_state."""
+        self.last_time = state['last_time']
+        self.last_time_by_entity = dict(state['last_time_by_entity'])
+        self.n_seen = state['n_seen']
+        if self.velocity is not None and state.get('velocity') is not None:
+            self.velocity.set_state(state['velocity'])
+    
+    def transform(self, batch):
+        """Features du micro-batch, dans l'ordre du flux."""
+        if len(batch) == 0:
+            return self._featurize(batch, None)
+        
+        if self.entity_column is None:
+            features = self._featurize(batch, self.last_time)
+            self.last_time = batch['Time'].iloc[-1]
+        else:
+            features = self._featurize(batch, self.last_time_by_entity)
+            last = batch.groupby(self.entity_column, sort=False, dropna=False)['Time'].last()
+            self.last_time_by_entity.update(last.to_dict())
+            self.last_time = batch['Time'].iloc[-1]
+        
+        self.n_seen += len(batch)
+        return features
+    
+    def _featurize(self, batch, prev_time):
+        detector = self.detector
+        verbose, detector.verbose = detector.verbose, False
+        try:
+            return detector.create_features(batch, prev_time=prev_time,
+                                            entity_column=self.entity_column,
+                                            velocity=self.velocity)
+        finally:
+            detector.verbose = verbose
+    
+    def score(self, batch):
+        """Probabilités de fraude du micro-batch (détecteur entraîné requis)."""
+        features = self.transform(batch)
+        return self.detector.predict_proba(features[self.detector.feature_names])
+    
+    def score_one(self, transaction):
+        """Score une transaction (dict) via le chemin rapide score_one."""
+        time = transaction['Time']
+        if self.entity_column is None:
+            prev_time = self.last_time
+        else:
+            entity = transaction[self.entity_column]
+            prev_time = self.last_time_by_entity.get(entity)
+            self.last_time_by_entity[entity] = time
+        
+        if self.velocity is not None:
+            # Colonnes de vélocité passées à score_one comme colonnes brutes
+            windowed = self.velocity.update(transaction[self.velocity.entity_column], time,
+                                            transaction[self.velocity.amount_column])
+            transaction = {**transaction, **windowed}
+        
+        proba = self.detector.score_one(transaction, prev_time=prev_time)
+        self.last_time = time
+        self.n_seen += 1
+        return proba
 
 
 def plot_evaluation_results(detector, X_test, y_test):
     """
     Graphiques d'évaluation du modèle.
     """
-    probabilities = detector.predict_proba(X_test)
+    import matplotlib.pyplot as plt
+    from sklearn.metrics import precision_recall_curve, roc_auc_score, roc_curve
+    
+    probabilities = detector.score_vector(X_test)
     
     fig, axes = plt.subplots(2, 2, figsize=(15, 10))
     fig.suptitle('Évaluation du Modèle de Détection de Fraude', fontsize=16, fontweight='bold')
@@ -516,7 +1947,34 @@ def plot_evaluation_results(detector, X_test, y_test):
     plt.show()
 
 
-def run_complete_analysis(data_path, algorithm='random_forest'):
+def plot_cost_curve(curve, ax=None):
+    """
+    Coût business en fonction du seuil, à partir d'une CostCurve.
+    
+    Aucune inférence ni matrice de confusion: tout est déjà dans la courbe.
+    """
+    import matplotlib.pyplot as plt
+    
+    if ax is None:
+        fig, ax = plt.subplots(figsize=(10, 6))
+    
+    ax.plot(curve.thresholds, curve.total_cost, label='Coût total')
+    ax.plot(curve.thresholds, curve.cost_false_positives, alpha=0.7, label='Fausses alertes')
+    ax.plot(curve.thresholds, curve.cost_false_negatives, alpha=0.7, label='Fraudes ratées')
+    
+    optimal_threshold = curve.optimal_threshold()
+    ax.axvline(optimal_threshold, color='k', linestyle='--', alpha=0.5,
+               label=f'Seuil optimal = {optimal_threshold:.4f}')
+    
+    ax.set_xlabel('Seuil de décision')
+    ax.set_ylabel('Coût (€)')
+    ax.set_title('Courbe de Coût Business')
+    ax.legend()
+    
+    return ax
+
+
+def run_complete_analysis(data_path, algorithm='random_forest', feature_cache=None):
     """
     Pipeline complet d'analyse de fraude.
     
@@ -526,6 +1984,9 @@ def run_complete_analysis(data_path, algorithm='random_forest'):
     3. Entraînement du modèle
     4. Évaluation et optimisation
     5. Visualisations
+    
+    feature_cache: dossier d'un FeatureStore; les features sont alors relues
+    depuis le cache (seules les lignes ajoutées au fichier sont calculées).
     """
     print("🎯 Analyse Complète de Fraude - Credit Card")
     print("=" * 50)
@@ -533,16 +1994,28 @@ def run_complete_analysis(data_path, algorithm='random_forest'):
     # Initialisation
     detector = CreditCardFraudDetector(algorithm=algorithm, verbose=True)
     
-    # Chargement
-    df = detector.load_data(data_path)
-    if df is None:
-        return None
-    
-    # Analyse des patterns
-    patterns = detector.analyze_fraud_patterns(df)
-    
-    # Feature engineering
-    df_enhanced = detector.create_features(df)
+    if feature_cache is not None:
+        from feature_store import FeatureStore
+        
+        if not os.path.exists(data_path):
+            print("❌ Fichier non trouvé. Téléchargez depuis:")
+            print("https://www.kaggle.com/mlg-ulb/creditcardfraud")
+            return None
+        
+        # Features déjà calculées: les colonnes brutes font partie du cache
+        df_enhanced = FeatureStore(feature_cache).load(data_path)
+        patterns = detector.analyze_fraud_patterns(df_enhanced)
+    else:
+        # Chargement
+        df = detector.load_data(data_path)
+        if df is None:
+            return None
+        
+        # Analyse des patterns
+        patterns = detector.analyze_fraud_patterns(df)
+        
+        # Feature engineering
+        df_enhanced = detector.create_features(df)
     
     # Préparation des données
     X_train, X_test, y_train, y_test = detector.prepare_data(df_enhanced)
@@ -569,36 +2042,45 @@ def run_complete_analysis(data_path, algorithm='random_forest'):
     return detector, final_results
 
 
-# Exemple d'utilisation
-if __name__ == "__main__":
-    print("🧪 Test du Credit Card Fraud Detector")
-    print("=" * 40)
-    
-    # Test avec données synthétiques si pas de fichier
-    print("Créer des données d'exemple pour test...")
+def make_synthetic_transactions(n_samples=10000, random_state=42):
+    """
+    Dataset synthétique au format Kaggle (Time, Amount, V1-V28, Class).
     
-    # Données synthétiques simplifiées
-    np.random.seed(42)
-    n_samples = 10000
+    Fraudes: gros montants (top 5%) plus une probabilité de base de 0.1%.
+    Utilisé pour les tests rapides et les benchmarks (voir benchmark.py).
+    """
+    rng = np.random.RandomState(random_state)
     
     # Simuler le dataset Credit Card
     data = {
-        'Time': np.random.uniform(0, 172800, n_samples),  # 48h en secondes
-        'Amount': np.random.lognormal(3, 1.5, n_samples)
+        'Time': rng.uniform(0, 172800, n_samples),  # 48h en secondes
+        'Amount': rng.lognormal(3, 1.5, n_samples)
     }
     
     # Ajouter features V1-V28 (simulées)
     for i in range(1, 29):
-        data[f'V{i}'] = np.random.normal(0, 1, n_samples)
+        data[f'V{i}'] = rng.normal(0, 1, n_samples)
     
     # Créer fraudes réalistes
     fraud_indicators = (
         (data['Amount'] > np.percentile(data['Amount'], 95)) |  # Gros montants
-        (np.random.random(n_samples) < 0.001)  # Probabilité de base
+        (rng.random_sample(n_samples) < 0.001)  # Probabilité de base
     )
     data['Class'] = fraud_indicators.astype(int)
     
-    df_test = pd.DataFrame(data)
+    return pd.DataFrame(data)
+
+
+# Exemple d'utilisation
+if __name__ == "__main__":
+    print("🧪 Test du Credit Card Fraud Detector")
+    print("=" * 40)
+    
+    # Test avec données synthétiques si pas de fichier
+    print("Créer des données d'exemple pour test...")
+    
+    # Données synthétiques simplifiées
+    df_test = make_synthetic_transactions(10000)
     
     print(f"✅ Dataset test: {len(df_test):,} transactions, {df_test['Class'].mean():.3%} fraude")
     
@@ -0,0 +1,317 @@
+"""
+Instrumentation
+===============
+
+Mesures par étape du pipeline (load_data, create_features, train,
+predict_proba, evaluate, score_one...): temps réel, temps CPU, lignes
+traitées, pic mémoire et histogramme des latences.
+
+- Désactivée par défaut: une méthode instrumentée coûte alors un test
+  d'attribut (detector.instrumentation is None)
+- Hooks enfichables: tout callable recevant le dict de chaque mesure
+- Export en dict structuré (to_dict) et au format texte Prometheus
+  (to_prometheus)
+
+    instrumentation = Instrumentation(memory='tracemalloc')
+    detector = CreditCardFraudDetector(instrumentation=instrumentation)
+    ...
+    print(instrumentation.to_prometheus())
+"""
+
+import bisect
+import functools
+import math
+import threading
+import time
+import tracemalloc
+
+
+# Bornes (secondes) de l'histogramme des latences, du µs à la minute
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _read_hwm_bytes():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) * 1024
+    return None
+
+
+def _reset_hwm():
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+
+
+class _NullStage:
+    """Étape inerte (instrumentation désactivée)."""
+
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    """Mesure d'une étape; `rows` peut être renseigné pendant l'étape."""
+
+    def __init__(self, instrumentation, name, rows=None):
+        self._instrumentation = instrumentation
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self._memory_start = self._instrumentation._memory_enter()
+        self._cpu_start = time.process_time()
+        self._wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall_start
+        cpu = time.process_time() - self._cpu_start
+        peak = self._instrumentation._memory_exit(self._memory_start)
+        self._instrumentation.emit({
+            'stage': self.name,
+            'rows': self.rows,
+            'wall_seconds': wall,
+            'cpu_seconds': cpu,
+            'peak_memory_bytes': peak,
+            'error': exc_type is not None
+        })
+        return False
+
+
+class MetricsRecorder:
+    """Hook par défaut: agrège les mesures par étape (thread-safe)."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def __call__(self, record):
+        with self._lock:
+            stats = self._stages.get(record['stage'])
+            if stats is None:
+                stats = self._stages[record['stage']] = {
+                    'count': 0,
+                    'errors': 0,
+                    'wall_seconds_sum': 0.0,
+                    'wall_seconds_min': math.inf,
+                    'wall_seconds_max': 0.0,
+                    'cpu_seconds_sum': 0.0,
+                    'rows_total': 0,
+                    'peak_memory_bytes': None,
+                    # Dernier compartiment: au-delà de la plus grande borne
+                    'bucket_counts': [0] * (len(self.buckets) + 1)
+                }
+            wall = record['wall_seconds']
+            stats['count'] += 1
+            stats['errors'] += int(record['error'])
+            stats['wall_seconds_sum'] += wall
+            stats['wall_seconds_min'] = min(stats['wall_seconds_min'], wall)
+            stats['wall_seconds_max'] = max(stats['wall_seconds_max'], wall)
+            stats['cpu_seconds_sum'] += record['cpu_seconds']
+            stats['rows_total'] += record['rows'] or 0
+            if record['peak_memory_bytes'] is not None:
+                stats['peak_memory_bytes'] = max(stats['peak_memory_bytes'] or 0,
+                                                 record['peak_memory_bytes'])
+            stats['bucket_counts'][bisect.bisect_left(self.buckets, wall)] += 1
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+
+    def to_dict(self):
+        """Statistiques par étape, histogramme des latences inclus."""
+        with self._lock:
+            result = {}
+            for name, stats in self._stages.items():
+                count = stats['count']
+                wall_sum = stats['wall_seconds_sum']
+                result[name] = {
+                    'count': count,
+                    'errors': stats['errors'],
+                    'wall_seconds': {
+                        'sum': wall_sum,
+                        'mean': wall_sum / count,
+                        'min': stats['wall_seconds_min'],
+                        'max': stats['wall_seconds_max']
+                    },
+                    'cpu_seconds': stats['cpu_seconds_sum'],
+                    'rows': stats['rows_total'],
+                    'rows_per_second': stats['rows_total'] / wall_sum if wall_sum > 0 else None,
+                    'peak_memory_bytes': stats['peak_memory_bytes'],
+                    'latency_histogram': {
+                        'buckets': list(self.buckets) + [math.inf],
+                        'counts': list(stats['bucket_counts'])
+                    }
+                }
+            return result
+
+    def to_prometheus(self, prefix='fraud_detector'):
+        """Format d'exposition texte Prometheus (histogrammes cumulés)."""
+        stages = self.to_dict()
+        lines = [
+            f'# HELP {prefix}_stage_seconds Temps réel par appel d\'étape.',
+            f'# TYPE {prefix}_stage_seconds histogram'
+        ]
+        for name, stats in stages.items():
+            label = _escape(name)
+            cumulative = 0
+            for bound, count in zip(stats['latency_histogram']['buckets'],
+                                    stats['latency_histogram']['counts']):
+                cumulative += count
+                le = '+Inf' if math.isinf(bound) else repr(bound)
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{label}",le="{le}"}} '
+                             f'{cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{label}"}} '
+                         f'{stats["wall_seconds"]["sum"]!r}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{label}"}} {stats["count"]}')
+
+        counters = [
+            ('stage_cpu_seconds_total', 'Temps CPU cumulé par étape.', 'cpu_seconds'),
+            ('stage_rows_total', 'Lignes traitées par étape.', 'rows'),
+            ('stage_errors_total', 'Appels terminés par une exception.', 'errors')
+        ]
+        for metric, help_text, key in counters:
+            lines.append(f'# HELP {prefix}_{metric} {help_text}')
+            lines.append(f'# TYPE {prefix}_{metric} counter')
+            for name, stats in stages.items():
+                lines.append(f'{prefix}_{metric}{{stage="{_escape(name)}"}} {stats[key]!r}')
+
+        lines.append(f'# HELP {prefix}_stage_peak_memory_bytes Pic mémoire observé par étape.')
+        lines.append(f'# TYPE {prefix}_stage_peak_memory_bytes gauge')
+        for name, stats in stages.items():
+            if stats['peak_memory_bytes'] is not None:
+                lines.append(f'{prefix}_stage_peak_memory_bytes{{stage="{_escape(name)}"}} '
+                             f'{stats["peak_memory_bytes"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Instrumentation:
+    """
+    Point d'entrée: crée les mesures d'étapes et les diffuse aux hooks.
+
+    memory:
+    - None: pas de mesure mémoire (coût minimal)
+    - 'tracemalloc': pic des allocations Python/numpy faites pendant
+      l'étape, au-delà de celles déjà présentes à son début (démarre
+      tracemalloc, qui ralentit les allocations)
+    - 'rss': pic de mémoire résidente du processus (Linux, via
+      /proc/self/clear_refs); inclut les allocations natives
+    """
+
+    def __init__(self, hooks=None, memory=None, buckets=DEFAULT_BUCKETS):
+        if memory not in (None, 'tracemalloc', 'rss'):
+            raise ValueError(f"Mode mémoire inconnu: {memory}")
+        self.memory = memory
+        self.recorder = MetricsRecorder(buckets)
+        self.hooks = [self.recorder] + list(hooks or [])
+        # Pics des étapes englobantes (étapes imbriquées), par thread
+        self._local = threading.local()
+
+        if memory == 'tracemalloc' and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if memory == 'rss':
+            try:
+                _reset_hwm()
+            except OSError:
+                raise ValueError("memory='rss' requiert Linux (/proc/self/clear_refs)")
+
+    def stage(self, name, rows=None):
+        """Contexte de mesure d'une étape."""
+        return _Stage(self, name, rows)
+
+    def emit(self, record):
+        for hook in self.hooks:
+            hook(record)
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def _current_peak(self):
+        if self.memory == 'tracemalloc':
+            return tracemalloc.get_traced_memory()[1]
+        return _read_hwm_bytes()
+
+    def _reset_peak(self):
+        if self.memory == 'tracemalloc':
+            tracemalloc.reset_peak()
+        else:
+            _reset_hwm()
+
+    def _memory_enter(self):
+        if self.memory is None:
+            return None
+        stack = self._local.__dict__.setdefault('stack', [])
+        if stack:
+            # Le reset efface le pic en cours de l'étape englobante: on le garde
+            stack[-1] = max(stack[-1], self._current_peak())
+        self._reset_peak()
+        stack.append(0)
+        # tracemalloc: pic rapporté au-delà des allocations déjà présentes
+        return tracemalloc.get_traced_memory()[0] if self.memory == 'tracemalloc' else 0
+
+    def _memory_exit(self, baseline):
+        if baseline is None:
+            return None
+        stack = self._local.stack
+        peak = max(stack.pop(), self._current_peak())
+        if stack:
+            stack[-1] = max(stack[-1], peak)
+        return peak - baseline
+
+    def to_dict(self):
+        return self.recorder.to_dict()
+
+    def to_prometheus(self, prefix='fraud_detector'):
+        return self.recorder.to_prometheus(prefix)
+
+    def reset(self):
+        self.recorder.reset()
+
+
+def instrumented(stage, rows='arg'):
+    """
+    Décorateur de méthode: mesure l'appel si self.instrumentation est défini.
+
+    rows: 'arg' (len du premier argument), 'result' (len du résultat),
+    un entier fixe, ou None.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            instrumentation = getattr(self, 'instrumentation', None)
+            if instrumentation is None:
+                return method(self, *args, **kwargs)
+
+            with instrumentation.stage(stage) as current:
+                if rows == 'arg' and args:
+                    current.rows = _length(args[0])
+                elif isinstance(rows, int):
+                    current.rows = rows
+                result = method(self, *args, **kwargs)
+                if rows == 'result':
+                    current.rows = _length(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def _length(value):
+    try:
+        return len(value)
+    except TypeError:
+        return None
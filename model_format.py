@@ -0,0 +1,268 @@
+"""
+Model Format
+============
+
+Format de modèle versionné et mappable en mémoire.
+
+Structure du fichier:
+- magic (8 octets) + version (uint32) + taille de l'en-tête (uint32)
+- en-tête JSON: algorithme, feature_names, seuil, métriques, table des tableaux
+- tableaux numériques bruts (noeuds d'arbres, coefficients, scaler,
+  histogrammes de référence), chacun aligné sur 64 octets
+
+Au chargement, le fichier est mappé (mmap, lecture seule): démarrage quasi
+instantané, et N processus de scoring partagent une seule copie physique
+des pages du modèle. Aucun estimateur scikit-learn n'est désérialisé pour
+random_forest et logistic.
+"""
+
+import io
+import json
+import mmap
+import struct
+
+import numpy as np
+
+from compiled_forest import CompiledForest
+
+
+MAGIC = b'FDMODEL\x00'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+MODEL_EXTENSION = '.fdm'
+
+_PREFIX = struct.Struct('<8sII')
+
+
+class ArrayScaler:
+    """StandardScaler réduit à ses statistiques (même calcul que transform)."""
+
+    def __init__(self, mean, scale, with_mean=True, with_std=True):
+        self.mean_ = mean
+        self.scale_ = scale
+        self.with_mean = with_mean
+        self.with_std = with_std
+        self.n_features_in_ = len(scale)
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64, order='K', copy=True)
+        if self.with_mean:
+            X -= self.mean_
+        if self.with_std:
+            X /= self.scale_
+        return X
+
+
+class ForestScorer:
+    """Random forest compilé exposant l'interface predict_proba de scikit-learn."""
+
+    def __init__(self, forest, feature_importances=None):
+        self.forest = forest
+        self.feature_importances_ = feature_importances
+        self.classes_ = np.array([0, 1])
+
+    def predict_proba(self, X):
+        proba = self.forest.predict_proba(X)
+        return np.column_stack([1 - proba, proba])
+
+
+class LinearScorer:
+    """Régression logistique binaire réduite à coef_/intercept_."""
+
+    def __init__(self, coef, intercept):
+        self.coef_ = coef
+        self.intercept_ = intercept
+        self.classes_ = np.array([0, 1])
+
+    def decision_function(self, X):
+        scores = np.asarray(X, dtype=np.float64) @ self.coef_.T + self.intercept_
+        return scores.ravel()
+
+    def predict_proba(self, X):
+        try:
+            from scipy.special import expit
+        except ImportError:
+            def expit(x):
+                return 1 / (1 + np.exp(-x))
+        proba = expit(self.decision_function(X))
+        return np.column_stack([1 - proba, proba])
+
+
+def _to_jsonable(value):
+    """Convertit métriques numpy en types JSON."""
+    if isinstance(value, dict):
+        return {str(k): _to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def is_artifact(filepath):
+    """Vrai si le fichier est au format mappable (sinon: joblib)."""
+    try:
+        with open(filepath, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def write_artifact(filepath, header, arrays):
+    """Écrit l'en-tête JSON puis chaque tableau, aligné sur 64 octets."""
+    table = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        offset = _align(offset)
+        table.append({'name': name, 'dtype': array.dtype.str,
+                      'shape': list(array.shape), 'offset': offset})
+        offset += array.nbytes
+
+    header = dict(header, format_version=FORMAT_VERSION, arrays=table)
+    header_bytes = json.dumps(_to_jsonable(header)).encode('utf-8')
+    data_start = _align(_PREFIX.size + len(header_bytes))
+
+    with open(filepath, 'wb') as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for entry, array in zip(table, arrays.values()):
+            f.write(b'\x00' * (data_start + entry['offset'] - f.tell()))
+            f.write(np.ascontiguousarray(array).tobytes())
+
+
+def read_artifact(filepath):
+    """En-tête et tableaux en lecture seule, adossés à un mmap du fichier."""
+    with open(filepath, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, header_len = _PREFIX.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{filepath}: format de modèle inconnu")
+    if version > FORMAT_VERSION:
+        raise ValueError(f"{filepath}: version {version} non supportée "
+                         f"(max {FORMAT_VERSION})")
+
+    header = json.loads(bytes(buffer[_PREFIX.size:_PREFIX.size + header_len]).decode('utf-8'))
+    data_start = _align(_PREFIX.size + header_len)
+
+    arrays = {}
+    for entry in header['arrays']:
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape'], dtype=np.int64))
+        arrays[entry['name']] = np.frombuffer(buffer, dtype=dtype, count=count,
+                                              offset=data_start + entry['offset']
+                                              ).reshape(entry['shape'])
+    return header, arrays
+
+
+def save_artifact(filepath, model_data):
+    """Convertit model_data (dict de save_model) en artefact mappable."""
+    model = model_data['model']
+    scaler = model_data['scaler']
+    algorithm = model_data['algorithm']
+    if model_data.get('feature_names') is None:
+        raise ValueError("feature_names inconnues (modèle entraîné sur un tableau numpy): "
+                         "entraînez sur un DataFrame pour le format mmap")
+
+    header = {
+        'algorithm': algorithm,
+        'feature_names': list(model_data['feature_names']),
+        'threshold': model_data.get('threshold'),
+        'metrics': model_data.get('metrics', {}),
+        'anomaly_bounds': model_data.get('anomaly_bounds'),
+        'scaler': {'with_mean': bool(getattr(scaler, 'with_mean', True)),
+                   'with_std': bool(getattr(scaler, 'with_std', True))}
+    }
+    arrays = {
+        'scaler_mean': np.asarray(scaler.mean_, dtype=np.float64),
+        'scaler_scale': np.asarray(scaler.scale_, dtype=np.float64)
+    }
+
+    reference = model_data.get('reference')
+    if reference is not None:
+        header['reference'] = {'feature_names': list(reference['feature_names'])}
+        arrays['reference_edges'] = np.asarray(reference['edges'], dtype=np.float64)
+        arrays['reference_counts'] = np.asarray(reference['counts'], dtype=np.float64)
+
+    if algorithm == 'random_forest':
+        forest = model.forest if isinstance(model, ForestScorer) else CompiledForest.from_sklearn(model)
+        header['model'] = {'kind': 'compiled_forest', 'max_depth': forest.max_depth}
+        arrays.update({
+            'forest_feature': forest.feature,
+            'forest_threshold': forest.threshold,
+            'forest_left': forest.left,
+            'forest_right': forest.right,
+            'forest_value': forest.value,
+            'forest_roots': forest.roots,
+            'feature_importances': np.asarray(model.feature_importances_, dtype=np.float64)
+        })
+    elif algorithm in ('logistic', 'sgd_logistic'):
+        header['model'] = {'kind': 'linear'}
+        arrays.update({
+            'linear_coef': np.asarray(model.coef_, dtype=np.float64),
+            'linear_intercept': np.asarray(model.intercept_, dtype=np.float64)
+        })
+    else:
+        # Pas de représentation tabulaire: estimateur picklé dans un bloc brut
+        import joblib
+
+        blob = io.BytesIO()
+        joblib.dump(model, blob)
+        header['model'] = {'kind': 'pickle'}
+        arrays['model_pickle'] = np.frombuffer(blob.getvalue(), dtype=np.uint8)
+
+    write_artifact(filepath, header, arrays)
+
+
+def load_artifact(filepath):
+    """Relit un artefact sous la forme du dict model_data de load_model."""
+    header, arrays = read_artifact(filepath)
+
+    scaler = ArrayScaler(arrays['scaler_mean'], arrays['scaler_scale'],
+                         with_mean=header['scaler']['with_mean'],
+                         with_std=header['scaler']['with_std'])
+
+    kind = header['model']['kind']
+    if kind == 'compiled_forest':
+        forest = CompiledForest(arrays['forest_feature'], arrays['forest_threshold'],
+                                arrays['forest_left'], arrays['forest_right'],
+                                arrays['forest_value'], arrays['forest_roots'],
+                                header['model']['max_depth'], header['feature_names'],
+                                scaled_input=True)
+        model = ForestScorer(forest, arrays['feature_importances'])
+    elif kind == 'linear':
+        model = LinearScorer(arrays['linear_coef'], arrays['linear_intercept'])
+    elif kind == 'pickle':
+        import joblib
+
+        model = joblib.load(io.BytesIO(arrays['model_pickle'].tobytes()))
+    else:
+        raise ValueError(f"{filepath}: type de modèle inconnu '{kind}'")
+
+    metrics = header.get('metrics', {})
+    if 'confusion_matrix' in metrics:
+        metrics['confusion_matrix'] = np.array(metrics['confusion_matrix'])
+
+    reference = None
+    if 'reference' in header:
+        reference = {'feature_names': header['reference']['feature_names'],
+                     'edges': arrays['reference_edges'],
+                     'counts': arrays['reference_counts']}
+
+    return {
+        'model': model,
+        'scaler': scaler,
+        'feature_names': header['feature_names'],
+        'algorithm': header['algorithm'],
+        'threshold': header.get('threshold'),
+        'metrics': metrics,
+        'reference': reference,
+        'anomaly_bounds': header.get('anomaly_bounds')
+    }
@@ -0,0 +1,36 @@
+"""
+Scoring
+=======
+
+Point d'entrée minimal des processus de scoring (workers, serverless).
+
+Seul le chemin de scoring est chargé: scikit-learn, imbalanced-learn,
+matplotlib et joblib ne sont importés que par l'entraînement, l'évaluation
+et les graphiques. Avec un modèle au format mappable (.fdm), random_forest,
+logistic et sgd_logistic se chargent et se scorent sans scikit-learn;
+un modèle joblib importe scikit-learn à la désérialisation.
+
+    from scoring import load_scorer
+
+    scorer = load_scorer('fraud_model.fdm')
+    probas = scorer.score_many(rows)   # colonnes: scorer.scoring_columns()
+
+Mesure du démarrage (import, chargement, premier score, mémoire résidente):
+    python benchmark.py --startup fraud_model.fdm
+"""
+
+from fraud_detector import CreditCardFraudDetector
+
+
+def load_scorer(model_path, single_thread=False):
+    """
+    Détecteur chargé pour le scoring seul.
+
+    single_thread: parallélisme interne des estimateurs désactivé (n_jobs=1),
+    préférable pour de petits batches ou un processus par coeur.
+    """
+    detector = CreditCardFraudDetector(verbose=False)
+    detector.load_model(model_path)
+    if single_thread and getattr(detector.model, 'n_jobs', None) is not None:
+        detector.model.set_params(n_jobs=1)
+    return detector
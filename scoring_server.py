@@ -0,0 +1,353 @@
+"""
+Scoring Server
+==============
+
+Serveur de scoring asyncio (localhost) devant un modèle sauvegardé.
+
+Les requêtes concurrentes sont regroupées en micro-batches:
+- un batch part dès qu'il atteint max_batch_size requêtes, ou max_wait_ms
+  après l'arrivée de sa première requête
+- chaque batch est scoré en un seul appel vectorisé (score_many) sur un
+  thread dédié: la boucle asyncio continue d'accepter les requêtes, qui
+  forment le batch suivant pendant le scoring
+- file d'attente bornée (max_queue): au-delà, réponse 503 immédiate
+  plutôt qu'une latence qui dérive
+
+Chaque transaction est scorée indépendamment (Time_Delta = Time - prev_time
+si prev_time est fourni, 0 sinon): le résultat est celui de score_one, quel
+que soit le batch. Le seuil configuré (ou celui du modèle) donne la décision.
+
+API HTTP/1.1 (JSON, keep-alive):
+    POST /score    {"Time": ..., "V1": ..., "Amount": ..., "prev_time": ...}
+                   ou {"transactions": [{...}, ...]}
+    GET  /health
+    GET  /metrics  (statistiques des batches)
+
+    python scoring_server.py fraud_model.pkl --port 8080 --max-batch-size 64 --max-wait-ms 2
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from fraud_detector import get_logger
+from scoring import load_scorer
+
+
+logger = get_logger(__name__)
+
+
+class ServerBusy(Exception):
+    """File d'attente pleine: la requête est refusée."""
+
+
+class MicroBatcher:
+    """
+    Regroupe les appels concurrents à score() en micro-batches.
+
+    Usage (dans une boucle asyncio):
+        batcher = MicroBatcher(detector, max_batch_size=64, max_wait_ms=2)
+        await batcher.start()
+        result = await batcher.score(transaction)
+        await batcher.stop()
+    """
+
+    def __init__(self, detector, max_batch_size=64, max_wait_ms=2.0, threshold=None,
+                 max_queue=10_000):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size doit être >= 1")
+        self.detector = detector
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.threshold = (threshold if threshold is not None
+                          else detector.threshold if detector.threshold is not None
+                          else 0.5)
+        self.max_queue = max_queue
+        self.columns = detector.scoring_columns()
+        self._queue = None
+        self._task = None
+        self._executor = None
+        self.stats = {'requests': 0, 'rejected': 0, 'batches': 0, 'rows': 0, 'errors': 0,
+                      'max_batch_size': 0, 'scoring_seconds': 0.0}
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scoring')
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _raw_row(self, transaction):
+        try:
+            row = np.array([transaction[name] for name in self.columns], dtype=np.float64)
+        except KeyError as e:
+            raise ValueError(f"Colonne manquante: {e.args[0]}") from None
+        except (TypeError, ValueError):
+            raise ValueError("Valeurs non numériques dans la transaction") from None
+        prev_time = transaction.get('prev_time')
+        time_delta = 0.0 if prev_time is None else row[0] - float(prev_time)
+        return row, time_delta
+
+    async def score(self, transaction):
+        """
+        Score une transaction brute (dict des colonnes de scoring_columns(),
+        plus 'prev_time' optionnel).
+
+        Returns:
+            dict: 'fraud_probability', 'fraud_prediction'
+        """
+        row, time_delta = self._raw_row(transaction)
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((row, time_delta, future))
+        except asyncio.QueueFull:
+            self.stats['rejected'] += 1
+            raise ServerBusy("File de scoring pleine") from None
+        self.stats['requests'] += 1
+        return await future
+
+    async def _collect(self):
+        """Attend une requête, puis complète le batch jusqu'à la taille ou l'échéance."""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _score_batch(self, raw, time_delta):
+        """Un seul appel vectorisé pour tout le batch (thread de scoring)."""
+        start = time.perf_counter()
+        probabilities = self.detector.score_many(raw, time_delta=time_delta)
+        return probabilities, time.perf_counter() - start
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Requêtes abandonnées (client déconnecté) pendant l'attente
+            batch = [item for item in batch if not item[2].done()]
+            if not batch:
+                continue
+
+            raw = np.vstack([item[0] for item in batch])
+            time_delta = np.array([item[1] for item in batch], dtype=np.float64)
+            try:
+                probabilities, seconds = await loop.run_in_executor(
+                    self._executor, self._score_batch, raw, time_delta)
+            except Exception as e:
+                self.stats['errors'] += 1
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.stats['batches'] += 1
+            self.stats['rows'] += len(batch)
+            self.stats['max_batch_size'] = max(self.stats['max_batch_size'], len(batch))
+            self.stats['scoring_seconds'] += seconds
+            for (_, _, future), probability in zip(batch, probabilities.tolist()):
+                if not future.done():
+                    future.set_result({
+                        'fraud_probability': probability,
+                        'fraud_prediction': int(probability >= self.threshold)
+                    })
+
+    def to_dict(self):
+        """Statistiques de batching (taille moyenne, file, temps de scoring)."""
+        return {
+            **self.stats,
+            'mean_batch_size': (self.stats['rows'] / self.stats['batches']
+                                if self.stats['batches'] else None),
+            'queue_size': self._queue.qsize() if self._queue is not None else 0,
+            'threshold': self.threshold
+        }
+
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class ScoringServer:
+    """Serveur HTTP/1.1 minimal (JSON) au-dessus d'un MicroBatcher."""
+
+    def __init__(self, batcher, host='127.0.0.1', port=8080, max_body_bytes=10 * 1024 * 1024,
+                 verbose=True):
+        self.batcher = batcher
+        self.host = host
+        self.port = port
+        self.max_body_bytes = max_body_bytes
+        self.verbose = verbose
+        self._server = None
+
+    async def start(self):
+        await self.batcher.start()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # Port effectif (port=0: choisi par l'OS)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self.verbose:
+            logger.info(f"🚀 Serveur de scoring: http://{self.host}:{self.port} "
+                        f"(batch <= {self.batcher.max_batch_size}, "
+                        f"attente <= {self.batcher.max_wait * 1000:g} ms, "
+                        f"seuil {self.batcher.threshold:.4f})")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        await self.batcher.stop()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': 'Requête invalide'}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                # Content-Length obligatoire pour un POST, entier positif sinon 400
+                length = headers.get('content-length')
+                if length is None and method != 'POST':
+                    length = '0'
+                if length is None or not (length.isascii() and length.isdigit()):
+                    await self._respond(writer, 400, {'error': 'Content-Length manquant ou invalide'},
+                                        False)
+                    break
+                length = int(length)
+                if length > self.max_body_bytes:
+                    await self._respond(writer, 413, {'error': 'Requête trop volumineuse'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and version != 'HTTP/1.0')
+                status, payload = await self._route(method, path, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, body):
+        path = path.split('?', 1)[0]
+        if path == '/health':
+            return 200, {'status': 'ok', 'algorithm': self.batcher.detector.algorithm}
+        if path == '/metrics':
+            return 200, self.batcher.to_dict()
+        if path != '/score':
+            return 404, {'error': f'Chemin inconnu: {path}'}
+        if method != 'POST':
+            return 405, {'error': 'POST attendu'}
+
+        try:
+            payload = json.loads(body)
+            if isinstance(payload, dict) and 'transactions' in payload:
+                results = await asyncio.gather(*(self.batcher.score(t)
+                                                 for t in payload['transactions']))
+                return 200, {'results': results}
+            if not isinstance(payload, dict):
+                raise ValueError("Objet JSON attendu")
+            return 200, await self.batcher.score(payload)
+        except ServerBusy as e:
+            return 503, {'error': str(e)}
+        except (ValueError, TypeError, AttributeError) as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': str(e)}
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+
+def load_detector(model_path):
+    """Détecteur prêt pour des micro-batches (un seul coeur par batch)."""
+    # Petits batches: le parallélisme interne (joblib) coûte plus qu'il ne rapporte
+    return load_scorer(model_path, single_thread=True)
+
+
+def serve(model_path, host='127.0.0.1', port=8080, max_batch_size=64, max_wait_ms=2.0,
+          threshold=None, max_queue=10_000, verbose=True):
+    """Charge le modèle et sert jusqu'à interruption (Ctrl+C)."""
+    batcher = MicroBatcher(load_detector(model_path), max_batch_size=max_batch_size,
+                           max_wait_ms=max_wait_ms, threshold=threshold, max_queue=max_queue)
+    server = ScoringServer(batcher, host=host, port=port, verbose=verbose)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        if verbose:
+            logger.info("🛑 Serveur arrêté")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur de scoring par micro-batches")
+    parser.add_argument('model', help="Modèle sauvegardé (save_model)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    parser.add_argument('--threshold', type=float, default=None,
+                        help="Seuil de décision (défaut: celui du modèle, sinon 0.5)")
+    parser.add_argument('--max-queue', type=int, default=10_000,
+                        help="Requêtes en attente au-delà desquelles on répond 503")
+    args = parser.parse_args(argv)
+
+    serve(args.model, host=args.host, port=args.port, max_batch_size=args.max_batch_size,
+          max_wait_ms=args.max_wait_ms, threshold=args.threshold, max_queue=args.max_queue)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fraud_detector import make_synthetic_transactions  # noqa: E402
+
+
+def make_transactions(n=4000, seed=0):
+    """Transactions synthétiques triées par Time, comme le dataset Kaggle."""
+    df = make_synthetic_transactions(n, random_state=seed)
+    return df.sort_values('Time', kind='mergesort', ignore_index=True)
+
+
+@pytest.fixture
+def transactions():
+    return make_transactions()
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from compiled_forest import CompiledForest, _numba_available
+from conftest import make_transactions
+from fraud_detector import CreditCardFraudDetector
+
+_ENGINES = ['numpy'] + (['numba'] if _numba_available() else [])
+
+
+@pytest.fixture(scope='module')
+def trained():
+    detector = CreditCardFraudDetector(algorithm='random_forest', verbose=False,
+                                       model_params={'n_estimators': 20})
+    features = detector.create_features(make_transactions(6000))
+    X_train, X_test, y_train, _ = detector.prepare_data(features)
+    detector.train(X_train, y_train)
+    X_scaled = detector.scaler.transform(X_test)
+    expected = detector.model.predict_proba(X_scaled)[:, 1]
+    return detector, X_test.to_numpy(dtype=np.float64), X_scaled, expected
+
+
+@pytest.mark.parametrize('engine', _ENGINES)
+@pytest.mark.parametrize('n_threads', [1, 2])
+def test_compiled_forest_matches_sklearn_bit_for_bit(trained, engine, n_threads):
+    detector, X, X_scaled, expected = trained
+    forest = CompiledForest.from_detector(detector)
+    proba = forest.predict_proba(X, n_threads=n_threads, block_size=257, engine=engine)
+    np.testing.assert_array_equal(proba, expected)
+
+    unfolded = CompiledForest.from_detector(detector, fold_scaler=False)
+    np.testing.assert_array_equal(
+        unfolded.predict_proba(X_scaled, engine=engine), expected)
+
+
+def test_compiled_forest_save_load_roundtrip(trained, tmp_path):
+    detector, X, _, expected = trained
+    path = str(tmp_path / 'forest.npz')
+    CompiledForest.from_detector(detector).save(path)
+    np.testing.assert_array_equal(CompiledForest.load(path).predict_proba(X), expected)
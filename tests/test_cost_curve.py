@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from fraud_detector import CostCurve
+
+
+def _brute_force(y, scores, threshold, investigation_cost, fraud_cost):
+    alerts = scores >= threshold
+    fraud_cost = np.broadcast_to(np.asarray(fraud_cost, dtype=np.float64), y.shape)
+    tp = int((alerts & y).sum())
+    fp = int((alerts & ~y).sum())
+    caught = fraud_cost[alerts & y].sum()
+    cost_fp = fp * investigation_cost
+    return {'tp': tp, 'fp': fp, 'fn': int(y.sum()) - tp, 'tn': int((~y).sum()) - fp,
+            'total_cost': cost_fp + fraud_cost[y].sum() - caught,
+            'savings': caught - cost_fp}
+
+
+@pytest.mark.parametrize('per_row_cost', [False, True])
+def test_cost_curve_matches_brute_force(per_row_cost):
+    rng = np.random.RandomState(0)
+    y = rng.random_sample(2000) < 0.05
+    # Scores arrondis: nombreux ex-aequo
+    scores = np.round(np.clip(rng.normal(0.3 + 0.4 * y, 0.2), 0, 1), 2)
+    fraud_cost = rng.lognormal(3, 1, len(y)) if per_row_cost else 500
+    curve = CostCurve(y, scores, investigation_cost=25, fraud_cost=fraud_cost)
+
+    thresholds = np.r_[np.unique(scores), -1.0, 0.005, 0.333, 2.0]
+    table = curve.table(thresholds)
+    for row, threshold in zip(table.itertuples(), thresholds):
+        expected = _brute_force(y, scores, threshold, 25, fraud_cost)
+        point = curve.at(threshold)
+        for key, value in expected.items():
+            assert point[key] == pytest.approx(value, rel=1e-12, abs=1e-9)
+            assert getattr(row, key) == pytest.approx(value, rel=1e-12, abs=1e-9)
+
+    # Seuil optimal: coût minimal, le plus bas des seuils ex-aequo
+    candidates = np.unique(scores)
+    brute = [_brute_force(y, scores, t, 25, fraud_cost)['total_cost'] for t in candidates]
+    assert curve.optimal_threshold() == candidates[int(np.argmin(brute))]
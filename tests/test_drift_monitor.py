@@ -0,0 +1,24 @@
+from fraud_detector import TIME_POSITION_FEATURES, CreditCardFraudDetector
+
+from conftest import make_transactions
+
+
+def test_later_window_is_not_flagged_as_drift(transactions):
+    detector = CreditCardFraudDetector(algorithm='logistic', verbose=False)
+    features = detector.create_features(transactions)
+    X_train, _, y_train, _ = detector.prepare_data(features)
+    detector.train(X_train, y_train)
+
+    # Même distribution, deux jours plus tard
+    later = make_transactions(seed=1)
+    later['Time'] += 2 * 86400
+    monitor = detector.drift_monitor()
+    monitor.update(detector.create_features(later)[detector.feature_names])
+
+    assert not set(TIME_POSITION_FEATURES) & set(monitor.feature_names)
+    assert {'Hour', 'Is_Night', 'Is_Business_Hours'} <= set(monitor.feature_names)
+    assert monitor.drifted() == []
+    # Inclusion explicite: Day dérive bien
+    monitor = detector.drift_monitor(features=detector.feature_names)
+    monitor.update(detector.create_features(later)[detector.feature_names])
+    assert 'Day' in monitor.drifted()
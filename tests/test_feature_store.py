@@ -0,0 +1,64 @@
+import logging
+
+import pandas as pd
+
+from conftest import make_transactions
+from feature_store import FeatureStore
+
+
+def _write_without_final_newline(df, path):
+    path.write_bytes(df.to_csv(index=False).encode().rstrip(b'\n'))
+
+
+def test_csv_without_trailing_newline_keeps_last_row(tmp_path):
+    df = make_transactions(1000)
+    source = tmp_path / 'transactions.csv'
+    _write_without_final_newline(df, source)
+    store = FeatureStore(str(tmp_path / 'cache'), chunksize=300, verbose=False)
+
+    assert store.update(str(source)) == {'status': 'build', 'rows': 1000, 'rows_added': 1000}
+    assert store.update(str(source))['status'] == 'hit'
+
+    # Ajout de lignes après la dernière ligne sans saut de ligne
+    more = make_transactions(200, seed=1)
+    more['Time'] += df['Time'].iloc[-1]
+    with open(source, 'ab') as f:
+        f.write(b'\n' + more.to_csv(index=False, header=False).encode())
+    assert store.update(str(source)) == {'status': 'append', 'rows': 1200, 'rows_added': 200}
+
+    cached = store.load(str(source))
+    expected = store._detector.create_features(pd.read_csv(source))
+    pd.testing.assert_series_equal(cached['Amount'], expected['Amount'], check_dtype=False,
+                                   check_index=False)
+
+
+def test_partial_last_line_stays_pending(tmp_path, caplog):
+    df = make_transactions(500)
+    source = tmp_path / 'transactions.csv'
+    text = df.to_csv(index=False).encode()
+    last_line_start = text.rstrip(b'\n').rfind(b'\n') + 1
+    # Écriture interrompue au milieu de la dernière ligne
+    source.write_bytes(text[:last_line_start + 20])
+    store = FeatureStore(str(tmp_path / 'cache'), verbose=False)
+
+    with caplog.at_level(logging.WARNING, logger='feature_store'):
+        assert store.update(str(source))['rows'] == 499
+    assert 'incomplète' in caplog.text
+
+    source.write_bytes(text)
+    assert store.update(str(source)) == {'status': 'append', 'rows': 500, 'rows_added': 1}
+
+
+def test_row_continued_after_update_triggers_rebuild(tmp_path):
+    df = make_transactions(300)
+    df = df[[col for col in df.columns if col != 'Amount'] + ['Amount']]
+    source = tmp_path / 'transactions.csv'
+    text = df.to_csv(index=False).encode()
+    # Montant de la dernière ligne tronqué: ligne lisible, mais incomplète
+    cut = len(text.rstrip(b'\n')) - 1
+    source.write_bytes(text[:cut])
+    store = FeatureStore(str(tmp_path / 'cache'), verbose=False)
+    store.update(str(source))
+
+    source.write_bytes(text)
+    assert store.update(str(source)) == {'status': 'build', 'rows': 300, 'rows_added': 300}
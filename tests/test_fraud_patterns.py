@@ -0,0 +1,22 @@
+import numpy as np
+
+from fraud_detector import V_FEATURES, CreditCardFraudDetector, FraudPatternStats
+
+
+def test_pattern_stats_ignore_missing_values(transactions):
+    df = transactions.copy()
+    df.loc[df.index[:5], 'V1'] = np.nan
+    df.loc[df.index[df['Class'] == 1][:3], 'Amount'] = np.nan
+
+    detector = CreditCardFraudDetector(verbose=False)
+    patterns = detector.analyze_fraud_patterns(df, chunksize=700)
+    assert not np.isnan(patterns['amount']['fraud_mean'])
+
+    stats = FraudPatternStats()
+    for start in range(0, len(df), 700):
+        stats.update(df.iloc[start:start + 700])
+    columns = V_FEATURES + ['Amount']
+    expected = df.groupby('Class')[columns]
+    np.testing.assert_array_equal(stats.valid_counts, expected.count().to_numpy())
+    np.testing.assert_allclose(stats.sums / stats.valid_counts, expected.mean().to_numpy(),
+                               rtol=1e-9, atol=1e-12)
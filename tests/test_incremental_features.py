@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fraud_detector import CreditCardFraudDetector, IncrementalFeatureEngine
+
+# Découpage irrégulier, blocs d'une ligne compris
+_BOUNDARIES = [0, 1, 2, 137, 138, 1500, 2999, 3000, 4000]
+
+
+@pytest.mark.parametrize('entity_column', [None, 'card_id'])
+def test_incremental_matches_full_history(transactions, entity_column):
+    df = transactions.copy()
+    df['card_id'] = np.random.RandomState(1).randint(0, 50, len(df))
+    detector = CreditCardFraudDetector(verbose=False)
+    expected = detector.create_features(df, entity_column=entity_column)
+
+    engine = IncrementalFeatureEngine(detector, entity_column=entity_column)
+    parts = [engine.transform(df.iloc[start:end])
+             for start, end in zip(_BOUNDARIES[:-1], _BOUNDARIES[1:])]
+    pd.testing.assert_frame_equal(pd.concat(parts), expected)
+
+    # Reprise depuis un checkpoint au milieu du flux
+    engine.reset()
+    engine.transform(df.iloc[:1500])
+    resumed = IncrementalFeatureEngine(detector, entity_column=entity_column)
+    resumed.set_state(engine.get_state())
+    pd.testing.assert_frame_equal(resumed.transform(df.iloc[1500:]), expected.iloc[1500:])
+
+
+def test_chunked_create_features_matches_whole_frame(transactions):
+    detector = CreditCardFraudDetector(verbose=False)
+    expected = detector.create_features(transactions)
+    for compact in (False, True):
+        parts, prev_time = [], None
+        for start in range(0, len(transactions), 700):
+            chunk = transactions.iloc[start:start + 700]
+            parts.append(detector.create_features(chunk, prev_time=prev_time, compact=compact))
+            prev_time = chunk['Time'].iloc[-1]
+        chunked = pd.concat(parts)
+        if compact:
+            # float32: mêmes valeurs aux arrondis près, indicateurs identiques
+            np.testing.assert_allclose(chunked.to_numpy(np.float64),
+                                       expected.to_numpy(np.float64), rtol=1e-6, atol=1e-6)
+        else:
+            pd.testing.assert_frame_equal(chunked, expected)
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from fraud_detector import CreditCardFraudDetector
+
+
+def test_mmap_artifact_after_train_without_prepare_data(transactions, tmp_path):
+    detector = CreditCardFraudDetector(algorithm='random_forest', verbose=False,
+                                       model_params={'n_estimators': 10})
+    features = detector.create_features(transactions)
+    X = features.drop(columns=['Class', 'Time'])
+    detector.train(X, features['Class'])
+    assert detector.feature_names == list(X.columns)
+
+    path = str(tmp_path / 'model.fdm')
+    detector.save_model(path)
+    loaded = CreditCardFraudDetector(verbose=False)
+    loaded.load_model(path)
+    raw = transactions[detector.scoring_columns()].to_numpy(dtype=np.float64)
+    np.testing.assert_allclose(loaded.score_many(raw[:50]), detector.score_many(raw[:50]))
+
+
+def test_mmap_artifact_requires_feature_names(transactions, tmp_path):
+    detector = CreditCardFraudDetector(algorithm='logistic', verbose=False)
+    features = detector.create_features(transactions)
+    detector.train(features.drop(columns=['Class', 'Time']).to_numpy(), features['Class'])
+    with pytest.raises(ValueError, match='feature_names'):
+        detector.save_model(str(tmp_path / 'model.fdm'))
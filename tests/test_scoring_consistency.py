@@ -0,0 +1,52 @@
+import numpy as np
+
+from fraud_detector import DERIVED_FEATURES, CreditCardFraudDetector
+
+
+def _raw_rows(detector, df):
+    return df[detector.scoring_columns()].to_numpy(dtype=np.float64)
+
+
+def test_score_one_after_partial_fit_matches_predict_proba(transactions):
+    detector = CreditCardFraudDetector(algorithm='sgd_logistic', verbose=False)
+    features = detector.create_features(transactions)
+    X = features.drop(columns=['Class', 'Time'])
+    y = features['Class']
+    detector.feature_names = list(X.columns)
+
+    detector.partial_fit(X.iloc[:2000], y.iloc[:2000])
+    detector.score_one(_raw_rows(detector, transactions)[0])  # construit le plan
+    detector.partial_fit(X.iloc[2000:], y.iloc[2000:])
+
+    raw = _raw_rows(detector, transactions)
+    expected = detector.predict_proba(X.iloc[:1])[0]
+    np.testing.assert_allclose(detector.score_one(raw[0]), expected, rtol=1e-12)
+    np.testing.assert_allclose(detector.score_many(raw[:1]), [expected], rtol=1e-12)
+
+
+def test_score_one_matches_batch_for_every_registered_feature(transactions):
+    detector = CreditCardFraudDetector(algorithm='logistic', verbose=False)
+    features = detector.create_features(transactions)
+    X_train, _, y_train, _ = detector.prepare_data(features)
+    detector.train(X_train, y_train)
+    plan = detector._get_scoring_plan()
+    assert {name for name, _ in plan['derived']} == set(DERIVED_FEATURES)
+
+    columns = detector.scoring_columns()
+    base = _raw_rows(detector, transactions)[:1]
+    edge_cases = [
+        ('Amount', np.nan), ('Amount', -3.5), ('Amount', 0.0), ('Amount', 10.0),
+        ('Amount', 100.0), ('Amount', 250.0), ('Amount', np.inf), ('V11', 0.0),
+        ('V11', -0.0), ('V11', np.nan), ('V14', np.nan), ('V4', np.inf),
+        ('Time', 0.0), ('Time', 6 * 3600.0), ('Time', 5 * 86400.0 + 23 * 3600.0),
+        ('Time', np.nan)
+    ]
+    for prev_time in (None, 10.0):
+        for column, value in edge_cases:
+            raw = base.copy()
+            raw[0, columns.index(column)] = value
+            batch = np.empty((1, len(detector.feature_names)), order='F')
+            with np.errstate(all='ignore'):
+                detector._fill_features(raw, batch, prev_time)
+                single = detector._fill_row(raw, np.empty_like(batch), prev_time)
+            np.testing.assert_array_equal(single, batch, err_msg=f"{column}={value}")
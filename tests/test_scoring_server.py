@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from scoring_server import ScoringServer
+
+
+class _StubBatcher:
+    """Batcher minimal: le routage n'atteint pas le scoring dans ces tests."""
+    max_batch_size = 1
+    max_wait = 0.0
+    threshold = 0.5
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def score(self, transaction):
+        return {'fraud_probability': 0.0}
+
+
+async def _request(raw):
+    server = ScoringServer(_StubBatcher(), port=0, max_body_bytes=1024, verbose=False)
+    await server.start()
+    try:
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        writer.write(raw)
+        await writer.drain()
+        status_line = await reader.readline()
+        writer.close()
+        return int(status_line.split()[1])
+    finally:
+        await server.stop()
+
+
+@pytest.mark.parametrize('length, status', [
+    (None, 400), ('abc', 400), ('-5', 400), ('2048', 413), ('2', 200)
+])
+def test_content_length_validation(length, status):
+    head = b'POST /score HTTP/1.1\r\nConnection: close\r\n'
+    if length is not None:
+        head += f'Content-Length: {length}\r\n'.encode()
+    assert asyncio.run(_request(head + b'\r\n{}')) == status
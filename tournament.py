@@ -0,0 +1,206 @@
+"""
+Training Tournament
+===================
+
+Entraînement parallèle de plusieurs algorithmes et grilles d'hyperparamètres.
+
+La matrice de features, la normalisation et le rééquilibrage SMOTE sont
+calculés une seule fois, écrits en .npy puis partagés en lecture seule
+(mmap) avec un pool de processus. Chaque candidat est entraîné et évalué
+en parallèle; le résultat est un classement par AUC et coût business.
+"""
+
+import itertools
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import roc_auc_score
+from sklearn.preprocessing import StandardScaler
+
+from fraud_detector import CostCurve, CreditCardFraudDetector, get_logger
+
+
+logger = get_logger(__name__)
+
+
+# Grille par défaut: les trois algorithmes du détecteur
+DEFAULT_GRID = {
+    'random_forest': {'n_estimators': [100], 'max_depth': [10]},
+    'logistic': {'C': [1.0]},
+    'isolation_forest': {'n_estimators': [100]}
+}
+
+
+def expand_grid(grid):
+    """
+    Développe {algorithme: {paramètre: [valeurs]}} en liste de candidats.
+
+    Chaque candidat: {'name', 'algorithm', 'params'}.
+    """
+    candidates = []
+    for algorithm, param_grid in grid.items():
+        names = sorted(param_grid)
+        for values in itertools.product(*(param_grid[name] for name in names)):
+            params = dict(zip(names, values))
+            label = ','.join(f'{k}={v}' for k, v in params.items())
+            candidates.append({
+                'name': f'{algorithm}({label})' if label else algorithm,
+                'algorithm': algorithm,
+                'params': params
+            })
+    return candidates
+
+
+def _load_shared(paths):
+    """Tableaux partagés, mappés en lecture seule dans le worker."""
+    return {name: np.load(path, mmap_mode='r') for name, path in paths.items()}
+
+
+def _fit_candidate(candidate, paths, scaler, feature_names, balance_data, costs):
+    """Entraîne et évalue un candidat (exécuté dans un worker)."""
+    shared = _load_shared(paths)
+    start = time.perf_counter()
+
+    detector = CreditCardFraudDetector(algorithm=candidate['algorithm'],
+                                       balance_data=balance_data, verbose=False,
+                                       model_params=candidate['params'])
+    detector.scaler = scaler
+    detector.feature_names = feature_names
+    detector.model = detector._build_model(shared['y_train'])
+
+    # Un seul coeur par candidat: le parallélisme est entre candidats
+    n_jobs = getattr(detector.model, 'n_jobs', None)
+    if n_jobs is not None:
+        detector.model.set_params(n_jobs=1)
+
+    if detector.algorithm != 'isolation_forest' and 'X_resampled' in shared:
+        X_fit, y_fit = shared['X_resampled'], shared['y_resampled']
+    else:
+        X_fit, y_fit = shared['X_train'], shared['y_train']
+    detector._fit_model(shared['X_train'], shared['y_train'], X_fit, y_fit)
+
+    if n_jobs is not None:
+        detector.model.set_params(n_jobs=n_jobs)
+    fit_seconds = time.perf_counter() - start
+
+    y_test = np.asarray(shared['y_test'])
+    probabilities = detector._proba_from_scaled(shared['X_test'])
+    curve = CostCurve(y_test, probabilities, **costs)
+    optimal_threshold = curve.optimal_threshold()
+    at_optimum = curve.at(optimal_threshold)
+    n_alerts = at_optimum['tp'] + at_optimum['fp']
+
+    result = {
+        'name': candidate['name'],
+        'algorithm': candidate['algorithm'],
+        'params': candidate['params'],
+        'auc': roc_auc_score(y_test, probabilities),
+        'business_cost': at_optimum['total_cost'],
+        'optimal_threshold': optimal_threshold,
+        'precision': at_optimum['tp'] / n_alerts if n_alerts else 0,
+        'recall': at_optimum['tp'] / curve.n_positives if curve.n_positives else 0,
+        'fit_seconds': fit_seconds
+    }
+    return result, detector
+
+
+def run_tournament(X_train, X_test, y_train, y_test, grid=None, balance_data=True,
+                   n_workers=None, investigation_cost=25, fraud_cost=500,
+                   workdir=None, resampler=None, verbose=True):
+    """
+    Entraîne tous les candidats en parallèle sur des données partagées.
+
+    Args:
+        X_train, X_test, y_train, y_test: sorties de prepare_data
+        grid: {algorithme: {paramètre: [valeurs]}} ou liste de candidats
+            (voir expand_grid); défaut DEFAULT_GRID
+        n_workers: processus (défaut: nombre de coeurs)
+        investigation_cost, fraud_cost: coûts de CostCurve
+        workdir: dossier des tableaux partagés (défaut: temporaire, supprimé)
+        resampler: ResamplingStage (ex: avec cache_dir) pour le rééquilibrage
+
+    Returns:
+        (leaderboard, detectors): DataFrame classé par AUC puis coût business,
+        et dict {nom du candidat: détecteur entraîné}
+    """
+    grid = DEFAULT_GRID if grid is None else grid
+    candidates = expand_grid(grid) if isinstance(grid, dict) else list(grid)
+    n_workers = n_workers or os.cpu_count() or 1
+
+    if verbose:
+        logger.info(f"🏆 Tournoi: {len(candidates)} candidats sur {n_workers} workers")
+
+    # Normalisation et rééquilibrage: une seule fois pour tous les candidats
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+    feature_names = list(X_train.columns)
+
+    arrays = {
+        'X_train': X_train_scaled,
+        'y_train': np.asarray(y_train),
+        'X_test': X_test_scaled,
+        'y_test': np.asarray(y_test)
+    }
+
+    if balance_data and any(c['algorithm'] != 'isolation_forest' for c in candidates):
+        balancer = CreditCardFraudDetector(algorithm='random_forest', balance_data=True,
+                                           verbose=verbose, resampler=resampler)
+        X_resampled, y_resampled = balancer._resample(X_train_scaled, arrays['y_train'])
+        arrays['X_resampled'] = X_resampled
+        arrays['y_resampled'] = np.asarray(y_resampled)
+
+    own_workdir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix='fraud_tournament_')
+    os.makedirs(workdir, exist_ok=True)
+
+    try:
+        paths = {}
+        for name, array in arrays.items():
+            paths[name] = os.path.join(workdir, f'{name}.npy')
+            np.save(paths[name], np.ascontiguousarray(array))
+        del arrays
+
+        costs = {'investigation_cost': investigation_cost, 'fraud_cost': fraud_cost}
+        results = []
+        detectors = {}
+
+        if n_workers == 1:
+            outcomes = (_fit_candidate(c, paths, scaler, feature_names, balance_data, costs)
+                        for c in candidates)
+            for result, detector in outcomes:
+                results.append(result)
+                detectors[result['name']] = detector
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                futures = [pool.submit(_fit_candidate, c, paths, scaler, feature_names,
+                                       balance_data, costs)
+                           for c in candidates]
+                for future in futures:
+                    result, detector = future.result()
+                    results.append(result)
+                    detectors[result['name']] = detector
+    finally:
+        if own_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    for detector in detectors.values():
+        detector.verbose = verbose
+
+    leaderboard = (pd.DataFrame(results)
+                   .sort_values(['auc', 'business_cost'], ascending=[False, True])
+                   .reset_index(drop=True))
+    leaderboard.insert(0, 'rank', np.arange(1, len(leaderboard) + 1))
+
+    if verbose:
+        logger.info("✅ Classement:")
+        for row in leaderboard.itertuples():
+            logger.info(f"   {row.rank}. {row.name}: AUC {row.auc:.4f}, "
+                        f"coût {row.business_cost:,.0f}€ (seuil {row.optimal_threshold:.4f})")
+
+    return leaderboard, detectors
@@ -0,0 +1,294 @@
+"""
+Velocity
+========
+
+Features de vélocité par entité (carte, marchand...): nombre de
+transactions et somme des montants sur des fenêtres glissantes (1h et 24h
+par défaut), transaction courante incluse.
+
+État compact: un tampon circulaire de `capacity` transactions (Time,
+montant) par entité, dans des tableaux numpy partagés (un slot par
+entité). Une fenêtre compte au plus les `capacity` dernières transactions
+de l'entité (saturation au-delà).
+
+- Batch (transform): blocs de DataFrame, calcul vectorisé après tri par
+  (entité, Time); l'historique des blocs précédents est repris des tampons
+- Streaming (update): une transaction à la fois, même résultat que le
+  batch (sommes égales aux arrondis près)
+- Mémoire bornée: au plus max_entities slots. Quand ils sont tous pris,
+  les entités inactives depuis plus que la plus longue fenêtre sont
+  évincées (sans effet sur les features), puis si besoin les moins
+  récemment vues
+
+    velocity = VelocityFeatures('card_id')
+    features = detector.create_features(df, velocity=velocity)
+
+    # Streaming: colonnes ajoutées à la transaction avant score_one
+    transaction.update(velocity.update(card_id, transaction['Time'],
+                                       transaction['Amount']))
+    proba = detector.score_one(transaction)
+"""
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_WINDOWS = (3600, 86400)
+
+
+def _window_label(seconds):
+    if seconds % 3600 == 0:
+        return f'{seconds // 3600:g}h'
+    if seconds % 60 == 0:
+        return f'{seconds // 60:g}min'
+    return f'{seconds:g}s'
+
+
+class VelocityFeatures:
+    """
+    Agrégats glissants par entité, état en tampons circulaires.
+
+    Les transactions d'une entité doivent arriver dans l'ordre de Time
+    (d'un bloc au suivant; à l'intérieur d'un bloc, transform trie).
+    Colonnes produites, pour chaque fenêtre: {prefix}_Count_{label} et
+    {prefix}_Amount_{label} (ex: Velocity_Count_1h).
+    """
+
+    def __init__(self, entity_column='card_id', windows=DEFAULT_WINDOWS,
+                 amount_column='Amount', prefix='Velocity', capacity=64,
+                 max_entities=100_000):
+        if capacity < 1 or max_entities < 1:
+            raise ValueError("capacity et max_entities doivent être >= 1")
+        self.entity_column = entity_column
+        self.windows = tuple(sorted(windows))
+        self.amount_column = amount_column
+        self.prefix = prefix
+        self.capacity = capacity
+        self.max_entities = max_entities
+        # (fenêtre, colonne du nombre, colonne de la somme)
+        self._columns = [(window, f'{prefix}_Count_{_window_label(window)}',
+                          f'{prefix}_Amount_{_window_label(window)}')
+                         for window in self.windows]
+        self.reset()
+
+    @property
+    def feature_names(self):
+        return [name for _, count, amount in self._columns for name in (count, amount)]
+
+    @property
+    def n_entities(self):
+        return len(self._slots)
+
+    @property
+    def memory_bytes(self):
+        """Taille des tableaux d'état (hors dict des identifiants)."""
+        return sum(array.nbytes for array in (self._times, self._amounts, self._head,
+                                              self._last, self._entities))
+
+    def reset(self):
+        """Oublie tout l'historique."""
+        self._slots = {}
+        self._free = []
+        self._times = np.empty((0, self.capacity), dtype=np.float64)
+        self._amounts = np.empty((0, self.capacity), dtype=np.float64)
+        self._head = np.empty(0, dtype=np.int32)
+        self._last = np.empty(0, dtype=np.float64)
+        self._entities = np.empty(0, dtype=object)
+
+    def _grow(self, n_slots):
+        old = len(self._head)
+
+        def grown(array, fill):
+            result = np.full((n_slots,) + array.shape[1:], fill, dtype=array.dtype)
+            result[:old] = array
+            return result
+
+        self._times = grown(self._times, -np.inf)
+        self._amounts = grown(self._amounts, 0.0)
+        self._head = grown(self._head, 0)
+        self._last = grown(self._last, -np.inf)
+        self._entities = grown(self._entities, None)
+        # Slots libres dépilés par ordre croissant
+        self._free.extend(range(n_slots - 1, old - 1, -1))
+
+    def _evict(self, slots):
+        for slot in slots.tolist():
+            del self._slots[self._entities[slot]]
+            self._entities[slot] = None
+        self._free.extend(slots.tolist())
+
+    def evict_idle(self, now):
+        """Évince les entités sans transaction dans la plus longue fenêtre."""
+        idle = np.flatnonzero(~np.equal(self._entities, None)
+                              & (self._last <= now - self.windows[-1]))
+        self._evict(idle)
+        return len(idle)
+
+    def _allocate(self, entities, now, protected=()):
+        """Slots pour de nouvelles entités (agrandit, puis évince si besoin)."""
+        n = len(entities)
+        if n > self.max_entities - len(protected):
+            raise ValueError(f"{n} nouvelles entités dans un bloc: max_entities "
+                             f"({self.max_entities}) trop petit")
+        if len(self._free) < n and len(self._head) < self.max_entities:
+            self._grow(min(self.max_entities, max(2 * len(self._head), len(self._head) + n, 1024)))
+        if len(self._free) < n:
+            self.evict_idle(now)
+        if len(self._free) < n:
+            # Moins récemment vues d'abord (features de ces entités perdues)
+            last = self._last.copy()
+            last[np.equal(self._entities, None)] = np.inf
+            last[np.asarray(protected, dtype=np.intp)] = np.inf
+            self._evict(np.argsort(last, kind='stable')[:n - len(self._free)])
+
+        slots = np.array([self._free.pop() for _ in range(n)], dtype=np.intp)
+        for entity, slot in zip(entities, slots.tolist()):
+            self._slots[entity] = slot
+            self._entities[slot] = entity
+        self._times[slots] = -np.inf
+        self._amounts[slots] = 0
+        self._head[slots] = 0
+        return slots
+
+    def update(self, entity, time, amount):
+        """
+        Ajoute une transaction et renvoie ses features {colonne: valeur}.
+        """
+        slot = self._slots.get(entity)
+        if slot is None:
+            slot = int(self._allocate([entity], time)[0])
+        times = self._times[slot]
+        amounts = self._amounts[slot]
+
+        head = self._head[slot]
+        times[head] = time
+        amounts[head] = 0.0 if amount != amount else amount
+        self._head[slot] = (head + 1) % self.capacity
+        self._last[slot] = time
+
+        features = {}
+        for window, count, total in self._columns:
+            in_window = times > time - window
+            features[count] = float(np.count_nonzero(in_window))
+            features[total] = float(amounts[in_window].sum())
+        return features
+
+    def transform(self, df):
+        """
+        Features d'un bloc (DataFrame avec entity_column, Time et le
+        montant), dans l'ordre de df; l'état est mis à jour avec le bloc.
+        """
+        n = len(df)
+        if n == 0:
+            return pd.DataFrame({name: np.empty(0) for name in self.feature_names},
+                                index=df.index)
+
+        codes, uniques = pd.factorize(df[self.entity_column], use_na_sentinel=False)
+        times = df['Time'].to_numpy(dtype=np.float64)
+        # Montant manquant compté comme 0 (une somme NaN contaminerait le cumul)
+        amounts = np.nan_to_num(df[self.amount_column].to_numpy(dtype=np.float64))
+        uniques = list(uniques)
+        known = np.array([self._slots.get(entity, -1) for entity in uniques], dtype=np.intp)
+
+        # Historique des entités déjà vues, placé avant le bloc à Time égal
+        has_history = np.flatnonzero(known >= 0)
+        history_times = self._times[known[has_history]]
+        kept = history_times > -np.inf
+        history_codes = np.broadcast_to(has_history[:, None], kept.shape)[kept]
+        all_codes = np.concatenate([history_codes, codes])
+        all_times = np.concatenate([history_times[kept], times])
+        all_amounts = np.concatenate([self._amounts[known[has_history]][kept], amounts])
+        n_history = len(history_codes)
+
+        order = np.lexsort((np.arange(len(all_codes)), all_times, all_codes))
+        codes_sorted = all_codes[order]
+        times_sorted = all_times[order]
+        cumsum = np.concatenate([[0.0], np.cumsum(all_amounts[order])])
+
+        starts = np.flatnonzero(np.r_[True, codes_sorted[1:] != codes_sorted[:-1]])
+        sizes = np.diff(np.r_[starts, len(order)])
+        group_start = np.repeat(starts, sizes)
+        position = np.arange(len(order))
+        # Au plus les `capacity` dernières transactions, comme les tampons
+        first = np.maximum(group_start, position - self.capacity + 1)
+
+        rows = order >= n_history
+        row_position = position[rows]
+        result = np.empty((n, 2 * len(self.windows)), dtype=np.float64)
+        target = order[rows] - n_history
+        for k, window in enumerate(self.windows):
+            # Premières positions dans la fenêtre: fusion triée des bornes
+            # (entité, Time - window) avec les transactions; à égalité,
+            # transaction d'abord (bornes exclues)
+            bounds = times_sorted[rows] - window
+            merged_codes = np.concatenate([codes_sorted, codes_sorted[rows]])
+            merged_times = np.concatenate([times_sorted, bounds])
+            is_bound = np.r_[np.zeros(len(order), dtype=np.int8),
+                             np.ones(len(bounds), dtype=np.int8)]
+            merged = np.lexsort((is_bound, merged_times, merged_codes))
+            rank = np.empty(len(merged), dtype=np.intp)
+            rank[merged] = np.arange(len(merged))
+            bound_rank = rank[len(order):]
+            # Transactions avant la borne = rang - bornes avant elle (triées
+            # dans le même ordre que les lignes)
+            left = bound_rank - np.arange(len(bounds))
+            left = np.maximum(left, first[rows])
+            result[target, 2 * k] = row_position - left + 1
+            result[target, 2 * k + 1] = cumsum[row_position + 1] - cumsum[left]
+
+        self._store(uniques, known, codes_sorted, times_sorted, all_amounts[order],
+                    starts, sizes, times.min())
+        return pd.DataFrame(result, index=df.index, columns=self.feature_names)
+
+    def _store(self, uniques, known, codes_sorted, times_sorted, amounts_sorted,
+               starts, sizes, now):
+        """Tampons = `capacity` dernières transactions de chaque entité du bloc."""
+        # Chaque entité du bloc forme un groupe: groupe k = code k
+        group_last = times_sorted[starts + sizes - 1]
+        slots = known.copy()
+        seen = slots >= 0
+        # Avant toute éviction: les entités du bloc ne sont pas inactives
+        self._last[slots[seen]] = group_last[seen]
+
+        new = np.flatnonzero(~seen)
+        if len(new):
+            slots[new] = self._allocate([uniques[i] for i in new.tolist()], now,
+                                        protected=slots[seen])
+            self._last[slots[new]] = group_last[new]
+
+        kept = np.minimum(sizes, self.capacity)
+        end = np.repeat(starts + sizes, sizes)
+        position = np.arange(len(codes_sorted))
+        recent = position >= end - self.capacity
+        offset = position[recent] - (end[recent] - np.repeat(kept, sizes)[recent])
+        group_slots = slots[codes_sorted[recent]]
+
+        self._times[slots] = -np.inf
+        self._amounts[slots] = 0
+        self._times[group_slots, offset] = times_sorted[recent]
+        self._amounts[group_slots, offset] = amounts_sorted[recent]
+        self._head[slots] = kept % self.capacity
+
+    def get_state(self):
+        """État sérialisable (entités actives et leurs tampons)."""
+        slots = np.array(list(self._slots.values()), dtype=np.intp)
+        return {
+            'entities': list(self._slots),
+            'times': self._times[slots].copy(),
+            'amounts': self._amounts[slots].copy(),
+            'head': self._head[slots].copy(),
+            'last': self._last[slots].copy()
+        }
+
+    def set_state(self, state):
+        """Restaure un état produit par get_state (mêmes capacity et windows)."""
+        self.reset()
+        entities = list(state['entities'])
+        if not entities:
+            return self
+        slots = self._allocate(entities, -np.inf)
+        self._times[slots] = state['times']
+        self._amounts[slots] = state['amounts']
+        self._head[slots] = state['head']
+        self._last[slots] = state['last']
+        return self